@@ -0,0 +1,81 @@
+"""
+Shared route dependencies: the organization a request works on and whether
+the user may use it.
+
+Owners pick an organization with ``?org_id=`` (their default organization
+otherwise) and must have created it; everyone else always works on their own
+organization and ``org_id`` is ignored. Ownership is answered from
+``lookup_service``'s owner registry, so an allowed request costs no query.
+
+Reports and histories also take an optional ``?date_from=&date_to=`` period.
+"""
+from datetime import date
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Depends, HTTPException
+
+from app.api.routes.auth import get_current_user
+from app.schemas.user import UserResponse
+from app.services import lookup_service
+
+
+def resolve_org_id(user: UserResponse, org_id: Optional[int] = None) -> Optional[int]:
+    """Organization the request works on, or None if the user has none"""
+    if user.role == "owner" and org_id and org_id != user.org_id:
+        if not lookup_service.owns_org(user.id, org_id):
+            raise HTTPException(status_code=403, detail="You do not own this organization")
+        return org_id
+    return user.org_id
+
+
+def date_range(date_from: Optional[date] = None, date_to: Optional[date] = None) -> Tuple[Optional[date], Optional[date]]:
+    """The ``date_from``/``date_to`` query parameters (inclusive days, either may be left out)"""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return date_from, date_to
+
+
+class OrgContext:
+    """The authenticated user and the organization the request works on"""
+
+    __slots__ = ("user", "org_id")
+
+    def __init__(self, user: UserResponse, org_id: Optional[int]):
+        self.user = user
+        self.org_id = org_id
+
+
+class OrgAccess:
+    """Dependency resolving the request's organization and checking access to it.
+
+    Owners and admins always have access. Employees need one of
+    ``employee_departments`` (None lets every employee in, an empty tuple
+    none). With ``required`` a request without an organization is a 400,
+    otherwise ``org_id`` is None.
+    """
+
+    def __init__(self, employee_departments: Optional[Iterable[str]] = None,
+                 detail: str = "Insufficient permissions", required: bool = True):
+        self.employee_departments = None if employee_departments is None else frozenset(employee_departments)
+        self.detail = detail
+        self.required = required
+
+    def allows(self, user: UserResponse) -> bool:
+        if user.role == "owner" or user.role == "admin":
+            return True
+        if user.role == "employee":
+            return self.employee_departments is None or user.department in self.employee_departments
+        return False
+
+    async def __call__(
+        self,
+        org_id: Optional[int] = None,
+        current_user: UserResponse = Depends(get_current_user)
+    ) -> OrgContext:
+        if not self.allows(current_user):
+            raise HTTPException(status_code=403, detail=self.detail)
+
+        target_org_id = resolve_org_id(current_user, org_id)
+        if not target_org_id and self.required:
+            raise HTTPException(status_code=400, detail="Organization ID required")
+        return OrgContext(current_user, target_org_id)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import auth, users, organizations, stock, sales, analytics, suppliers
+from app.api.routes import auth, users, organizations, stock, sales, analytics, suppliers, events
 
 api_router = APIRouter()
 
@@ -10,4 +10,5 @@ api_router.include_router(stock.router)
 api_router.include_router(sales.router)
 api_router.include_router(analytics.router)
 api_router.include_router(suppliers.router)
+api_router.include_router(events.router)
 
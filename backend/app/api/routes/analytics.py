@@ -1,45 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import List, Optional, Tuple
+from datetime import date
 from app.api.routes.auth import get_current_user
+from app.api.deps import OrgAccess, OrgContext, date_range
 from app.schemas.user import UserResponse
 from app.schemas.loss import LossCreate
-from app.services import analytics_service
+from app.services import analytics_service, version_service
+from app.core.responses import conditional_json_response, make_etag
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-def check_owner_access(user: UserResponse):
-    if user.role != "owner" and user.role != "admin": # Admin can view? Maybe just owner. Let's allow Admin for now.
-        raise HTTPException(status_code=403, detail="Restricted access")
+# Reports are for owners and admins; any member can report a loss
+owner_access = OrgAccess((), "Restricted access")
+member_access = OrgAccess()
 
 @router.post("/loss")
 async def report_loss(
     loss_data: LossCreate,
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(member_access)
 ):
     try:
-        target_org_id = org_id if org_id else current_user.org_id
-        # In a real app, verify user access to target_org_id here
-        analytics_service.report_loss(loss_data, current_user.id, target_org_id)
+        analytics_service.report_loss(loss_data, ctx.user.id, ctx.org_id)
         return {"message": "Loss reported successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/summary")
 async def get_summary(
-    org_id: int = None,
+    period: Tuple[Optional[date], Optional[date]] = Depends(date_range),
+    ctx: OrgContext = Depends(owner_access)
+):
+    return analytics_service.get_analytics_summary(ctx.org_id, *period)
+
+@router.get("/portfolio")
+async def get_portfolio(
+    period: Tuple[Optional[date], Optional[date]] = Depends(date_range),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    check_owner_access(current_user)
-    target_org_id = org_id if org_id else current_user.org_id
-    # Add simple check if user belongs to this org if not admin/owner
-    return analytics_service.get_analytics_summary(target_org_id)
+    """Summary of every organization the owner created, per org and in total"""
+    if current_user.role != "owner":
+        raise HTTPException(status_code=403, detail="Only owners have a portfolio")
+    return analytics_service.get_portfolio_summary(current_user.id, *period)
 
 @router.get("/losses")
 async def get_loss_history(
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    request: Request,
+    period: Tuple[Optional[date], Optional[date]] = Depends(date_range),
+    ctx: OrgContext = Depends(owner_access)
 ):
-    check_owner_access(current_user)
-    target_org_id = org_id if org_id else current_user.org_id
-    return analytics_service.get_loss_history(target_org_id)
+    target_org_id = ctx.org_id
+    version = version_service.get_data_version("losses", target_org_id)
+    etag = make_etag("losses", target_org_id, request.url.query, version)
+    return conditional_json_response(request, etag, lambda: analytics_service.get_loss_history(target_org_id, *period, cache_version=version))
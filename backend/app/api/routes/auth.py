@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.schemas.auth import UserRegister, UserLogin, Token
 from app.schemas.user import UserResponse
@@ -7,10 +7,13 @@ from app.services.auth_service import (
     create_user,
     authenticate_user,
     get_user_by_id,
-    create_access_token_for_user
+    create_access_token_for_user,
+    UserAlreadyExistsError
 )
 from app.core.security import decode_access_token
-from app.core.database import get_db_cursor
+from app.core.rate_limit import client_ip, get_login_limiter
+from starlette.concurrency import run_in_threadpool
+import math
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,19 +61,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
 async def register(user_data: UserRegister):
     """Register a new user (owner)"""
     try:
-        # Check if username already exists
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                SELECT id FROM users WHERE username = %s OR email = %s
-            """, (user_data.username, user_data.email))
-            
-            if cursor.fetchone():
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Username or email already exists"
-                )
-        
-        # Create user
+        # Create user (fails if the username or email is taken)
         user = create_user(
             email=user_data.email,
             username=user_data.username,
@@ -89,8 +80,11 @@ async def register(user_data: UserRegister):
             role=user.role
         )
     
-    except HTTPException:
-        raise
+    except UserAlreadyExistsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Registration error: {e}")
         raise HTTPException(
@@ -100,9 +94,21 @@ async def register(user_data: UserRegister):
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Login user and return JWT token"""
-    user = authenticate_user(form_data.username, form_data.password)
+    limiter = get_login_limiter()
+    if limiter is not None:
+        ip = client_ip(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+        retry_after = await run_in_threadpool(limiter.check, ip, form_data.username)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+    
+    # bcrypt takes a few hundred ms; keep it off the event loop
+    user = await run_in_threadpool(authenticate_user, form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
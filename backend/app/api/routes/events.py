@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from typing import Optional
+import asyncio
+from app.api.routes.auth import get_current_user
+from app.api.deps import resolve_org_id
+from app.schemas.user import UserResponse
+from app.core.config import settings
+from app.core.events import broker, RESOURCES
+from app.core.responses import dumps
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+
+async def get_stream_user(
+    token: Optional[str] = None,
+    header_token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> UserResponse:
+    """Like get_current_user, but also accepts ?token= since EventSource can't send headers"""
+    token = header_token or token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(token)
+
+
+def readable_resources(user: UserResponse):
+    """Event resources the user may see, mirroring the list endpoints' checks"""
+    if user.role == "owner" or user.role == "admin":
+        return RESOURCES
+    if user.role == "employee" and (user.department == "stock" or user.department == "sales"):
+        return ("stock", "sales", "shipments")
+    return ("shipments",)
+
+
+def format_event(event: dict) -> bytes:
+    name = event["type"] if event["resource"] is None else f"{event['resource']}.{event['type']}"
+    return b"event: " + name.encode() + b"\ndata: " + dumps(event["data"]) + b"\n\n"
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    org_id: int = None,
+    current_user: UserResponse = Depends(get_stream_user)
+):
+    """Server-Sent Events with the org's changes as they commit.
+
+    Event names are ``<resource>.<type>`` (e.g. ``stock.quantity``,
+    ``sales.created``) and the data is the changed record. Clients load the
+    lists once, then apply events. On ``<resource>.resync`` (a change too
+    big to relay between workers; no data) they load that list again, and on
+    ``resync`` (the client fell behind) all of them.
+    """
+    target_org_id = resolve_org_id(current_user, org_id)
+
+    if not target_org_id:
+        raise HTTPException(status_code=400, detail="Organization ID required")
+
+    subscription = broker.subscribe(target_org_id, readable_resources(current_user), settings.EVENT_STREAM_QUEUE_SIZE)
+
+    async def event_source():
+        try:
+            yield b"retry: 3000\nevent: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b": keep-alive\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
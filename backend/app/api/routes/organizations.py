@@ -3,6 +3,8 @@ from typing import List, Optional
 from pydantic import BaseModel
 from app.api.routes.auth import get_current_user
 from app.core.database import get_db_cursor
+from app.core.jobs import enqueue_job
+from app.core import audit
 from app.schemas.user import UserResponse
 from app.models.organization import Organization
 
@@ -41,13 +43,10 @@ async def create_organization(
         if not org_row:
             raise HTTPException(status_code=500, detail="Failed to create organization")
             
-        # Create default departments
-        cursor.execute("""
-            INSERT INTO departments (org_id, name, created_by)
-            VALUES 
-                (%s, 'stock', %s),
-                (%s, 'sales', %s)
-        """, (org_row['id'], current_user.id, org_row['id'], current_user.id))
+        # Default departments are created in the background; anything that
+        # needs one before the job runs creates it on the spot
+        enqueue_job(cursor, "org.create_default_departments", {"org_id": org_row['id'], "created_by": current_user.id})
+        audit.record(cursor, org_row['id'], current_user.id, "create", "organizations", org_row['id'], after={"name": org_row['name']})
         
         # If this is the user's first/only org, potentially update their default org_id?
         # For now, we prefer explicit context, so we might not force it, 
@@ -1,52 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from app.api.routes.auth import get_current_user
-from app.schemas.user import UserResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional, Tuple
+from datetime import date
+from app.api.deps import OrgAccess, OrgContext, date_range
 from app.schemas.sales import SaleCreate, SaleResponse
-from app.services import sales_service
+from app.services import sales_service, sync_service, version_service
+from app.core.responses import FastJSONResponse, conditional_json_response, make_etag
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
-def check_sales_access(user: UserResponse):
-    """Check if user has permission to record/view sales"""
-    if user.role == "owner" or user.role == "admin":
-        return True
-    if user.role == "employee" and (user.department == "sales" or user.department == "stock"):
-        return True
-    raise HTTPException(status_code=403, detail="Insufficient permissions for sales management")
+# Who may record and view sales
+sales_access = OrgAccess(("sales", "stock"), "Insufficient permissions for sales management")
+sales_read_access = OrgAccess(("sales", "stock"), "Insufficient permissions for sales management", required=False)
 
 @router.post("/", response_model=SaleResponse, status_code=status.HTTP_201_CREATED)
 async def record_sale(
     sale_data: SaleCreate,
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(sales_access)
 ):
-    check_sales_access(current_user)
-    
-    target_org_id = current_user.org_id
-    if current_user.role == "owner" and org_id:
-        target_org_id = org_id
-        
-    if not target_org_id:
-        raise HTTPException(status_code=400, detail="Organization ID required")
-        
     try:
-        return sales_service.create_sale(sale_data, current_user.id, target_org_id)
+        return sales_service.create_sale(sale_data, ctx.user.id, ctx.org_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=List[SaleResponse])
 async def get_sales(
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    request: Request,
+    since: Optional[str] = None,
+    period: Tuple[Optional[date], Optional[date]] = Depends(date_range),
+    ctx: OrgContext = Depends(sales_read_access)
 ):
-    check_sales_access(current_user)
-    
-    target_org_id = current_user.org_id
-    if current_user.role == "owner" and org_id:
-        target_org_id = org_id
-        
+    """List sales, optionally of a period; with ``since`` only the changes after that sync cursor"""
+    target_org_id = ctx.org_id
     if not target_org_id:
         return []
         
-    return sales_service.get_sales_history(target_org_id)
+    if since is not None:
+        try:
+            since_ts = sync_service.decode_cursor(since)
+        except sync_service.SyncCursorExpired as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(sales_service.get_sales_changes(target_org_id, since_ts))
+        
+    version = version_service.get_data_version("sales", target_org_id)
+    etag = make_etag("sales", target_org_id, request.url.query, version)
+    return conditional_json_response(request, etag, lambda: sales_service.get_sales_history(target_org_id, *period, cache_version=version))
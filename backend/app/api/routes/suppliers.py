@@ -1,89 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from app.api.routes.auth import get_current_user
-from app.schemas.user import UserResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import List, Optional
+from datetime import date
+from app.api.deps import OrgAccess, OrgContext
 from app.schemas.supplier import (
     SupplierCreate, SupplierResponse,
     ShipmentCreate, ShipmentResponse, ShipmentRate, ShipmentUpdateStatus
 )
-from app.services import supplier_service
+from app.services import supplier_service, sync_service, version_service
+from app.core.responses import FastJSONResponse, conditional_json_response, make_etag
 
 router = APIRouter(tags=["suppliers"])
 
+MAX_SHIPMENTS_PAGE = 500
+
+# Every member works with suppliers and shipments; rating is for owners and admins
+member_access = OrgAccess()
+rating_access = OrgAccess((), "Only Admins/Owners can rate shipments")
+
 # --- Suppliers Endpoints ---
 
 @router.post("/suppliers", response_model=SupplierResponse)
 async def create_supplier(
     data: SupplierCreate,
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(member_access)
 ):
     try:
-        target_org_id = org_id if org_id else current_user.org_id
-        return supplier_service.create_supplier(data, target_org_id)
+        return supplier_service.create_supplier(data, ctx.org_id, actor_id=ctx.user.id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/suppliers", response_model=List[SupplierResponse])
 async def get_suppliers(
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(member_access)
 ):
-    target_org_id = org_id if org_id else current_user.org_id
-    return supplier_service.get_suppliers(target_org_id)
+    return FastJSONResponse(supplier_service.get_suppliers(ctx.org_id))
 
 # --- Shipments Endpoints ---
 
 @router.post("/shipments", response_model=ShipmentResponse)
 async def create_shipment(
     data: ShipmentCreate,
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(member_access)
 ):
     try:
-        target_org_id = org_id if org_id else current_user.org_id
-        return supplier_service.create_shipment(data, target_org_id)
+        return supplier_service.create_shipment(data, ctx.org_id, actor_id=ctx.user.id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/shipments", response_model=List[ShipmentResponse])
 async def get_shipments(
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    request: Request,
+    since: Optional[str] = None,
+    status: Optional[str] = None,
+    supplier_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    ctx: OrgContext = Depends(member_access)
 ):
-    target_org_id = org_id if org_id else current_user.org_id
-    return supplier_service.get_shipments(target_org_id)
+    """List shipments; with ``since`` only the changes after that sync cursor.
+
+    ``status`` (comma-separated, ``Late`` included), ``supplier_id`` and an
+    ``expected_date`` range filter the list. With ``limit`` the list is paged
+    by (expected_date, id); pass the ``X-Next-Cursor`` response header back
+    as ``cursor`` for the next page.
+    """
+    target_org_id = ctx.org_id
+    if since is not None:
+        try:
+            since_ts = sync_service.decode_cursor(since)
+        except sync_service.SyncCursorExpired as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(supplier_service.get_shipment_changes(target_org_id, since_ts))
+    # Lateness is relative to today
+    version = version_service.get_data_version("shipments", target_org_id)
+    etag = make_etag("shipments", target_org_id, request.url.query, date.today(), version)
+    if not (status or supplier_id or date_from or date_to or limit or cursor):
+        return conditional_json_response(request, etag, lambda: supplier_service.get_shipments(target_org_id, cache_version=version))
+
+    try:
+        after = supplier_service.decode_page_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if limit is not None:
+        limit = max(1, min(limit, MAX_SHIPMENTS_PAGE))
+
+    next_cursor = None
+
+    def load():
+        nonlocal next_cursor
+        # One extra row tells whether there is a next page
+        rows = supplier_service.list_shipments(
+            target_org_id, status=status, supplier_id=supplier_id, date_from=date_from, date_to=date_to,
+            limit=limit + 1 if limit else None, after=after, cache_version=version
+        )
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = supplier_service.encode_page_cursor(rows[-1])
+        return rows
+
+    response = conditional_json_response(request, etag, load)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
-@router.patch("/shipments/{id}/status")
+@router.patch("/shipments/{id}/status", response_model=ShipmentResponse)
 async def update_shipment_status(
     id: int,
     data: ShipmentUpdateStatus,
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(member_access)
 ):
     try:
-        target_org_id = org_id if org_id else current_user.org_id
-        supplier_service.update_shipment_status(id, data, target_org_id)
-        return {"message": "Status updated"}
+        shipment = supplier_service.update_shipment_status(id, data, ctx.org_id, actor_id=ctx.user.id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if shipment is None:
+        raise HTTPException(status_code=404, detail="Shipment not found")
+    return shipment
 
 @router.post("/shipments/{id}/rate", response_model=ShipmentResponse)
 async def rate_shipment(
     id: int,
     data: ShipmentRate,
-    org_id: int = None,
-    current_user: UserResponse = Depends(get_current_user)
+    ctx: OrgContext = Depends(rating_access)
 ):
-    # Allowed for owner, admin, and potentially stock lead in future?
-    # User said "owner can also give rating... viewed as admin or stock".
-    # Previous restriction: if current_user.role not in ["owner", "admin"]
-    # I will keep the restriction for RATING to Owner/Admin as per Plan, but Stock can View.
-    if current_user.role not in ["owner", "admin"]:
-        raise HTTPException(status_code=403, detail="Only Admins/Owners can rate shipments")
-    
     try:
-        target_org_id = org_id if org_id else current_user.org_id
-        return supplier_service.rate_shipment(id, data, target_org_id)
+        shipment = supplier_service.rate_shipment(id, data, ctx.org_id, actor_id=ctx.user.id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if shipment is None:
+        raise HTTPException(status_code=404, detail="Shipment not found")
+    return shipment
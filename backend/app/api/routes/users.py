@@ -1,31 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from psycopg2.extras import NamedTupleCursor
 from app.api.routes.auth import get_current_user
-from app.schemas.user import UserResponse
+from app.api.deps import resolve_org_id
+from app.schemas.user import UserResponse, UserBulkResponse
 from app.schemas.auth import UserRegister
-from app.services.auth_service import create_org_user, get_db_cursor
-from app.models.user import User
+from app.services.auth_service import create_org_user, create_org_users_bulk, get_db_cursor, UserAlreadyExistsError
+from app.core.responses import FastJSONResponse
+from app.core.cache import invalidate_org
+from app.core import audit
+from app.services import lookup_service, principal_service, sync_service
+from app.services.org_service import ensure_departments
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+MAX_BULK_USERS = 500
+
 class UserCreateRequest(UserRegister):
     department: Optional[str] = None
 
+class UserBulkCreateRequest(BaseModel):
+    users: List[UserCreateRequest] = Field(..., min_length=1, max_length=MAX_BULK_USERS)
+
 class DepartmentUpdateRequest(BaseModel):
     department: str
 
-@router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_new_user(
-    user_data: UserCreateRequest,
-    role: str,
-    org_id: Optional[int] = None,
-    current_user: UserResponse = Depends(get_current_user)
-):
+def resolve_creation_org(current_user: UserResponse, role: str, org_id: Optional[int]) -> int:
     """
-    Create a new user (admin or employee).
-    Owners must specify org_id (and own it).
-    Admins create in their own org.
+    Organization the current user may create users of this role in.
+    Owners must specify org_id (and own it). Admins create in their own org.
     """
     # 1. Permission Check
     if current_user.role == "owner":
@@ -40,31 +45,29 @@ async def create_new_user(
     if not current_user.org_id and current_user.role != "owner":
          raise HTTPException(status_code=400, detail="Current user does not belong to an organization")
 
-    # Determine validation logic for target organization
-    target_org_id = current_user.org_id
-    
-    with get_db_cursor() as cursor:
-        if current_user.role == "owner":
-            if not org_id:
-                 raise HTTPException(status_code=400, detail="Organization ID is required for owners")
-            
-            # Verify ownership
-            cursor.execute("SELECT id FROM organizations WHERE id = %s AND created_by = %s", (org_id, current_user.id))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=403, detail="You do not own this organization")
-            target_org_id = org_id
-        else:
-            # Admins always use their assigned org
-            target_org_id = current_user.org_id
+    if current_user.role == "owner" and not org_id:
+        raise HTTPException(status_code=400, detail="Organization ID is required for owners")
 
-    try:
-        # Check uniqueness
-        with get_db_cursor() as cursor:
-            cursor.execute("SELECT id FROM users WHERE username = %s OR email = %s", (user_data.username, user_data.email))
-            if cursor.fetchone():
-                raise HTTPException(status_code=400, detail="Username or email already exists")
+    # Owners must own org_id; admins always use their assigned org
+    return resolve_org_id(current_user, org_id)
 
-        # Create User
+
+@router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def create_new_user(
+    user_data: UserCreateRequest,
+    role: str,
+    org_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Create a new user (admin or employee).
+    Owners must specify org_id (and own it).
+    Admins create in their own org.
+    """
+    target_org_id = resolve_creation_org(current_user, role, org_id)
+
+    try:
+        # Create User (fails if the username or email is taken)
         new_user = create_org_user(
             email=user_data.email,
             username=user_data.username,
@@ -72,7 +75,8 @@ async def create_new_user(
             full_name=user_data.full_name,
             role=role,
             org_id=target_org_id,
-            department_name=user_data.department
+            department_name=user_data.department,
+            actor_id=current_user.id
         )
         
         return UserResponse(
@@ -87,12 +91,39 @@ async def create_new_user(
             department=getattr(new_user, 'department', None)
         )
 
+    except UserAlreadyExistsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/bulk", response_model=UserBulkResponse)
+async def create_users_bulk(
+    data: UserBulkCreateRequest,
+    role: str,
+    org_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Create up to MAX_BULK_USERS users of one role at once.
+    Rows that can't be created (taken username or email, unknown department)
+    are listed in ``errors`` by their index; the rest are created.
+    """
+    target_org_id = resolve_creation_org(current_user, role, org_id)
+
+    try:
+        # Password hashing takes seconds for a large batch; keep it off the event loop
+        created, errors = await run_in_threadpool(
+            create_org_users_bulk, [user.model_dump() for user in data.users], role, target_org_id, current_user.id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return FastJSONResponse({"created": created, "errors": errors})
+
+
 @router.get("/", response_model=List[UserResponse])
 async def get_users_by_role(
     role: str = None,
@@ -102,47 +133,15 @@ async def get_users_by_role(
     """
     Get all users in the specified organization (for owners) or current org (for others).
     """
-    target_org_id = current_user.org_id
-
-    with get_db_cursor() as cursor:
-        if current_user.role == "owner":
-            if org_id:
-                # Verify ownership
-                cursor.execute("SELECT id FROM organizations WHERE id = %s AND created_by = %s", (org_id, current_user.id))
-                if not cursor.fetchone():
-                    # Fallback or empty? Let's raise explicit error or return empty to be safe.
-                    # Raising error is clearer.
-                     raise HTTPException(status_code=403, detail="You do not own this organization")
-                target_org_id = org_id
-            else:
-                # If no org_id passed, owner gets users from their default org? 
-                # Or maybe all their orgs? For now let's stick to single org view per request.
-                pass 
-        
-        if not target_org_id:
-             raise HTTPException(status_code=400, detail="Organization context missing")
+    # Owners see one organization per request: org_id (which they must own) or their default
+    target_org_id = resolve_org_id(current_user, org_id)
+    if not target_org_id:
+         raise HTTPException(status_code=400, detail="Organization context missing")
 
-        query = """
-            SELECT u.id, u.org_id, u.email, u.password_hash, u.username, u.full_name, u.is_active, u.created_at, 
-                   r.name as role, d.name as department, o.name as org_name
-            FROM users u
-            LEFT JOIN user_roles ur ON u.id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.id
-            LEFT JOIN user_departments ud ON u.id = ud.user_id
-            LEFT JOIN departments d ON ud.department_id = d.id
-            LEFT JOIN organizations o ON u.org_id = o.id
-            WHERE u.org_id = %s
-        """
-        params = [target_org_id]
-
-        if role:
-            query += " AND r.name = %s"
-            params.append(role)
-        
-        cursor.execute(query, tuple(params))
-        users_data = cursor.fetchall()
-        
-        return [User.from_dict(user) for user in users_data]
+    with get_db_cursor(cursor_factory=NamedTupleCursor) as cursor:
+        rows = principal_service.list_org_users(cursor, target_org_id, role)
+        # Rows already match UserResponse (no password hash selected)
+        return FastJSONResponse(rows)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -158,22 +157,15 @@ async def delete_user(
 
     with get_db_cursor() as cursor:
         # Get target user role and org
-        cursor.execute("""
-            SELECT u.org_id, r.name as role 
-            FROM users u
-            LEFT JOIN user_roles ur ON u.id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.id
-            WHERE u.id = %s
-        """, (user_id,))
-        target_user = cursor.fetchone()
+        target_user = principal_service.get_by_id(cursor, user_id)
         
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
             
-        if target_user['org_id'] != current_user.org_id:
+        if target_user.org_id != current_user.org_id:
             raise HTTPException(status_code=403, detail="Cannot delete user from another organization")
             
-        target_role = target_user['role']
+        target_role = target_user.role
         
         # Permission logic
         if current_user.role == "owner":
@@ -187,6 +179,13 @@ async def delete_user(
             
         # Perform delete
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        audit.record(cursor, current_user.org_id, current_user.id, "delete", "users", user_id, before={
+            "username": target_user.username, "email": target_user.email,
+            "role": target_role, "department": target_user.department
+        })
+        sync_service.record_deletion(cursor, current_user.org_id, "users", user_id)
+        # Sales and losses show the seller/reporter name
+        invalidate_org(current_user.org_id, "sales", "losses", cursor=cursor)
 
 
 @router.patch("/{user_id}/department", response_model=UserResponse)
@@ -209,21 +208,17 @@ async def update_user_department(
 
     with get_db_cursor() as cursor:
         # Verify user exists and is in same org
-        cursor.execute("SELECT id FROM users WHERE id = %s AND org_id = %s", (user_id, current_user.org_id))
-        if not cursor.fetchone():
+        target_user = principal_service.get_by_id(cursor, user_id)
+        if not target_user or target_user.org_id != current_user.org_id:
             raise HTTPException(status_code=404, detail="User not found in your organization")
 
         # Get department ID
-        cursor.execute("SELECT id FROM departments WHERE name = %s AND org_id = %s", (data.department, current_user.org_id))
-        dept_data = cursor.fetchone()
+        dept_id = lookup_service.department_id(cursor, current_user.org_id, data.department)
         
-        if not dept_data:
+        if dept_id is None:
             # If default departments are missing for some reason, create them (fallback)
-            cursor.execute("INSERT INTO departments (name, org_id, created_by) VALUES (%s, %s, %s) RETURNING id", 
-                           (data.department, current_user.org_id, current_user.id))
-            dept_id = cursor.fetchone()['id']
-        else:
-            dept_id = dept_data['id']
+            ensure_departments(cursor, current_user.org_id, [data.department], current_user.id)
+            dept_id = lookup_service.department_id(cursor, current_user.org_id, data.department)
             
         # Update link
         cursor.execute("""
@@ -237,27 +232,7 @@ async def update_user_department(
             DELETE FROM user_departments 
             WHERE user_id = %s AND department_id != %s
         """, (user_id, dept_id))
+        audit.record(cursor, current_user.org_id, current_user.id, "update", "users", user_id,
+                     before={"department": target_user.department}, after={"department": data.department})
         
-        # Return updated user
-        # (Re-use existing get logic or just fetch manually)
-        # For simplicity, returning the user object by re-fetching
-        pass
-    
-    # Re-fetch user to return
-    # This calls get_current_user equivalent but for specific ID.
-    # We can just call get_user_by_id logic from service, but we didn't expose it to API directly.
-    # Let's duplicate the fetch logic briefly or refactor. 
-    # Actually, let's use the DB cursor we have.
-    with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT u.id, u.org_id, u.email, u.password_hash, u.username, u.full_name, u.is_active, u.created_at, 
-                   r.name as role, d.name as department
-            FROM users u
-            LEFT JOIN user_roles ur ON u.id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.id
-            LEFT JOIN user_departments ud ON u.id = ud.user_id
-            LEFT JOIN departments d ON ud.department_id = d.id
-            WHERE u.id = %s
-        """, (user_id,))
-        user_data = cursor.fetchone()
-        return User.from_dict(user_data)
+        return principal_service.get_by_id(cursor, user_id)
@@ -0,0 +1,157 @@
+"""
+Append-only audit log of who changed what.
+
+Services call ``record(cursor, org_id, actor_id, action, entity, entity_id,
+before=..., after=...)`` in the transaction that makes the change. When it
+commits, the entry goes into an in-memory buffer; a background thread writes
+the buffer to ``audit_log`` with one multi-row INSERT per batch, every
+``AUDIT_FLUSH_INTERVAL_SECONDS`` or as soon as ``AUDIT_BATCH_SIZE`` entries
+are waiting. A write therefore only pays for a list append.
+
+For updates only the fields that changed are kept, as ``before`` and
+``after`` objects. Entries still buffered when a process is killed are lost;
+a failed flush is retried, and entries beyond ``AUDIT_MAX_BUFFER`` are dropped
+with a warning rather than growing memory without bound.
+"""
+import atexit
+import collections
+import functools
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import logging
+
+from psycopg2.extras import Json, execute_values
+
+from app.core.config import settings
+from app.core.database import get_db_cursor, on_commit
+
+logger = logging.getLogger(__name__)
+
+_buffer: collections.deque = collections.deque()
+_buffer_lock = threading.Lock()
+_wakeup = threading.Event()
+_writer: Optional["AuditWriter"] = None
+_writer_lock = threading.Lock()
+
+_dumps = functools.partial(json.dumps, default=str)
+
+
+def diff(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """``(before, after)`` reduced to the fields whose values differ"""
+    if before is None or after is None:
+        return before, after
+    changed = [key for key in after if key in before and before[key] != after[key]]
+    return {key: before[key] for key in changed}, {key: after[key] for key in changed}
+
+
+def record(cursor, org_id: Optional[int], actor_id: Optional[int], action: str, entity: str,
+           entity_id: Optional[int], before: Optional[Dict[str, Any]] = None,
+           after: Optional[Dict[str, Any]] = None):
+    """Log a change once the cursor's transaction commits.
+
+    ``before``/``after`` are JSON-ready dicts (or Pydantic models); pass both
+    for an update, ``after`` for a creation and ``before`` for a deletion.
+    """
+    if not settings.AUDIT_ENABLED:
+        return
+    if hasattr(before, "model_dump"):
+        before = before.model_dump(mode="json")
+    if hasattr(after, "model_dump"):
+        after = after.model_dump(mode="json")
+    before, after = diff(before, after)
+    if before == {} and after == {}:
+        # An update that changed nothing
+        return
+
+    def enqueue():
+        entry = (org_id, actor_id, action, entity, entity_id, before, after, datetime.now(timezone.utc))
+        with _buffer_lock:
+            if len(_buffer) >= settings.AUDIT_MAX_BUFFER:
+                logger.warning(f"Audit buffer full, dropping {action} {entity} {entity_id}")
+                return
+            _buffer.append(entry)
+            full = len(_buffer) >= settings.AUDIT_BATCH_SIZE
+        _ensure_writer()
+        if full:
+            _wakeup.set()
+
+    on_commit(cursor, enqueue)
+
+
+def flush() -> int:
+    """Write one batch of buffered entries; returns how many were written"""
+    with _buffer_lock:
+        batch = [_buffer.popleft() for _ in range(min(len(_buffer), settings.AUDIT_BATCH_SIZE))]
+    if not batch:
+        return 0
+    try:
+        with get_db_cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO audit_log (org_id, actor_id, action, entity, entity_id, before, after, created_at)
+                VALUES %s
+            """, [
+                (org_id, actor_id, action, entity, entity_id,
+                 Json(before, dumps=_dumps) if before is not None else None,
+                 Json(after, dumps=_dumps) if after is not None else None,
+                 created_at)
+                for org_id, actor_id, action, entity, entity_id, before, after, created_at in batch
+            ], page_size=len(batch))
+    except Exception:
+        # Put the batch back in front for the next attempt
+        with _buffer_lock:
+            _buffer.extendleft(reversed(batch))
+        raise
+    return len(batch)
+
+
+class AuditWriter(threading.Thread):
+    """Flushes the buffer periodically, or early once a full batch is waiting"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="audit-writer", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        _wakeup.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            _wakeup.clear()
+            try:
+                while flush() >= settings.AUDIT_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+            _wakeup.wait(self.interval)
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(settings.AUDIT_FLUSH_INTERVAL_SECONDS)
+                _writer.start()
+
+
+def stop_writer():
+    """Stop the writer and write whatever is still buffered"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+        writer.join(timeout=10)
+    try:
+        while flush():
+            pass
+    except Exception as e:
+        logger.error(f"Final audit flush failed, {len(_buffer)} entries lost: {e}")
+
+
+# Scripts and workers that never run the app's shutdown still flush on exit
+atexit.register(stop_writer)
@@ -0,0 +1,292 @@
+"""
+Per-org read-through cache for list and analytics reads.
+
+Read functions are wrapped with ``@cached("<namespace>")`` and must take the
+org id as their first argument. Write paths call ``invalidate_org`` with the
+namespaces they affect; given the write's cursor the entries are dropped only
+after the transaction commits, so a write is visible to the very next read.
+
+Every org/namespace pair carries a generation number that invalidation bumps.
+A read records the generation before querying and its result is only stored
+if no invalidation happened meanwhile, so a slow read racing a write can't
+put pre-write data back into the cache.
+
+With the in-memory backend each uvicorn worker has its own cache, so
+invalidations are also broadcast on the ``cache_invalidate`` NOTIFY channel
+(sent by PostgreSQL on commit) and applied by every other worker's listener.
+
+An invalidation with a cursor also bumps the org's counters in
+``data_versions`` in the writing transaction; those counters are the data
+versions behind list ETags (see ``version_service``). A read passes the
+version it built its ETag from as ``cache_version``, and an entry cached
+for another version counts as a miss. A body is therefore never served
+under a newer ETag, even in the moment between a commit and the drop of
+the stale entry here or in another worker.
+"""
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+import logging
+
+from app.core.config import settings
+from app.core.database import on_commit
+from app.core import notifications, prepared, replica
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class InMemoryCache:
+    """Thread-safe LRU with a per-entry TTL and an entry-count bound"""
+
+    shared = False
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._keys_by_org: Dict[int, Set[Tuple]] = {}
+        self._generations: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, org_id: int, namespace: str, key: Hashable) -> Any:
+        full_key = (org_id, namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(full_key)
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, org_id: int, namespace: str) -> int:
+        return self._generations.get((org_id, namespace), 0)
+
+    def set(self, org_id: int, namespace: str, key: Hashable, value: Any, generation: int):
+        full_key = (org_id, namespace, key)
+        with self._lock:
+            if self._generations.get((org_id, namespace), 0) != generation:
+                return
+            self._entries[full_key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(full_key)
+            self._keys_by_org.setdefault(org_id, set()).add(full_key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate(self, org_id: int, namespaces: Iterable[str] = ()):
+        namespaces = set(namespaces or NAMESPACES)
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[(org_id, namespace)] = self._generations.get((org_id, namespace), 0) + 1
+            for full_key in list(self._keys_by_org.get(org_id, ())):
+                if full_key[1] in namespaces:
+                    self._remove(full_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_org.clear()
+
+    def _remove(self, full_key: Tuple):
+        self._entries.pop(full_key, None)
+        org_keys = self._keys_by_org.get(full_key[0])
+        if org_keys is not None:
+            org_keys.discard(full_key)
+            if not org_keys:
+                del self._keys_by_org[full_key[0]]
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": "memory", "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RedisCache:
+    """Redis-compatible backend shared by all workers.
+
+    Invalidation bumps a per-org, per-namespace generation number that is part
+    of every key, so stale entries are simply never read again and expire
+    through their TTL.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, ttl: int):
+        import redis  # optional dependency
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _generation_key(self, org_id: int, namespace: str) -> str:
+        return f"bizit:gen:{org_id}:{namespace}"
+
+    def _data_key(self, org_id: int, namespace: str, key: Hashable, generation: str) -> str:
+        return f"bizit:cache:{org_id}:{namespace}:{generation}:{key!r}"
+
+    def generation(self, org_id: int, namespace: str) -> str:
+        return (self.client.get(self._generation_key(org_id, namespace)) or b"0").decode()
+
+    def get(self, org_id: int, namespace: str, key: Hashable) -> Any:
+        generation = self.generation(org_id, namespace)
+        raw = self.client.get(self._data_key(org_id, namespace, key, generation))
+        if raw is None:
+            self.misses += 1
+            return _MISSING
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, org_id: int, namespace: str, key: Hashable, value: Any, generation: str):
+        # Entries from ``cached`` are (cache_version, result) pairs, and cursor
+        # named tuples in a result are generated classes that can't be pickled
+        if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], list):
+            value = (value[0], [row._asdict() if hasattr(row, "_asdict") else row for row in value[1]])
+        self.client.setex(self._data_key(org_id, namespace, key, generation), self.ttl, pickle.dumps(value))
+
+    def invalidate(self, org_id: int, namespaces: Iterable[str] = ()):
+        for namespace in namespaces or NAMESPACES:
+            self.client.incr(self._generation_key(org_id, namespace))
+
+    def clear(self):
+        for key in self.client.scan_iter("bizit:*"):
+            self.client.delete(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+class NullCache:
+    """Caching disabled"""
+
+    shared = True
+
+    def get(self, org_id, namespace, key):
+        return _MISSING
+
+    def generation(self, org_id, namespace):
+        return 0
+
+    def set(self, org_id, namespace, key, value, generation):
+        pass
+
+    def invalidate(self, org_id, namespaces=()):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "none"}
+
+
+NAMESPACES = ("stock", "sales", "losses", "analytics", "suppliers", "shipments")
+
+INVALIDATION_CHANNEL = "cache_invalidate"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Cache backend selected by ``CACHE_BACKEND``, created on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = settings.CACHE_BACKEND
+                if backend == "redis" and settings.REDIS_URL:
+                    _cache = RedisCache(settings.REDIS_URL, settings.CACHE_TTL_SECONDS)
+                elif backend in ("memory", "redis"):
+                    if backend == "redis":
+                        logger.warning("CACHE_BACKEND=redis but REDIS_URL is not set, using in-memory cache")
+                    _cache = InMemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+                else:
+                    _cache = NullCache()
+    return _cache
+
+
+def cached(namespace: str):
+    """Cache the result of ``fn(org_id, *args, **kwargs)`` per org and arguments.
+
+    The wrapper also takes ``cache_version``: an entry stored under another
+    version is not used.
+    """
+    def decorator(fn: Callable):
+        @functools.wraps(fn)
+        def wrapper(org_id: int, *args, cache_version: Optional[str] = None, **kwargs):
+            cache = get_cache()
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            entry = cache.get(org_id, namespace, key)
+            if entry is not _MISSING and (cache_version is None or entry[0] == cache_version):
+                return entry[1]
+            generation = cache.generation(org_id, namespace)
+            value = fn(org_id, *args, **kwargs)
+            cache.set(org_id, namespace, key, (cache_version, value), generation)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
+
+
+def invalidate_org(org_id: Optional[int], *namespaces: str, cursor=None):
+    """Drop cached reads for ``org_id`` in ``namespaces`` (all when none given).
+
+    With ``cursor`` the drop waits for that transaction to commit, and other
+    workers are told to drop theirs through NOTIFY.
+    """
+    if org_id is None:
+        return
+
+    cache = get_cache()
+    namespaces = tuple(namespaces)
+
+    def drop():
+        cache.invalidate(org_id, namespaces)
+
+    if cursor is not None:
+        bump_versions(cursor, org_id, namespaces or NAMESPACES)
+        on_commit(cursor, drop)
+        replica.note_write(cursor, org_id)
+        if not cache.shared:
+            notifications.publish(cursor, INVALIDATION_CHANNEL, {"org_id": org_id, "namespaces": list(namespaces)})
+    else:
+        drop()
+
+
+def bump_versions(cursor, org_id: int, namespaces: Iterable[str]):
+    """Advance the org's data versions of ``namespaces`` in the cursor's transaction.
+
+    The rows stay locked until commit, so concurrent writers to the same
+    org and namespace bump one after the other; the sorted order keeps two
+    writers from locking the same rows in opposite orders.
+    """
+    prepared.execute(cursor, """
+        INSERT INTO data_versions AS v (org_id, namespace, version)
+        SELECT %s, namespace, 1 FROM unnest(%s::text[]) AS namespace ORDER BY namespace
+        ON CONFLICT (org_id, namespace) DO UPDATE SET version = v.version + 1
+    """, (org_id, sorted(set(namespaces))))
+
+
+def _on_remote_invalidation(payload: dict):
+    get_cache().invalidate(payload["org_id"], payload.get("namespaces") or ())
+
+
+def _on_reconnect():
+    # A shared backend's generations don't depend on notifications reaching this worker
+    cache = get_cache()
+    if not cache.shared:
+        cache.clear()
+
+
+notifications.subscribe(INVALIDATION_CHANNEL, _on_remote_invalidation)
+notifications.on_reconnect(_on_reconnect)
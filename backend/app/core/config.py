@@ -5,6 +5,11 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    # Optional streaming replica for list and report queries (see app.core.replica).
+    # An org written to in the last READ_REPLICA_STICKY_SECONDS reads from the
+    # primary; keep it above the replica's usual lag.
+    READ_DATABASE_URL: Optional[str] = None
+    READ_REPLICA_STICKY_SECONDS: float = 5.0
     
     # JWT
     SECRET_KEY: str
@@ -15,6 +20,72 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     ENVIRONMENT: str = "development"
     
+    # Responses smaller than this (bytes) are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    
+    # Read cache: "memory", "redis" (needs REDIS_URL) or "none"
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: int = 30
+    CACHE_MAX_ENTRIES: int = 2048
+    REDIS_URL: Optional[str] = None
+    
+    # Background LISTEN/NOTIFY listener for cross-worker cache invalidation
+    DB_NOTIFICATIONS_ENABLED: bool = True
+    
+    # Live event stream (/api/events/stream)
+    EVENT_STREAM_QUEUE_SIZE: int = 256
+    EVENT_STREAM_HEARTBEAT_SECONDS: int = 15
+    
+    # Delta sync (?since=): overlap re-read before each cursor, tombstone lifetime
+    SYNC_OVERLAP_SECONDS: int = 30
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    
+    # Background jobs (outbox). Turn the in-process worker off when running run_worker.py
+    JOB_WORKER_ENABLED: bool = True
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_BATCH_SIZE: int = 20
+    JOB_LOCK_TIMEOUT_SECONDS: int = 300
+    JOB_MAX_BACKOFF_SECONDS: int = 600
+    JOB_RETENTION_DAYS: int = 7
+    
+    # Reorder suggestions (draft shipments for low stock)
+    REORDER_SCAN_INTERVAL_SECONDS: int = 3600
+    REORDER_ORGS_PER_BATCH: int = 200
+    REORDER_DEFAULT_LEAD_DAYS: int = 7
+    
+    # Login rate limiting per client IP and per username: "memory" (per worker)
+    # or "postgres" (shared by all workers). A burst or rate of 0 turns that
+    # bucket off.
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_BACKEND: str = "memory"
+    LOGIN_IP_BURST: int = 20
+    LOGIN_IP_PER_MINUTE: float = 30
+    LOGIN_USERNAME_BURST: int = 10
+    LOGIN_USERNAME_PER_MINUTE: float = 10
+    # The client IP is the connection's peer address. Behind a reverse proxy
+    # that is the proxy, so every client would share one bucket: list the
+    # proxies' addresses or networks (comma-separated, "*" for any) to take
+    # the client from their X-Forwarded-For instead. Only list proxies that
+    # overwrite or append to that header, or clients can pick their own IP.
+    LOGIN_TRUSTED_PROXIES: str = ""
+    
+    # Audit log: entries are buffered in memory and written in batches
+    AUDIT_ENABLED: bool = True
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_MAX_BUFFER: int = 50000
+    
+    # Monthly sales/losses partitions: months created ahead of time, and months
+    # kept before a partition is archived to PARTITION_ARCHIVE_DIR (0 keeps all)
+    PARTITION_PREMAKE_MONTHS: int = 3
+    PARTITION_RETENTION_MONTHS: int = 0
+    PARTITION_ARCHIVE_DIR: str = "archive"
+    
+    # Server-side prepared statements for hot queries (app.core.prepared);
+    # turn off behind a transaction-pooling PgBouncer
+    PREPARED_STATEMENTS_ENABLED: bool = True
+    PREPARED_STATEMENTS_MAX: int = 200
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,22 +1,29 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import ThreadedConnectionPool
 from contextlib import contextmanager
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Connection pool
-pool: Optional[SimpleConnectionPool] = None
+# Threaded: background workers (jobs) share the pool with request handling
+pool: Optional[ThreadedConnectionPool] = None
+
+# Optional second pool on a read replica (READ_DATABASE_URL), see app.core.replica
+read_pool: Optional[ThreadedConnectionPool] = None
+
+# Callbacks waiting for the current transaction of a connection to commit
+_commit_hooks: Dict[int, List[Callable[[], None]]] = {}
 
 
 def init_db_pool():
     """Initialize database connection pool"""
-    global pool
+    global pool, read_pool
     try:
-        pool = SimpleConnectionPool(
+        pool = ThreadedConnectionPool(
             minconn=1,
             maxconn=10,
             dsn=settings.DATABASE_URL,
@@ -27,40 +34,80 @@ def init_db_pool():
         logger.error(f"Error initializing database pool: {e}")
         raise
 
+    if settings.READ_DATABASE_URL and read_pool is None:
+        try:
+            read_pool = ThreadedConnectionPool(
+                minconn=1,
+                maxconn=10,
+                dsn=settings.READ_DATABASE_URL,
+                cursor_factory=RealDictCursor
+            )
+            logger.info("Read replica connection pool initialized")
+        except Exception as e:
+            # Reads fall back to the primary rather than keeping the app down
+            logger.error(f"Error initializing read replica pool, reading from the primary: {e}")
+
 
 def close_db_pool():
     """Close all database connections"""
-    global pool
+    global pool, read_pool
     if pool:
         pool.closeall()
+        pool = None
         logger.info("Database connection pool closed")
+    if read_pool:
+        read_pool.closeall()
+        read_pool = None
 
 
 @contextmanager
-def get_db_connection():
-    """Get database connection from pool"""
+def get_db_connection(replica: bool = False):
+    """Get database connection from pool (the read replica's with ``replica``, if there is one)"""
     if pool is None:
         init_db_pool()
     
-    conn = pool.getconn()
+    source = read_pool if replica and read_pool is not None else pool
+    conn = source.getconn()
     try:
         yield conn
     finally:
-        pool.putconn(conn)
+        source.putconn(conn)
 
 
 @contextmanager
-def get_db_cursor():
-    """Get database cursor with automatic commit/rollback"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
+def get_db_cursor(cursor_factory=None, replica: bool = False):
+    """Get database cursor with automatic commit/rollback.
+
+    Rows are RealDictCursor dicts by default; list-heavy reads pass
+    ``cursor_factory=NamedTupleCursor`` for compact tuple rows. With
+    ``replica`` the cursor is on the read replica when one is configured;
+    only read-only queries may ask for it.
+    """
+    with get_db_connection(replica) as conn:
+        cursor = conn.cursor(cursor_factory=cursor_factory)
         try:
             yield cursor
             conn.commit()
         except Exception as e:
             conn.rollback()
+            _commit_hooks.pop(id(conn), None)
             logger.error(f"Database error: {e}")
             raise
         finally:
             cursor.close()
 
+        for callback in _commit_hooks.pop(id(conn), ()):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Post-commit callback failed: {e}")
+
+
+def on_commit(cursor, callback: Callable[[], None]):
+    """Run ``callback`` once the transaction ``cursor`` belongs to has committed.
+
+    Dropped if the transaction rolls back, so side effects such as cache
+    invalidation only ever describe committed data.
+    """
+    _commit_hooks.setdefault(id(cursor.connection), []).append(callback)
+
@@ -0,0 +1,120 @@
+"""
+Per-org change events for live dashboards.
+
+Write paths call ``emit(cursor, org_id, resource, type, data)`` inside their
+transaction. Once it commits, the event goes to this worker's subscribers
+directly and to the other workers through the ``org_events`` NOTIFY channel,
+so a client sees every change no matter which worker handled the write.
+
+Subscribers are asyncio queues owned by the SSE endpoint. A client that falls
+too far behind gets a single ``resync`` event and should re-fetch all its
+lists. A change too big for a NOTIFY payload reaches the other workers'
+clients as ``<resource>.resync`` (e.g. ``shipments.resync``, no data) and
+they should re-fetch that one list.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Iterable, Optional, Set
+import logging
+
+from app.core.database import on_commit
+from app.core import notifications
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "org_events"
+
+# pg_notify rejects payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+RESOURCES = ("stock", "sales", "losses", "shipments")
+
+
+class Subscription:
+    """One connected client: its queue, the loop that owns it and what it may see"""
+
+    __slots__ = ("org_id", "resources", "queue", "loop")
+
+    def __init__(self, org_id: int, resources: Iterable[str], max_queued: int):
+        self.org_id = org_id
+        self.resources = frozenset(resources)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.loop = asyncio.get_running_loop()
+
+    def offer(self, event: dict):
+        """Runs on the subscriber's loop"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and ask for a re-fetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"org_id": self.org_id, "resource": None, "type": "resync", "data": None})
+
+
+class EventBroker:
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, org_id: int, resources: Iterable[str], max_queued: int = 256) -> Subscription:
+        subscription = Subscription(org_id, resources, max_queued)
+        with self._lock:
+            self._subscriptions.setdefault(org_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.org_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.org_id]
+
+    def publish(self, event: dict):
+        """Hand ``event`` to every matching subscriber; safe to call from any thread"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event["org_id"], ()))
+        for subscription in subscriptions:
+            if event["resource"] in subscription.resources:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, event)
+                except RuntimeError:
+                    # The subscriber's loop is closed; it unsubscribes on its own way out
+                    pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+broker = EventBroker()
+
+
+def emit(cursor, org_id: Optional[int], resource: str, event_type: str, data: Any):
+    """Publish a change to ``org_id``'s subscribers when the cursor's transaction commits.
+
+    ``data`` is a Pydantic model or a JSON-ready dict describing the new state.
+    """
+    if org_id is None:
+        return
+    if hasattr(data, "model_dump"):
+        data = data.model_dump(mode="json")
+    event = {"org_id": org_id, "resource": resource, "type": event_type, "data": data}
+
+    on_commit(cursor, lambda: broker.publish(event))
+
+    remote = event
+    if len(json.dumps(event, default=str)) > MAX_NOTIFY_PAYLOAD:
+        # Other workers' clients just re-fetch this resource
+        remote = {"org_id": org_id, "resource": resource, "type": "resync", "data": None}
+    notifications.publish(cursor, EVENTS_CHANNEL, remote)
+
+
+def _on_remote_event(payload: dict):
+    payload.pop("origin", None)
+    broker.publish(payload)
+
+
+notifications.subscribe(EVENTS_CHANNEL, _on_remote_event)
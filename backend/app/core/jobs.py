@@ -0,0 +1,228 @@
+"""
+Transactional outbox and background job runner.
+
+Side effects that don't have to finish before the response are queued with
+``enqueue_job(cursor, job_type, payload)`` inside the request's transaction:
+the job exists only if that transaction commits. Workers claim due jobs with
+``FOR UPDATE SKIP LOCKED``, so any number of them (the in-process thread of
+each API worker and/or ``run_worker.py``) can share the queue without
+picking the same job twice. The claim is committed before the job runs, so
+no transaction stays open while a handler works.
+
+A failing job is retried with exponential backoff up to its ``max_attempts``
+and then left as ``failed``. A job whose worker died while running it is
+picked up again after ``JOB_LOCK_TIMEOUT_SECONDS``.
+
+Handlers are plain functions taking the JSON payload, registered with
+``@job_handler("<type>")``. They open their own transactions and must be
+idempotent, since a job can run more than once. ``periodic_job`` schedules a
+job type at a fixed interval; a dedupe key per time slot makes sure only one
+worker enqueues each run.
+"""
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from psycopg2.extras import Json
+
+from app.core.config import settings
+from app.core.database import get_db_cursor, on_commit
+from app.core import prepared
+
+logger = logging.getLogger(__name__)
+
+# Modules whose import registers job handlers and periodic jobs
+HANDLER_MODULES = (
+    "app.core.partitions",
+    "app.core.rate_limit",
+    "app.services.org_service",
+    "app.services.reorder_service",
+    "app.services.sync_service",
+)
+
+_handlers: Dict[str, Callable[[dict], Any]] = {}
+_periodic: Dict[str, int] = {}
+_enqueued_slots: Dict[str, int] = {}
+_wakeup = threading.Event()
+_worker: Optional["JobWorker"] = None
+
+
+def job_handler(job_type: str):
+    """Register ``fn(payload)`` as the handler for ``job_type``"""
+    def decorator(fn: Callable[[dict], Any]):
+        _handlers[job_type] = fn
+        return fn
+    return decorator
+
+
+def periodic_job(job_type: str, interval_seconds: int):
+    """Run ``job_type`` (with an empty payload) every ``interval_seconds``"""
+    _periodic[job_type] = interval_seconds
+
+
+def load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue_job(cursor, job_type: str, payload: Optional[Dict[str, Any]] = None,
+                delay_seconds: float = 0, max_attempts: int = 5, dedupe_key: Optional[str] = None) -> Optional[int]:
+    """Queue a job in the cursor's transaction; returns its id.
+
+    With ``dedupe_key`` nothing is queued (and None is returned) if a job with
+    the same key was queued before.
+    """
+    cursor.execute("""
+        INSERT INTO outbox_jobs (job_type, payload, run_after, max_attempts, dedupe_key)
+        VALUES (%s, %s, NOW() + make_interval(secs => %s), %s, %s)
+        ON CONFLICT (dedupe_key) DO NOTHING
+        RETURNING id
+    """, (job_type, Json(payload or {}), delay_seconds, max_attempts, dedupe_key))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if delay_seconds <= 0:
+        on_commit(cursor, _wakeup.set)
+    return row['id'] if isinstance(row, dict) else row[0]
+
+
+def claim_jobs(limit: int):
+    """Mark up to ``limit`` due jobs as running and return them"""
+    with get_db_cursor() as cursor:
+        # Jobs left running by a worker that died
+        prepared.execute(cursor, """
+            UPDATE outbox_jobs
+            SET status = 'pending', updated_at = NOW()
+            WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => %s)
+        """, (settings.JOB_LOCK_TIMEOUT_SECONDS,))
+
+        prepared.execute(cursor, """
+            WITH due AS (
+                SELECT id FROM outbox_jobs
+                WHERE status = 'pending' AND run_after <= NOW()
+                ORDER BY run_after, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE outbox_jobs j
+            SET status = 'running', attempts = j.attempts + 1, locked_at = NOW(), updated_at = NOW()
+            FROM due
+            WHERE j.id = due.id
+            RETURNING j.id, j.job_type, j.payload, j.attempts, j.max_attempts
+        """, (limit,))
+        return cursor.fetchall()
+
+
+def _finish(job: dict, error: Optional[str]):
+    with get_db_cursor() as cursor:
+        if error is None:
+            cursor.execute("""
+                UPDATE outbox_jobs SET status = 'done', last_error = NULL, updated_at = NOW()
+                WHERE id = %s
+            """, (job['id'],))
+        elif job['attempts'] >= job['max_attempts']:
+            cursor.execute("""
+                UPDATE outbox_jobs SET status = 'failed', last_error = %s, updated_at = NOW()
+                WHERE id = %s
+            """, (error, job['id']))
+        else:
+            backoff = min(2 ** job['attempts'], settings.JOB_MAX_BACKOFF_SECONDS)
+            cursor.execute("""
+                UPDATE outbox_jobs
+                SET status = 'pending', last_error = %s, run_after = NOW() + make_interval(secs => %s), updated_at = NOW()
+                WHERE id = %s
+            """, (error, backoff, job['id']))
+
+
+def run_job(job: dict):
+    handler = _handlers.get(job['job_type'])
+    if handler is None:
+        _finish(job, f"No handler registered for '{job['job_type']}'")
+        return
+    try:
+        handler(job['payload'])
+    except Exception as e:
+        logger.error(f"Job {job['id']} ({job['job_type']}) failed on attempt {job['attempts']}: {e}")
+        _finish(job, str(e))
+        return
+    _finish(job, None)
+
+
+def run_pending(limit: Optional[int] = None) -> int:
+    """Claim and run one batch of due jobs; returns how many ran"""
+    jobs = claim_jobs(limit or settings.JOB_BATCH_SIZE)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+
+def enqueue_periodic_jobs(now: Optional[float] = None):
+    """Queue each periodic job once per interval slot, whichever worker gets there first"""
+    if not _periodic:
+        return
+    now = now if now is not None else time.time()
+    due = {job_type: int(now // interval) for job_type, interval in _periodic.items()}
+    due = {job_type: slot for job_type, slot in due.items() if _enqueued_slots.get(job_type) != slot}
+    if not due:
+        return
+    with get_db_cursor() as cursor:
+        for job_type, slot in due.items():
+            enqueue_job(cursor, job_type, dedupe_key=f"{job_type}:{slot}")
+    _enqueued_slots.update(due)
+
+
+class JobWorker(threading.Thread):
+    """Polls the outbox, woken early when this process queues a job"""
+
+    def __init__(self, poll_interval: float):
+        super().__init__(name="outbox-worker", daemon=True)
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        _wakeup.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            _wakeup.clear()
+            try:
+                enqueue_periodic_jobs()
+                # Keep going while there is a backlog
+                while run_pending() and not self._stop_event.is_set():
+                    pass
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            _wakeup.wait(self.poll_interval)
+
+
+def start_worker():
+    """Start this process's job worker thread (idempotent)"""
+    global _worker
+    if _worker is None:
+        load_handlers()
+        _worker = JobWorker(settings.JOB_POLL_INTERVAL_SECONDS)
+        _worker.start()
+
+
+def stop_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker.join(timeout=10)
+        _worker = None
+
+
+@job_handler("outbox.prune")
+def prune_finished_jobs(payload: dict):
+    """Drop finished jobs after JOB_RETENTION_DAYS (failed ones stay for inspection)"""
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM outbox_jobs
+            WHERE status = 'done' AND updated_at < NOW() - make_interval(days => %s)
+        """, (settings.JOB_RETENTION_DAYS,))
+
+
+periodic_job("outbox.prune", 3600)
@@ -0,0 +1,163 @@
+"""
+Cross-worker notifications over PostgreSQL LISTEN/NOTIFY.
+
+Writers call ``publish(cursor, channel, payload)`` inside their transaction;
+PostgreSQL delivers the notification to every listening connection only if
+and when that transaction commits. Each worker runs one background listener
+thread on a dedicated connection that dispatches incoming payloads to the
+handlers registered with ``subscribe``.
+
+Notifications sent while the listener is disconnected are lost, so the
+hooks registered with ``on_reconnect`` run each time it (re)connects, once
+it is listening again, to drop whatever local state they would have kept
+fresh.
+"""
+import json
+import os
+import select
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+import psycopg2
+import psycopg2.extensions
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process so it can skip notifications it published itself
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_handlers: Dict[str, List[Callable[[dict], None]]] = {}
+_handlers_lock = threading.Lock()
+_reconnect_hooks: List[Callable[[], None]] = []
+_listener: Optional["NotificationListener"] = None
+
+
+def subscribe(channel: str, handler: Callable[[dict], None]):
+    """Call ``handler(payload)`` for every notification on ``channel``"""
+    with _handlers_lock:
+        _handlers.setdefault(channel, []).append(handler)
+    if _listener is not None:
+        _listener.add_channel(channel)
+
+
+def on_reconnect(hook: Callable[[], None]):
+    """Call ``hook()`` every time the listener (re)connects"""
+    with _handlers_lock:
+        _reconnect_hooks.append(hook)
+
+
+def publish(cursor, channel: str, payload: Dict[str, Any]):
+    """Queue a notification that is sent when the cursor's transaction commits"""
+    message = dict(payload, origin=WORKER_ID)
+    cursor.execute("SELECT pg_notify(%s, %s)", (channel, json.dumps(message, default=str)))
+
+
+def dispatch(channel: str, payload: dict):
+    with _handlers_lock:
+        handlers = list(_handlers.get(channel, ()))
+    for handler in handlers:
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error(f"Notification handler for '{channel}' failed: {e}")
+
+
+def _run_reconnect_hooks():
+    with _handlers_lock:
+        hooks = list(_reconnect_hooks)
+    for hook in hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Notification reconnect hook failed: {e}")
+
+
+class NotificationListener(threading.Thread):
+    """Background thread holding one LISTEN connection, reconnecting on failure"""
+
+    def __init__(self, dsn: str, poll_interval: float = 1.0):
+        super().__init__(name="pg-notify-listener", daemon=True)
+        self.dsn = dsn
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._pending_channels = set()
+        self._lock = threading.Lock()
+
+    def add_channel(self, channel: str):
+        with self._lock:
+            self._pending_channels.add(channel)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+                backoff = 1.0
+            except Exception as e:
+                logger.error(f"Notification listener error: {e}; reconnecting in {backoff:.0f}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    @staticmethod
+    def _listen_to(conn, channels):
+        with conn.cursor() as cursor:
+            for channel in channels:
+                cursor.execute(f"LISTEN {psycopg2.extensions.quote_ident(channel, conn)}")
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with _handlers_lock:
+                channels = set(_handlers)
+            with self._lock:
+                channels |= self._pending_channels
+                self._pending_channels = set()
+            self._listen_to(conn, channels)
+            logger.info("Notification listener connected")
+            # Anything published before the LISTENs above went unheard
+            _run_reconnect_hooks()
+
+            while not self._stop_event.is_set():
+                with self._lock:
+                    new_channels, self._pending_channels = self._pending_channels, set()
+                self._listen_to(conn, new_channels)
+
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(notify.payload)
+                    except ValueError:
+                        logger.warning(f"Ignoring malformed notification on '{notify.channel}'")
+                        continue
+                    if payload.get("origin") == WORKER_ID:
+                        continue
+                    dispatch(notify.channel, payload)
+        finally:
+            conn.close()
+
+
+def start_listener():
+    """Start this worker's listener thread (idempotent)"""
+    global _listener
+    if _listener is None:
+        _listener = NotificationListener(settings.DATABASE_URL)
+        _listener.start()
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener.join(timeout=5)
+        _listener = None
@@ -0,0 +1,177 @@
+"""
+Monthly range partitions of ``sales`` (on ``sale_date``) and ``losses`` (on
+``loss_date``).
+
+Each month is its own table (``sales_2026_10``, ...), so a query bounded by
+date only reads the months it covers and a whole month can be archived at
+once. ``ensure_partitions`` creates the months from now through
+``PARTITION_PREMAKE_MONTHS`` ahead. A row for a month without a partition
+(a backdated insert, say) lands in ``<table>_default`` and is moved into its
+own month the next time ``ensure_partitions`` runs. The daily
+``partitions.maintain`` job does that and then archives.
+
+With ``PARTITION_RETENTION_MONTHS`` set, months older than that are
+detached, written to ``PARTITION_ARCHIVE_DIR`` as gzipped CSV with a header
+(``sales_2024_01.csv.gz``) and dropped. They no longer count anywhere in the
+app; to bring one back, load the file into the table with ``COPY ... FROM``.
+"""
+import gzip
+import os
+import re
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+import logging
+
+from app.core.cache import invalidate_org
+from app.core.config import settings
+from app.core.database import get_db_cursor
+from app.core.jobs import job_handler, periodic_job
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> partition key column
+PARTITIONED_TABLES = {"sales": "sale_date", "losses": "loss_date"}
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def _partition_month(table: str, name: str) -> Optional[date]:
+    match = re.fullmatch(rf"{table}_(\d{{4}})_(\d{{2}})", name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def period_filter(column: str, date_from: Optional[date], date_to: Optional[date]) -> Tuple[str, list]:
+    """``AND`` conditions (and their params) for ``date_from <= column <= date_to``, days inclusive.
+
+    Bounds on the partition key let Postgres skip the months outside them.
+    """
+    sql, params = "", []
+    if date_from is not None:
+        sql += f" AND {column} >= %s"
+        params.append(date_from)
+    if date_to is not None:
+        sql += f" AND {column} < %s"
+        params.append(date_to + timedelta(days=1))
+    return sql, params
+
+
+def current_month(cursor) -> date:
+    # Partition keys are stored in the database's local time (DEFAULT NOW())
+    cursor.execute("SELECT date_trunc('month', LOCALTIMESTAMP)::date AS month")
+    return cursor.fetchone()['month']
+
+
+def _attached_partitions(cursor, table: str) -> set:
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (table,))
+    return {row['relname'] for row in cursor.fetchall()}
+
+
+def create_partitions(cursor, table: str, months: Iterable[date]) -> List[str]:
+    """Create the partitions of ``table`` missing for ``months``; returns their names.
+
+    Rows already in the default partition for a month are moved into it.
+    """
+    column = PARTITIONED_TABLES[table]
+    attached = _attached_partitions(cursor, table)
+    created = []
+    for month in sorted(set(months)):
+        name = partition_name(table, month)
+        if name in attached:
+            continue
+        start, end = month, add_months(month, 1)
+        # Built next to the table and attached once filled, so the rows moved
+        # out of the default partition never fail its range check
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default WHERE {column} >= %s AND {column} < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (start, end))
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+        created.append(name)
+    return created
+
+
+def ensure_partitions(cursor) -> List[str]:
+    """Create the coming months' partitions and those of rows in the default partitions"""
+    # One maintainer at a time (the job, a migration, the benchmark seed)
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('partitions'))")
+    this_month = current_month(cursor)
+    upcoming = [add_months(this_month, n) for n in range(settings.PARTITION_PREMAKE_MONTHS + 1)]
+    created = []
+    for table, column in PARTITIONED_TABLES.items():
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', {column})::date AS month FROM {table}_default")
+        stray = [row['month'] for row in cursor.fetchall()]
+        created += create_partitions(cursor, table, upcoming + stray)
+    if created:
+        logger.info(f"Created partitions {', '.join(created)}")
+    return created
+
+
+def _archive_partition(table: str, name: str) -> str:
+    with get_db_cursor() as cursor:
+        if name in _attached_partitions(cursor, table):
+            cursor.execute(f"SELECT DISTINCT org_id FROM {name} WHERE org_id IS NOT NULL ORDER BY org_id")
+            org_ids = [row['org_id'] for row in cursor.fetchall()]
+            # Detaching locks the parent; give up rather than queue inserts behind a long query
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            # The rows leave every listing and report now: new ETags, no cached copies
+            for org_id in org_ids:
+                invalidate_org(org_id, table, "analytics", cursor=cursor)
+
+    # The detached table is no longer read by anything, so copying it out holds no lock on the parent
+    os.makedirs(settings.PARTITION_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(settings.PARTITION_ARCHIVE_DIR, f"{name}.csv.gz")
+    with get_db_cursor() as cursor:
+        with open(path + ".tmp", "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(path + ".tmp", path)
+        cursor.execute(f"DROP TABLE {name}")
+    return path
+
+
+def archive_partitions() -> List[str]:
+    """Archive and drop the months older than ``PARTITION_RETENTION_MONTHS``; returns the files"""
+    if settings.PARTITION_RETENTION_MONTHS <= 0:
+        return []
+    with get_db_cursor() as cursor:
+        cutoff = add_months(current_month(cursor), -settings.PARTITION_RETENTION_MONTHS)
+        # Attached months and ones left detached by an interrupted run
+        cursor.execute("SELECT relname FROM pg_class WHERE relkind = 'r' AND pg_table_is_visible(oid)")
+        names = [row['relname'] for row in cursor.fetchall()]
+
+    paths = []
+    for table in PARTITIONED_TABLES:
+        for name in sorted(names):
+            month = _partition_month(table, name)
+            if month is not None and month < cutoff:
+                paths.append(_archive_partition(table, name))
+                logger.info(f"Archived {name} to {paths[-1]}")
+    return paths
+
+
+@job_handler("partitions.maintain")
+def maintain_partitions_job(payload: dict):
+    with get_db_cursor() as cursor:
+        ensure_partitions(cursor)
+    archive_partitions()
+
+
+periodic_job("partitions.maintain", 24 * 3600)
@@ -0,0 +1,121 @@
+"""
+Server-side prepared statements for the hot per-request queries.
+
+``execute(cursor, sql, params)`` is a drop-in for ``cursor.execute`` (same
+``%s``/``%(name)s`` placeholders): the first time a pooled connection sees
+``sql`` it sends ``PREPARE`` with the placeholders turned into ``$n``, and
+from then on only ``EXECUTE name (params)``. Postgres then skips parsing
+and rewriting, and after five runs settles on a generic plan when it isn't
+worse than a custom one, so planning is skipped as well.
+
+The registry of what each connection has prepared lives next to the
+connection (a weak mapping, so connections the pool closes take their entry
+with them). A prepared statement outlives a rolled-back transaction, so the
+registry stays correct across rollbacks. Each connection prepares at most
+``PREPARED_STATEMENTS_MAX`` statements; queries beyond that are sent as
+plain text.
+
+``PREPARED_STATEMENTS_ENABLED=false`` sends everything as plain text again,
+which is needed behind a transaction-pooling PgBouncer, where consecutive
+transactions may run on different server connections. A migration that
+changes the columns of a prepared query's result needs an app restart.
+"""
+import functools
+import hashlib
+import re
+import threading
+import weakref
+from typing import Dict, List, Tuple
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+# connection -> names of the statements prepared on it
+_prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_counters = {"prepares": 0, "executes": 0, "unprepared": 0}
+
+
+@functools.lru_cache(maxsize=1024)
+def _convert(sql: str) -> Tuple[str, str, Tuple]:
+    """``(name, sql with $n placeholders, names of named parameters)``"""
+    named: List[str] = []
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(0) == "%%":
+            return "%"
+        if match.group(1) is not None:
+            if match.group(1) not in named:
+                named.append(match.group(1))
+            return f"${named.index(match.group(1)) + 1}"
+        count += 1
+        return f"${count}"
+
+    converted = _PLACEHOLDER.sub(replace, sql)
+    if named and count:
+        raise ValueError("Can't mix named and positional parameters")
+    name = "ps_" + hashlib.md5(sql.encode("utf-8")).hexdigest()[:16]
+    return name, converted, tuple(named)
+
+
+def _count(counter: str):
+    with _lock:
+        _counters[counter] += 1
+
+
+def execute(cursor, sql: str, params=None):
+    """``cursor.execute(sql, params)`` through a statement prepared on the cursor's connection"""
+    if not settings.PREPARED_STATEMENTS_ENABLED:
+        cursor.execute(sql, params)
+        return
+
+    name, converted, named = _convert(sql)
+    connection = cursor.connection
+    names = _prepared.get(connection)
+    if names is None:
+        with _lock:
+            names = _prepared.setdefault(connection, set())
+
+    if name not in names:
+        if len(names) >= settings.PREPARED_STATEMENTS_MAX:
+            _count("unprepared")
+            cursor.execute(sql, params)
+            return
+        cursor.execute(f"PREPARE {name} AS {converted}")
+        names.add(name)
+        _count("prepares")
+
+    if named:
+        values = [params[key] for key in named]
+    else:
+        values = list(params or ())
+    if values:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+    _count("executes")
+
+
+def stats() -> Dict[str, int]:
+    """Prepares, executions and queries sent unprepared (registry full) in this process"""
+    with _lock:
+        counters = dict(_counters)
+        counters["connections"] = len(_prepared)
+    return counters
+
+
+def plan_stats(cursor) -> List:
+    """Per statement on the cursor's connection: how often Postgres used a generic or a custom plan"""
+    cursor.execute("""
+        SELECT name, generic_plans, custom_plans, statement
+        FROM pg_prepared_statements
+        WHERE left(name, 3) = 'ps_'
+        ORDER BY generic_plans + custom_plans DESC
+    """)
+    return cursor.fetchall()
@@ -0,0 +1,193 @@
+"""
+Token-bucket rate limiting for login attempts.
+
+Every attempt takes one token from the client IP's bucket and one from the
+username's bucket. A bucket holds up to ``burst`` tokens and refills at
+``per_minute``; an empty bucket means ``429 Too Many Requests`` with a
+``Retry-After``, before any bcrypt work is done. The per-IP bucket stops one
+client from burning CPU on bcrypt, the per-username bucket stops credential
+stuffing of one account from many addresses.
+
+``LOGIN_RATE_LIMIT_BACKEND=memory`` keeps the buckets in each worker
+(sharded, so concurrent logins rarely wait on the same lock); with several
+workers a client effectively gets one budget per worker. ``postgres`` keeps
+them in the unlogged ``rate_limit_buckets`` table, shared by every worker at
+the cost of one upsert per bucket.
+
+Behind a reverse proxy the client IP comes from ``X-Forwarded-For``, as far
+as ``LOGIN_TRUSTED_PROXIES`` vouches for it (see ``client_ip``).
+"""
+import functools
+import ipaddress
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.core.database import get_db_cursor
+from app.core.jobs import job_handler, periodic_job
+from app.core import prepared
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """In-process buckets, sharded by key"""
+
+    def __init__(self, burst: float, per_minute: float, shards: int = 16, max_keys: int = 100_000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    def acquire(self, key: str) -> float:
+        """Take a token for ``key``: 0 if allowed, else seconds until one is available"""
+        buckets, lock = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            buckets[key] = (tokens - 1, now)
+            if len(buckets) > self._max_keys_per_shard:
+                self._prune(buckets, now)
+            return 0.0
+
+    def _prune(self, buckets: Dict[str, Tuple[float, float]], now: float):
+        # A bucket that has refilled completely is the same as no bucket
+        full_after = self.burst / self.rate
+        for key in [key for key, (_, updated) in buckets.items() if now - updated >= full_after]:
+            del buckets[key]
+        # Still too many keys (e.g. a spray from many addresses): forget the oldest
+        while len(buckets) > self._max_keys_per_shard:
+            del buckets[next(iter(buckets))]
+
+
+class PostgresTokenBucketLimiter:
+    """Buckets in ``rate_limit_buckets``, shared by all workers"""
+
+    def __init__(self, burst: float, per_minute: float):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+
+    def acquire(self, key: str) -> float:
+        params = {"key": key, "burst": self.burst, "rate": self.rate}
+        with get_db_cursor() as cursor:
+            # The conflict path locks the row, so concurrent attempts can't both take the last token
+            prepared.execute(cursor, """
+                INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+                VALUES (%(key)s, %(burst)s - 1, NOW())
+                ON CONFLICT (key) DO UPDATE
+                SET tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * %(rate)s) - 1,
+                    updated_at = NOW()
+                WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * %(rate)s) >= 1
+                RETURNING tokens
+            """, params)
+            if cursor.fetchone() is not None:
+                return 0.0
+
+            prepared.execute(cursor, """
+                SELECT LEAST(%(burst)s, tokens + EXTRACT(EPOCH FROM NOW() - updated_at) * %(rate)s) AS tokens
+                FROM rate_limit_buckets WHERE key = %(key)s
+            """, params)
+            row = cursor.fetchone()
+            tokens = row['tokens'] if row else 0
+            return max((1 - tokens) / self.rate, 0.0)
+
+
+class LoginRateLimiter:
+    def __init__(self, backend: str):
+        limiter_class = PostgresTokenBucketLimiter if backend == "postgres" else TokenBucketLimiter
+
+        def bucket(burst: float, per_minute: float):
+            # A bucket that never holds a token or never refills would lock everyone out for good
+            return limiter_class(burst, per_minute) if burst >= 1 and per_minute > 0 else None
+
+        self.by_ip = bucket(settings.LOGIN_IP_BURST, settings.LOGIN_IP_PER_MINUTE)
+        self.by_username = bucket(settings.LOGIN_USERNAME_BURST, settings.LOGIN_USERNAME_PER_MINUTE)
+
+    def check(self, ip: str, username: str) -> float:
+        """0 if the attempt may go ahead, else the seconds to put in Retry-After"""
+        if self.by_ip is not None:
+            retry_after = self.by_ip.acquire(f"ip:{ip}")
+            if retry_after:
+                # Don't let a throttled address drain the account's budget as well
+                return retry_after
+        if self.by_username is None:
+            return 0.0
+        return self.by_username.acquire(f"user:{username.strip().lower()}")
+
+
+@functools.lru_cache(maxsize=4)
+def _parse_proxies(value: str) -> Tuple[bool, List]:
+    networks = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        if entry == "*":
+            return True, []
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.warning(f"Ignoring invalid LOGIN_TRUSTED_PROXIES entry {entry!r}")
+    return False, networks
+
+
+def _is_trusted(address: str, trust_all: bool, networks: List) -> bool:
+    if trust_all:
+        return True
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str]) -> str:
+    """Address to rate-limit a request by.
+
+    ``peer`` is the connection's address. When it is one of
+    ``LOGIN_TRUSTED_PROXIES``, ``X-Forwarded-For`` is read from the right
+    (each proxy appends the address it got the request from) and the first
+    address that isn't a trusted proxy is the client.
+    """
+    peer = peer or "unknown"
+    trust_all, networks = _parse_proxies(settings.LOGIN_TRUSTED_PROXIES)
+    if not forwarded_for or not _is_trusted(peer, trust_all, networks):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        # With "*" only the peer is known to be a proxy: the hop it appended is the client
+        if trust_all or not _is_trusted(hop, False, networks):
+            return hop
+    return hops[0] if hops else peer
+
+
+_login_limiter: Optional[LoginRateLimiter] = None
+_login_limiter_lock = threading.Lock()
+
+
+def get_login_limiter() -> Optional[LoginRateLimiter]:
+    """Limiter selected by ``LOGIN_RATE_LIMIT_BACKEND``, or None when disabled"""
+    global _login_limiter
+    if not settings.LOGIN_RATE_LIMIT_ENABLED:
+        return None
+    if _login_limiter is None:
+        with _login_limiter_lock:
+            if _login_limiter is None:
+                backend = settings.LOGIN_RATE_LIMIT_BACKEND
+                if backend not in ("memory", "postgres"):
+                    logger.warning(f"Unknown LOGIN_RATE_LIMIT_BACKEND={backend!r}, using memory")
+                _login_limiter = LoginRateLimiter(backend)
+    return _login_limiter
+
+
+@job_handler("rate_limit.prune")
+def prune_buckets_job(payload: dict):
+    """Drop Postgres buckets idle for an hour; they would be full again anyway"""
+    with get_db_cursor() as cursor:
+        cursor.execute("DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - INTERVAL '1 hour'")
+
+
+periodic_job("rate_limit.prune", 3600)
@@ -0,0 +1,94 @@
+"""
+Routing of list and report queries to a read replica.
+
+With ``READ_DATABASE_URL`` set, the org listings and reports (stock, sales,
+losses, suppliers, shipments, the analytics summary and the ETag versions
+that go with them) read through ``read_cursor(org_id)``, which is on a
+second pool connected to a streaming replica. Reporting load then stays
+off the primary that records sales.
+
+The replica trails the primary by its replication lag. So that whoever
+just made a change sees it, an org written to in the last
+``READ_REPLICA_STICKY_SECONDS`` keeps reading from the primary. Every write
+path already calls ``invalidate_org(..., cursor=)``, which calls
+``note_write``; other workers hear about the write through NOTIFY when it
+commits. The window is per org, not per user, because cached reads are
+shared by the whole org: a colleague's stale replica read would otherwise
+be cached and served to the writer. Writes announced while this worker's
+listener was disconnected go unheard, so after it reconnects every org
+reads from the primary for one window.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+import logging
+
+from app.core.config import settings
+from app.core import database, notifications
+from app.core.database import get_db_cursor, on_commit
+
+logger = logging.getLogger(__name__)
+
+WRITES_CHANNEL = "replica_org_written"
+
+# org_id -> monotonic time until which its reads stay on the primary
+_sticky_until: Dict[int, float] = {}
+# Monotonic time until which every org's reads stay on the primary
+_all_sticky_until = 0.0
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(settings.READ_DATABASE_URL)
+
+
+def _remember_write(org_id: int):
+    until = time.monotonic() + settings.READ_REPLICA_STICKY_SECONDS
+    with _lock:
+        _sticky_until[org_id] = until
+        if len(_sticky_until) > 10_000:
+            now = time.monotonic()
+            for key in [key for key, value in _sticky_until.items() if value < now]:
+                del _sticky_until[key]
+
+
+def note_write(cursor, org_id: int):
+    """Keep the org's reads on the primary for a while once the cursor's transaction commits"""
+    if not enabled():
+        return
+    on_commit(cursor, lambda: _remember_write(org_id))
+    notifications.publish(cursor, WRITES_CHANNEL, {"org_id": org_id})
+
+
+def use_replica(org_id: int) -> bool:
+    """Whether the org's reads may go to the replica right now"""
+    if not enabled() or database.read_pool is None:
+        return False
+    now = time.monotonic()
+    if _all_sticky_until >= now:
+        return False
+    until = _sticky_until.get(org_id)
+    return until is None or until < now
+
+
+@contextmanager
+def read_cursor(org_id: int, cursor_factory=None):
+    """Cursor for read-only queries about ``org_id``: on the replica unless the org was just written to"""
+    with get_db_cursor(cursor_factory=cursor_factory, replica=use_replica(org_id)) as cursor:
+        yield cursor
+
+
+def _on_remote_write(payload: dict):
+    _remember_write(payload["org_id"])
+
+
+def _on_reconnect():
+    global _all_sticky_until
+    with _lock:
+        _sticky_until.clear()
+        _all_sticky_until = time.monotonic() + settings.READ_REPLICA_STICKY_SECONDS
+
+
+notifications.subscribe(WRITES_CHANNEL, _on_remote_write)
+notifications.on_reconnect(_on_reconnect)
@@ -0,0 +1,91 @@
+"""
+Fast JSON responses and conditional GET for list endpoints.
+
+List endpoints return database rows as-is (dicts or NamedTupleCursor rows)
+and serialize them here instead of building a Pydantic model per row and
+letting FastAPI re-validate the list against ``response_model``. The
+``response_model`` on the route is still used for the OpenAPI schema, so the
+SQL must alias columns to the schema's names and cast NUMERIC columns to float.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any):
+    """Serialize the types psycopg2 returns that JSON has no native form for"""
+    if hasattr(value, "_asdict"):
+        # NamedTupleCursor rows: the dict only lives while this row is encoded
+        return value._asdict()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    if isinstance(content, list):
+        # json encodes tuples as arrays without consulting default
+        content = [_default(row) if hasattr(row, "_asdict") else row for row in content]
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response that serializes rows directly, skipping model validation"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag from the parts that identify a representation.
+
+    Weak because the same data may be sent gzip- or brotli-encoded.
+    """
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def conditional_json_response(request: Request, etag: str, load: Callable[[], Any]) -> Response:
+    """304 when the client already has ``etag``, otherwise run ``load`` and send it.
+
+    ``no-cache`` makes browsers revalidate on every poll instead of reusing
+    the cached body blindly. ``load`` must read with the data version the
+    ETag was built from (``cache_version=``), so a cached body from before
+    the latest write is never sent under the new ETag.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(load(), headers=headers)
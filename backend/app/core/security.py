@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from jose import JWTError, jwt
 from app.core.config import settings
@@ -28,6 +29,18 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+@lru_cache(maxsize=1)
+def _dummy_password_hash() -> str:
+    return get_password_hash("not-a-real-password")
+
+
+def verify_dummy_password(plain_password: str) -> bool:
+    """Spend the same bcrypt time as verify_password for a user that doesn't exist,
+    so response times don't tell which usernames are registered"""
+    verify_password(plain_password, _dummy_password_hash())
+    return False
+
+
 
 
 
@@ -1,11 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 from app.api.router import api_router
 from app.core.database import init_db_pool, close_db_pool
+from app.core.notifications import start_listener, stop_listener
+from app.core.jobs import start_worker, stop_worker
+from app.core.audit import stop_writer as stop_audit_writer
+from app.services import lookup_service
 from app.core.config import settings
 import logging
 
+try:
+    # Optional: brotli for clients that accept it, gzip for the rest
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -16,6 +27,11 @@ async def lifespan(app: FastAPI):
     # Startup
     try:
         init_db_pool()
+        lookup_service.load()
+        if settings.DB_NOTIFICATIONS_ENABLED:
+            start_listener()
+        if settings.JOB_WORKER_ENABLED:
+            start_worker()
         logger.info("Application started successfully")
     except Exception as e:
         logger.error(f"Failed to start application: {e}")
@@ -24,6 +40,9 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    stop_worker()
+    stop_listener()
+    stop_audit_writer()
     close_db_pool()
     logger.info("Application shut down")
 
@@ -42,8 +61,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Response compression (GZipMiddleware already leaves text/event-stream alone)
+if BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_fallback=True,
+        excluded_handlers=["/api/events"]
+    )
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 # Include routers
 app.include_router(api_router, prefix="/api")
 
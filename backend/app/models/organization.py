@@ -7,6 +7,8 @@ from datetime import datetime
 
 class Organization:
     """Organization model"""
+
+    __slots__ = ('id', 'name', 'created_by', 'created_at')
     
     def __init__(
         self,
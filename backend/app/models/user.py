@@ -7,6 +7,12 @@ from datetime import datetime
 
 class User:
     """User model"""
+
+    # Slots instead of a per-instance __dict__; users are built for every request
+    __slots__ = (
+        'id', 'org_id', 'email', 'password_hash', 'username', 'full_name',
+        'is_active', 'created_at', 'role', 'org_name', 'department'
+    )
     
     def __init__(
         self,
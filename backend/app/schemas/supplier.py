@@ -30,17 +30,37 @@ class ShipmentBase(BaseModel):
     expected_date: date
     notes: Optional[str] = None
 
+class ShipmentItemCreate(BaseModel):
+    stock_item_id: int
+    expected_quantity: int
+
+class ShipmentItemReceive(BaseModel):
+    stock_item_id: int
+    received_quantity: int
+    damaged_quantity: int = 0
+
+class ShipmentItemResponse(BaseModel):
+    stock_item_id: Optional[int] = None
+    stock_item_name: Optional[str] = None
+    expected_quantity: int
+    received_quantity: Optional[int] = None
+    damaged_quantity: Optional[int] = None
+
 class ShipmentCreate(ShipmentBase):
-    pass
+    expected_quantity: Optional[int] = None # Defaults to the sum of the items
+    items: List[ShipmentItemCreate] = []
 
 class ShipmentUpdateStatus(BaseModel):
     status: str # 'Arrived', 'Late', etc.
     received_date: Optional[date] = None
 
 class ShipmentRate(BaseModel):
-    received_quantity: int
-    damaged_quantity: int
+    # Totals; taken from the items when those are given
+    received_quantity: Optional[int] = None
+    damaged_quantity: Optional[int] = None
     received_date: Optional[date] = None
+    # Per-item counts for shipments with line items, added to stock
+    items: Optional[List[ShipmentItemReceive]] = None
 
 class ShipmentResponse(ShipmentBase):
     id: int
@@ -53,6 +73,11 @@ class ShipmentResponse(ShipmentBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     supplier_name: Optional[str] = None # Enriched field
+    stock_item_id: Optional[int] = None # Item a reorder draft is for
+    origin: Optional[str] = None # 'manual' or 'reorder'
+    items: Optional[List[ShipmentItemResponse]] = None
+    is_late: Optional[bool] = None # Derived: marked Late, open past expected_date or received after it
+    days_late: Optional[int] = None
 
     class Config:
         from_attributes = True
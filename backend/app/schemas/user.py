@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -20,3 +20,16 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class UserBulkError(BaseModel):
+    """A row of a bulk create that was not created"""
+    index: int
+    username: Optional[str] = None
+    email: Optional[str] = None
+    detail: str
+
+
+class UserBulkResponse(BaseModel):
+    """Result of a bulk create: the created users and the rejected rows"""
+    created: List[UserResponse]
+    errors: List[UserBulkError]
@@ -1,10 +1,21 @@
+from datetime import date
+from typing import Optional
+from psycopg2.extras import NamedTupleCursor
 from app.core.database import get_db_cursor
+from app.core.replica import read_cursor
+from app.core.cache import cached, invalidate_org
+from app.core.events import emit
+from app.core import audit
+from app.core import prepared
+from app.core.partitions import period_filter
 from app.schemas.loss import LossCreate, LossResponse
+from app.services.stock_service import get_stock_status
+from app.services import reorder_service
 
 def report_loss(loss_data: LossCreate, user_id: int, org_id: int):
     with get_db_cursor() as cursor:
         # 1. Get current item cost and qty
-        cursor.execute("SELECT name, quantity, cost_price FROM stock_items WHERE id = %s AND org_id = %s", (loss_data.stock_item_id, org_id))
+        prepared.execute(cursor, "SELECT name, quantity, cost_price FROM stock_items WHERE id = %s AND org_id = %s", (loss_data.stock_item_id, org_id))
         item = cursor.fetchone()
         
         if not item:
@@ -14,45 +25,77 @@ def report_loss(loss_data: LossCreate, user_id: int, org_id: int):
             raise Exception("Insufficient stock to report loss")
             
         # 2. Deduct Stock
-        cursor.execute("""
+        prepared.execute(cursor, """
             UPDATE stock_items 
             SET quantity = quantity - %s, updated_at = NOW()
             WHERE id = %s
+            RETURNING quantity, min_threshold, max_capacity
         """, (loss_data.quantity, loss_data.stock_item_id))
+        stock_row = cursor.fetchone()
+        reorder_service.queue_if_crossed(cursor, org_id, item['quantity'], stock_row['quantity'], stock_row['min_threshold'])
         
         # 3. Record Loss
-        cursor.execute("""
+        prepared.execute(cursor, """
             INSERT INTO losses (org_id, stock_item_id, quantity, cost_at_loss, reason, notes, reported_by)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
             RETURNING id, loss_date
         """, (org_id, loss_data.stock_item_id, loss_data.quantity, item['cost_price'], loss_data.reason, loss_data.notes, user_id))
+        loss_row = cursor.fetchone()
         
+        invalidate_org(org_id, "stock", "losses", "analytics", cursor=cursor)
+        emit(cursor, org_id, "stock", "quantity", {
+            "id": loss_data.stock_item_id,
+            "quantity": stock_row['quantity'],
+            "status": get_stock_status(stock_row['quantity'], stock_row['min_threshold'], stock_row['max_capacity'])
+        })
+        emit(cursor, org_id, "losses", "created", LossResponse(
+            id=loss_row['id'],
+            stock_item_id=loss_data.stock_item_id,
+            stock_item_name=item['name'],
+            quantity=loss_data.quantity,
+            cost_at_loss=float(item['cost_price']),
+            reason=loss_data.reason,
+            notes=loss_data.notes,
+            reported_by=user_id,
+            loss_date=loss_row['loss_date']
+        ))
+        audit.record(cursor, org_id, user_id, "create", "losses", loss_row['id'], after={
+            "stock_item_id": loss_data.stock_item_id,
+            "quantity": loss_data.quantity,
+            "cost_at_loss": float(item['cost_price']),
+            "reason": loss_data.reason,
+            "stock_quantity": stock_row['quantity']
+        })
         return True
 
-def get_analytics_summary(org_id: int):
+@cached("analytics")
+def get_analytics_summary(org_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Revenue, costs and profit of the org, optionally of the days ``date_from``..``date_to`` only"""
     # Debug logging
     print(f"DEBUG: Generating analytics for Org ID: {org_id}")
+    sales_period, sales_params = period_filter("s.sale_date", date_from, date_to)
+    loss_period, loss_params = period_filter("loss_date", date_from, date_to)
     
-    with get_db_cursor() as cursor:
+    with read_cursor(org_id) as cursor:
         # Total Revenue (From Sales)
-        cursor.execute("SELECT COALESCE(SUM(total_price), 0) as revenue FROM sales WHERE org_id = %s", (org_id,))
+        cursor.execute(f"SELECT COALESCE(SUM(total_price), 0) as revenue FROM sales s WHERE org_id = %s{sales_period}", (org_id, *sales_params))
         rev_row = cursor.fetchone()
         revenue = float(rev_row['revenue']) if rev_row else 0.0
         print(f"DEBUG: Revenue: {revenue}")
         
         # Cost of Goods Sold (COGS)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT COALESCE(SUM(s.quantity * si.cost_price), 0) as cogs
             FROM sales s
             JOIN stock_items si ON s.stock_item_id = si.id
-            WHERE s.org_id = %s
-        """, (org_id,))
+            WHERE s.org_id = %s{sales_period}
+        """, (org_id, *sales_params))
         cogs_row = cursor.fetchone()
         cogs = float(cogs_row['cogs']) if cogs_row else 0.0
         print(f"DEBUG: COGS: {cogs}")
         
         # Total Losses
-        cursor.execute("SELECT COALESCE(SUM(cost_at_loss * quantity), 0) as losses FROM losses WHERE org_id = %s", (org_id,))
+        cursor.execute(f"SELECT COALESCE(SUM(cost_at_loss * quantity), 0) as losses FROM losses WHERE org_id = %s{loss_period}", (org_id, *loss_params))
         loss_row = cursor.fetchone()
         total_lost_value = float(loss_row['losses']) if loss_row else 0.0
         print(f"DEBUG: Losses: {total_lost_value}")
@@ -68,27 +111,76 @@ def get_analytics_summary(org_id: int):
             "net_profit": net_profit
         }
 
-def get_loss_history(org_id: int):
+def get_portfolio_summary(owner_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Summary figures for every org the owner created, plus totals.
+
+    One grouped query over all of the owner's orgs instead of one
+    get_analytics_summary call per org; the figures match that function's.
+    """
+    sales_period, sales_params = period_filter("s.sale_date", date_from, date_to)
+    loss_period, loss_params = period_filter("loss_date", date_from, date_to)
     with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT l.*, si.name as item_name, u.full_name as reported_by_name
+        cursor.execute(f"""
+            WITH owned AS (
+                SELECT id, name FROM organizations WHERE created_by = %s
+            ),
+            sales_totals AS (
+                SELECT s.org_id, SUM(s.total_price) AS revenue, SUM(s.quantity * si.cost_price) AS cogs
+                FROM sales s
+                LEFT JOIN stock_items si ON s.stock_item_id = si.id
+                WHERE s.org_id IN (SELECT id FROM owned){sales_period}
+                GROUP BY s.org_id
+            ),
+            loss_totals AS (
+                SELECT org_id, SUM(cost_at_loss * quantity) AS losses
+                FROM losses
+                WHERE org_id IN (SELECT id FROM owned){loss_period}
+                GROUP BY org_id
+            )
+            SELECT o.id AS org_id, o.name AS org_name,
+                   COALESCE(st.revenue, 0)::float8 AS revenue,
+                   COALESCE(st.cogs, 0)::float8 AS cogs,
+                   COALESCE(lt.losses, 0)::float8 AS losses
+            FROM owned o
+            LEFT JOIN sales_totals st ON st.org_id = o.id
+            LEFT JOIN loss_totals lt ON lt.org_id = o.id
+            ORDER BY o.id
+        """, (owner_id, *sales_params, *loss_params))
+        rows = cursor.fetchall()
+
+    orgs = []
+    for row in rows:
+        gross_profit = row['revenue'] - row['cogs']
+        orgs.append({
+            "org_id": row['org_id'],
+            "org_name": row['org_name'],
+            "revenue": row['revenue'],
+            "cogs": row['cogs'],
+            "gross_profit": gross_profit,
+            "losses": row['losses'],
+            "net_profit": gross_profit - row['losses']
+        })
+
+    totals = {
+        key: sum(org[key] for org in orgs)
+        for key in ("revenue", "cogs", "gross_profit", "losses", "net_profit")
+    }
+    return {"orgs": orgs, "totals": totals}
+
+@cached("losses")
+def get_loss_history(org_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    period, params = period_filter("l.loss_date", date_from, date_to)
+    with read_cursor(org_id, cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(f"""
+            SELECT l.id, si.name as item_name, l.quantity,
+                   l.cost_at_loss::float8 AS cost_at_loss,
+                   (l.cost_at_loss * l.quantity)::float8 AS total_loss,
+                   l.reason, l.loss_date AS date, u.full_name as reported_by
             FROM losses l
             JOIN stock_items si ON l.stock_item_id = si.id
             LEFT JOIN users u ON l.reported_by = u.id
-            WHERE l.org_id = %s
+            WHERE l.org_id = %s{period}
             ORDER BY l.loss_date DESC
-        """, (org_id,))
+        """, (org_id, *params))
         
-        rows = cursor.fetchall()
-        return [
-            {
-                "id": row['id'],
-                "item_name": row['item_name'],
-                "quantity": row['quantity'],
-                "cost_at_loss": float(row['cost_at_loss']),
-                "total_loss": float(row['cost_at_loss']) * row['quantity'],
-                "reason": row['reason'],
-                "date": row['loss_date'],
-                "reported_by": row['reported_by_name']
-            } for row in rows
-        ]
+        return cursor.fetchall()
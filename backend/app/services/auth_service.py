@@ -1,15 +1,25 @@
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import os
+from psycopg2.extras import execute_values
 from app.core.database import get_db_cursor
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import verify_password, verify_dummy_password, get_password_hash, create_access_token
 from app.models.user import User
 from app.models.organization import Organization
 from datetime import timedelta
 from app.core.config import settings
+from app.core import audit
+from app.services.org_service import DEFAULT_DEPARTMENTS, ensure_departments
+from app.services import lookup_service, principal_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class UserAlreadyExistsError(Exception):
+    pass
+
+
 def create_user(email: str, username: str, password: str, full_name: Optional[str] = None) -> User:
     """Create a new user (owner)"""
     password_hash = get_password_hash(password)
@@ -19,167 +29,225 @@ def create_user(email: str, username: str, password: str, full_name: Optional[st
         cursor.execute("""
             INSERT INTO users (email, password_hash, username, full_name, is_active)
             VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
             RETURNING id, email, password_hash, username, full_name, is_active, created_at, org_id
         """, (email, password_hash, username, full_name, True))
         
         user_data = cursor.fetchone()
         
         if not user_data:
-            raise Exception("Failed to create user")
-        
-        if not user_data:
-            raise Exception("Failed to create user")
+            # Nothing inserted: the username or email (in any case) is taken
+            raise UserAlreadyExistsError("Username or email already exists")
         
-        # Assign owner role (ensure roles exist first)
-        print("DEBUG: Attempting to assign owner role")
+        # Assign owner role (created on first registration)
+        owner_role_id = lookup_service.role_id(cursor, 'owner', create=True)
         cursor.execute("""
-            INSERT INTO roles (name) VALUES ('owner')
-            ON CONFLICT (name) DO NOTHING
-        """)
-        
-        cursor.execute("""
-            SELECT id FROM roles WHERE name = 'owner'
-        """)
-        role_data = cursor.fetchone()
-        print(f"DEBUG: Role data found: {role_data}")
-        
-        if role_data:
-            print(f"DEBUG: Inserting into user_roles: user_id={user_data['id']}, role_id={role_data['id']}")
-            try:
-                cursor.execute("""
-                    INSERT INTO user_roles (user_id, role_id)
-                    VALUES (%s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (user_data['id'], role_data['id']))
-                print("DEBUG: Inserted into user_roles successfully")
-            except Exception as e:
-                print(f"DEBUG: Failed to insert into user_roles: {e}")
-                raise e
-        else:
-            print("DEBUG: Owner role not found!")
+            INSERT INTO user_roles (user_id, role_id)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+        """, (user_data['id'], owner_role_id))
 
         user_data['role'] = 'owner'  # Set the role explicitly for the response
+        audit.record(cursor, None, user_data['id'], "create", "users", user_data['id'], after={
+            "username": username, "email": email, "role": 'owner'
+        })
         return User.from_dict(user_data)
 
 
-def create_org_user(email: str, username: str, password: str, role: str, org_id: int, full_name: Optional[str] = None, department_name: Optional[str] = None) -> User:
+def create_org_user(email: str, username: str, password: str, role: str, org_id: int, full_name: Optional[str] = None, department_name: Optional[str] = None,
+                    actor_id: Optional[int] = None) -> User:
     """Create a new user with a specific role in an organization"""
     password_hash = get_password_hash(password)
     
     with get_db_cursor() as cursor:
         # Check if role exists
-        cursor.execute("SELECT id FROM roles WHERE name = %s", (role,))
-        role_data = cursor.fetchone()
-        if not role_data:
+        role_id = lookup_service.role_id(cursor, role)
+        if role_id is None:
             raise Exception(f"Role '{role}' not found")
             
         # Insert user
         cursor.execute("""
             INSERT INTO users (email, password_hash, username, full_name, is_active, org_id)
             VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
             RETURNING id, email, password_hash, username, full_name, is_active, created_at, org_id
         """, (email, password_hash, username, full_name, True, org_id))
         
         user_data = cursor.fetchone()
         
         if not user_data:
-            raise Exception("Failed to create user")
+            raise UserAlreadyExistsError("Username or email already exists")
         
         # Link role
         cursor.execute("""
             INSERT INTO user_roles (user_id, role_id)
             VALUES (%s, %s)
-        """, (user_data['id'], role_data['id']))
+        """, (user_data['id'], role_id))
         
         # Link department if provided
         if department_name:
-            cursor.execute("SELECT id FROM departments WHERE name = %s AND org_id = %s", (department_name, org_id))
-            dept_data = cursor.fetchone()
-            if dept_data:
+            department_id = lookup_service.department_id(cursor, org_id, department_name)
+            if department_id is None and department_name in DEFAULT_DEPARTMENTS:
+                # The org's default departments may still be queued
+                ensure_departments(cursor, org_id, DEFAULT_DEPARTMENTS)
+                department_id = lookup_service.department_id(cursor, org_id, department_name)
+            if department_id is not None:
                 cursor.execute("""
                     INSERT INTO user_departments (user_id, department_id)
                     VALUES (%s, %s)
-                """, (user_data['id'], dept_data['id']))
+                """, (user_data['id'], department_id))
                 user_data['department'] = department_name
 
         user_data['role'] = role
+        audit.record(cursor, org_id, actor_id, "create", "users", user_data['id'], after={
+            "username": username, "email": email, "role": role, "department": user_data.get('department')
+        })
         return User.from_dict(user_data)
 
 
 
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash many passwords at once; bcrypt releases the GIL, so this uses every core"""
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
+    return list(_hash_executor.map(get_password_hash, passwords))
+
+
+def create_org_users_bulk(users: List[Dict[str, Any]], role: str, org_id: int,
+                          actor_id: Optional[int] = None) -> Tuple[List[dict], List[dict]]:
+    """Create many users with one role in an organization.
+
+    ``users`` are dicts with email, username, password and optionally
+    full_name and department. Returns ``(created, errors)``: the created user
+    rows and, for the rest, ``{"index", "username", "email", "detail"}``.
+    Everything that can be created is created in one transaction.
+    """
+    errors = []
+
+    def reject(index: int, user: Dict[str, Any], detail: str):
+        errors.append({"index": index, "username": user.get('username'), "email": user.get('email'), "detail": detail})
+
+    # Duplicates within the batch: the first occurrence wins
+    seen = set()
+    candidates = []
+    for index, user in enumerate(users):
+        keys = {("username", user['username'].lower()), ("email", user['email'].lower())}
+        if keys & seen:
+            reject(index, user, "Duplicate username or email in request")
+            continue
+        seen |= keys
+        candidates.append((index, user))
+
+    with get_db_cursor() as cursor:
+        role_id = lookup_service.role_id(cursor, role)
+        if role_id is None:
+            raise Exception(f"Role '{role}' not found")
+
+        # Skip hashing for rows that would conflict anyway; the insert still catches races
+        cursor.execute("""
+            SELECT lower(username) AS username, lower(email) AS email FROM users
+            WHERE lower(username) = ANY(%s) OR lower(email) = ANY(%s)
+        """, ([user['username'].lower() for _, user in candidates], [user['email'].lower() for _, user in candidates]))
+        taken = set()
+        for row in cursor.fetchall():
+            taken.add(("username", row['username']))
+            taken.add(("email", row['email']))
+
+        wanted = {user['department'] for _, user in candidates if user.get('department')}
+        departments = {name: lookup_service.department_id(cursor, org_id, name) for name in wanted}
+        if any(departments[name] is None for name in wanted & set(DEFAULT_DEPARTMENTS)):
+            # The org's default departments may still be queued
+            ensure_departments(cursor, org_id, DEFAULT_DEPARTMENTS)
+            departments = {name: lookup_service.department_id(cursor, org_id, name) for name in wanted}
+        departments = {name: department_id for name, department_id in departments.items() if department_id is not None}
+
+    rows = []
+    for index, user in candidates:
+        if {("username", user['username'].lower()), ("email", user['email'].lower())} & taken:
+            reject(index, user, "Username or email already exists")
+        elif user.get('department') and user['department'] not in departments:
+            reject(index, user, f"Department '{user['department']}' not found")
+        else:
+            rows.append((index, user))
+
+    # Hash outside the transaction so no locks are held meanwhile
+    password_hashes = hash_passwords([user['password'] for _, user in rows])
+
+    created = []
+    with get_db_cursor() as cursor:
+        if rows:
+            inserted = execute_values(cursor, """
+                INSERT INTO users (email, password_hash, username, full_name, is_active, org_id)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+                RETURNING id, org_id, email, username, full_name, is_active, created_at
+            """, [
+                (user['email'], password_hash, user['username'], user.get('full_name'), True, org_id)
+                for (_, user), password_hash in zip(rows, password_hashes)
+            ], page_size=len(rows), fetch=True)
+            by_username = {row['username'].lower(): row for row in inserted}
+
+            user_roles = []
+            user_departments = []
+            for index, user in rows:
+                row = by_username.get(user['username'].lower())
+                if row is None:
+                    # Registered by someone else since the check above
+                    reject(index, user, "Username or email already exists")
+                    continue
+                row['role'] = role
+                row['department'] = user.get('department')
+                user_roles.append((row['id'], role_id))
+                if row['department']:
+                    user_departments.append((row['id'], departments[row['department']]))
+                created.append(row)
+                audit.record(cursor, org_id, actor_id, "create", "users", row['id'], after={
+                    "username": row['username'], "email": row['email'], "role": role, "department": row['department']
+                })
+
+            if user_roles:
+                execute_values(cursor, "INSERT INTO user_roles (user_id, role_id) VALUES %s", user_roles,
+                               page_size=len(user_roles))
+            if user_departments:
+                execute_values(cursor, "INSERT INTO user_departments (user_id, department_id) VALUES %s",
+                               user_departments, page_size=len(user_departments))
+
+    errors.sort(key=lambda error: error['index'])
+    return created, errors
+
+
 def authenticate_user(username: str, password: str) -> Optional[User]:
     """Authenticate a user by username and password"""
     with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT u.id, u.org_id, u.email, u.password_hash, u.username, u.full_name, u.is_active, u.created_at, 
-                   r.name as role, d.name as department, o.name as org_name
-            FROM users u
-            LEFT JOIN user_roles ur ON u.id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.id
-            LEFT JOIN user_departments ud ON u.id = ud.user_id
-            LEFT JOIN departments d ON ud.department_id = d.id
-            LEFT JOIN organizations o ON u.org_id = o.id
-            WHERE u.username = %s OR u.email = %s
-        """, (username, username))
-        
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            return None
-        
-        if not verify_password(password, user_data['password_hash']):
-            return None
-        
-        if not user_data['is_active']:
-            return None
-        
-        return User.from_dict(user_data)
+        user = principal_service.get_by_login(cursor, username, with_password=True)
+    
+    if not user:
+        verify_dummy_password(password)
+        return None
+    
+    if not verify_password(password, user.password_hash):
+        return None
+    
+    if not user.is_active:
+        return None
+    
+    return user
 
 
 def get_user_by_id(user_id: int) -> Optional[User]:
     """Get user by ID"""
     with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT u.id, u.org_id, u.email, u.password_hash, u.username, u.full_name, u.is_active, u.created_at, 
-                   r.name as role, d.name as department, o.name as org_name
-            FROM users u
-            LEFT JOIN user_roles ur ON u.id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.id
-            LEFT JOIN user_departments ud ON u.id = ud.user_id
-            LEFT JOIN departments d ON ud.department_id = d.id
-            LEFT JOIN organizations o ON u.org_id = o.id
-            WHERE u.id = %s
-        """, (user_id,))
-        
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            return None
-        
-        return User.from_dict(user_data)
+        return principal_service.get_by_id(cursor, user_id)
 
 
 def get_user_by_email(email: str) -> Optional[User]:
     """Get user by email"""
     with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT u.id, u.org_id, u.email, u.password_hash, u.username, u.full_name, u.is_active, u.created_at, 
-                   r.name as role, d.name as department, o.name as org_name
-            FROM users u
-            LEFT JOIN user_roles ur ON u.id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.id
-            LEFT JOIN user_departments ud ON u.id = ud.user_id
-            LEFT JOIN departments d ON ud.department_id = d.id
-            LEFT JOIN organizations o ON u.org_id = o.id
-            WHERE u.email = %s
-        """, (email,))
-        
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            return None
-        
-        return User.from_dict(user_data)
+        return principal_service.get_by_email(cursor, email)
 
 
 def create_access_token_for_user(user: User) -> str:
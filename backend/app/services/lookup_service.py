@@ -0,0 +1,95 @@
+"""
+In-process registry of role ids by name, department ids by org and name, and
+the organizations each owner created.
+
+Roles, departments and organizations are only ever added: nothing renames
+or deletes a department, deletes an organization or changes its owner. So
+entries can be kept for the life of the process and no other worker ever
+has to be told to drop one. The registry is loaded at startup; a name it
+doesn't know yet is looked up with the caller's cursor and remembered once
+that transaction commits, so an id from a rolled-back insert is never
+cached. An owner's organizations are re-read when one isn't found, which
+picks up organizations created by other workers.
+"""
+import threading
+from typing import Dict, FrozenSet, Optional, Tuple
+import logging
+
+from app.core.database import get_db_cursor, on_commit
+
+logger = logging.getLogger(__name__)
+
+_roles: Dict[str, int] = {}
+_departments: Dict[Tuple[int, str], int] = {}
+_owned_orgs: Dict[int, FrozenSet[int]] = {}
+_lock = threading.Lock()
+
+
+def load():
+    """Fill the registry with every role, department and organization owner"""
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT id, name FROM roles")
+        roles = {row['name']: row['id'] for row in cursor.fetchall()}
+        cursor.execute("SELECT id, org_id, name FROM departments")
+        departments = {(row['org_id'], row['name']): row['id'] for row in cursor.fetchall()}
+        cursor.execute("SELECT created_by, array_agg(id) AS org_ids FROM organizations GROUP BY created_by")
+        owned_orgs = {row['created_by']: frozenset(row['org_ids']) for row in cursor.fetchall()}
+    with _lock:
+        _roles.update(roles)
+        _departments.update(departments)
+        _owned_orgs.update(owned_orgs)
+    logger.info(f"Loaded {len(roles)} roles, {len(departments)} departments and {len(owned_orgs)} owners")
+
+
+def _remember(cache: dict, key, value):
+    with _lock:
+        cache[key] = value
+
+
+def role_id(cursor, name: str, create: bool = False) -> Optional[int]:
+    """Id of the role ``name``; with ``create`` the role is added if missing"""
+    cached = _roles.get(name)
+    if cached is not None:
+        return cached
+    if create:
+        cursor.execute("INSERT INTO roles (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (name,))
+    cursor.execute("SELECT id FROM roles WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    on_commit(cursor, lambda: _remember(_roles, name, row['id']))
+    return row['id']
+
+
+def department_id(cursor, org_id: int, name: str) -> Optional[int]:
+    """Id of the org's department ``name``, or None if it doesn't have one"""
+    cached = _departments.get((org_id, name))
+    if cached is not None:
+        return cached
+    cursor.execute("SELECT id FROM departments WHERE org_id = %s AND name = %s", (org_id, name))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    remember_department(cursor, org_id, name, row['id'])
+    return row['id']
+
+
+def remember_department(cursor, org_id: int, name: str, department_id: int):
+    """Register a department once the cursor's transaction commits"""
+    on_commit(cursor, lambda: _remember(_departments, (org_id, name), department_id))
+
+
+def owns_org(owner_id: int, org_id: int) -> bool:
+    """Whether ``owner_id`` created ``org_id``.
+
+    A miss re-reads the owner's organizations, so an organization created
+    since (by any worker) is found without an invalidation.
+    """
+    owned = _owned_orgs.get(owner_id)
+    if owned is not None and org_id in owned:
+        return True
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT id FROM organizations WHERE created_by = %s", (owner_id,))
+        owned = frozenset(row['id'] for row in cursor.fetchall())
+    _remember(_owned_orgs, owner_id, owned)
+    return org_id in owned
@@ -0,0 +1,34 @@
+from typing import Iterable, Optional
+from app.core.database import get_db_cursor
+from app.core.jobs import job_handler
+from app.services import lookup_service
+
+DEFAULT_DEPARTMENTS = ("stock", "sales")
+
+
+def ensure_departments(cursor, org_id: int, names: Iterable[str], created_by: Optional[int] = None):
+    """Create whichever of the named departments the org doesn't have yet.
+
+    Locks the organization row so the background job and a request creating
+    the same department can't both insert it.
+    """
+    cursor.execute("SELECT id FROM organizations WHERE id = %s FOR UPDATE", (org_id,))
+    if not cursor.fetchone():
+        return
+    cursor.execute("""
+        INSERT INTO departments (org_id, name, created_by)
+        SELECT %s, wanted.name, %s
+        FROM unnest(%s::varchar[]) AS wanted(name)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM departments d WHERE d.org_id = %s AND d.name = wanted.name
+        )
+        RETURNING id, name
+    """, (org_id, created_by, list(names), org_id))
+    for row in cursor.fetchall():
+        lookup_service.remember_department(cursor, org_id, row['name'], row['id'])
+
+
+@job_handler("org.create_default_departments")
+def create_default_departments(payload: dict):
+    with get_db_cursor() as cursor:
+        ensure_departments(cursor, payload["org_id"], DEFAULT_DEPARTMENTS, payload.get("created_by"))
@@ -0,0 +1,83 @@
+"""
+Loading users together with their role, department and organization name.
+
+Every lookup of a user "principal" goes through ``PRINCIPAL_FROM`` so the
+join lives in one place. Role and department come from ``LIMIT 1`` lateral
+subqueries on the ``(user_id, ...)`` primary keys of ``user_roles`` and
+``user_departments``: a lookup is always a single row, even if a user ever
+ends up with more than one role or department.
+
+Usernames and emails are matched case-insensitively through the
+``lower(username)`` and ``lower(email)`` unique indexes.
+"""
+from typing import List, Optional
+
+from app.models.user import User
+from app.core import prepared
+
+PRINCIPAL_COLUMNS = """
+    u.id, u.org_id, u.email, u.username, u.full_name, u.is_active, u.created_at,
+    r.name AS role, d.name AS department, o.name AS org_name
+"""
+
+PRINCIPAL_FROM = """
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT roles.name
+        FROM user_roles
+        JOIN roles ON roles.id = user_roles.role_id
+        WHERE user_roles.user_id = u.id
+        ORDER BY user_roles.role_id
+        LIMIT 1
+    ) r ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT departments.name
+        FROM user_departments
+        JOIN departments ON departments.id = user_departments.department_id
+        WHERE user_departments.user_id = u.id
+        ORDER BY user_departments.department_id
+        LIMIT 1
+    ) d ON TRUE
+    LEFT JOIN organizations o ON o.id = u.org_id
+"""
+
+
+def _fetch_one(cursor, where: str, params: tuple, with_password: bool) -> Optional[User]:
+    columns = PRINCIPAL_COLUMNS + (", u.password_hash" if with_password else "")
+    prepared.execute(cursor, f"SELECT {columns} {PRINCIPAL_FROM} WHERE {where}", params)
+    row = cursor.fetchone()
+    return User.from_dict(row) if row else None
+
+
+def get_by_id(cursor, user_id: int, with_password: bool = False) -> Optional[User]:
+    return _fetch_one(cursor, "u.id = %s", (user_id,), with_password)
+
+
+def get_by_email(cursor, email: str, with_password: bool = False) -> Optional[User]:
+    return _fetch_one(cursor, "lower(u.email) = lower(%s)", (email,), with_password)
+
+
+def get_by_login(cursor, login: str, with_password: bool = False) -> Optional[User]:
+    """User whose username or email is ``login``, ignoring case.
+
+    Each branch of the UNION ALL is a probe of one ``lower()`` unique index,
+    where ``username = %s OR email = %s`` would need a bitmap OR of both.
+    """
+    where = """u.id = (
+        SELECT id FROM users WHERE lower(username) = lower(%s)
+        UNION ALL
+        SELECT id FROM users WHERE lower(email) = lower(%s)
+        LIMIT 1
+    )"""
+    return _fetch_one(cursor, where, (login, login), with_password)
+
+
+def list_org_users(cursor, org_id: int, role: Optional[str] = None) -> List:
+    """Rows (never with the password hash) for the org's users, optionally of one role"""
+    query = f"SELECT {PRINCIPAL_COLUMNS} {PRINCIPAL_FROM} WHERE u.org_id = %s"
+    params = [org_id]
+    if role:
+        query += " AND r.name = %s"
+        params.append(role)
+    cursor.execute(query, tuple(params))
+    return cursor.fetchall()
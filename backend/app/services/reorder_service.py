@@ -0,0 +1,167 @@
+"""
+Reorder suggestions: draft shipments for items at or below ``min_threshold``.
+
+The ``reorder.scan`` job walks orgs that have low stock in ``org_id`` order,
+``REORDER_ORGS_PER_BATCH`` at a time, finding them through the partial
+``idx_stock_items_low`` index. Each batch is one short set-based transaction
+that also queues the job for the next batch, so a scan over thousands of orgs
+never holds a long transaction and resumes where it left off after a crash.
+
+A draft has one line item and orders the item back up to ``max_capacity`` from
+its preferred supplier: among the suppliers that have shipped that item
+before, the best average score, then the most recent delivery. An item never
+shipped before goes to the org's best supplier by the same measure over all
+rated shipments. Items that already have an open reorder draft are skipped.
+Owners confirm a draft by moving it to 'Pending'.
+"""
+from typing import List, Optional
+import logging
+
+from app.core.config import settings
+from app.core.database import get_db_cursor
+from app.core.cache import invalidate_org
+from app.core.events import emit
+from app.core.jobs import enqueue_job, job_handler, periodic_job
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_ORGS_SQL = """
+    SELECT DISTINCT org_id FROM stock_items
+    WHERE quantity <= min_threshold AND org_id > %s
+    ORDER BY org_id
+    LIMIT %s
+"""
+
+CREATE_DRAFTS_SQL = """
+    WITH low AS (
+        SELECT i.id, i.org_id, i.name, i.quantity, i.min_threshold, i.max_capacity
+        FROM stock_items i
+        WHERE i.org_id = ANY(%(org_ids)s) AND i.quantity <= i.min_threshold
+    ),
+    -- Shipments that carried a low item, as a line item or as the shipment's own item
+    item_shipments AS (
+        SELECT si.stock_item_id, si.shipment_id
+        FROM shipment_items si JOIN low ON low.id = si.stock_item_id
+        UNION
+        SELECT sh.stock_item_id, sh.id
+        FROM shipments sh JOIN low ON low.id = sh.stock_item_id
+    ),
+    item_candidates AS (
+        SELECT its.stock_item_id, sh.supplier_id,
+               avg(sh.score) AS avg_score,
+               max(sh.received_date) AS last_received,
+               avg(sh.received_date - sh.created_at::date) AS lead_days
+        FROM item_shipments its
+        JOIN shipments sh ON sh.id = its.shipment_id
+        WHERE sh.status NOT IN ('Draft', 'Cancelled')
+        GROUP BY its.stock_item_id, sh.supplier_id
+    ),
+    item_preferred AS (
+        SELECT DISTINCT ON (stock_item_id) stock_item_id, supplier_id, lead_days
+        FROM item_candidates
+        ORDER BY stock_item_id, avg_score DESC NULLS LAST, last_received DESC NULLS LAST, supplier_id
+    ),
+    -- For items never shipped before: the org's best supplier overall
+    candidates AS (
+        SELECT sup.org_id, sup.id AS supplier_id,
+               avg(sh.score) AS avg_score,
+               max(sh.received_date) AS last_received,
+               avg(sh.received_date - sh.created_at::date) AS lead_days
+        FROM suppliers sup
+        LEFT JOIN shipments sh ON sh.supplier_id = sup.id AND sh.score IS NOT NULL
+        WHERE sup.org_id = ANY(%(org_ids)s)
+        GROUP BY sup.org_id, sup.id
+    ),
+    preferred AS (
+        SELECT DISTINCT ON (org_id) org_id, supplier_id, lead_days
+        FROM candidates
+        ORDER BY org_id, avg_score DESC NULLS LAST, last_received DESC NULLS LAST, supplier_id
+    ),
+    choice AS (
+        SELECT low.*,
+               COALESCE(ip.supplier_id, p.supplier_id) AS supplier_id,
+               CASE WHEN ip.supplier_id IS NOT NULL THEN ip.lead_days ELSE p.lead_days END AS lead_days
+        FROM low
+        LEFT JOIN item_preferred ip ON ip.stock_item_id = low.id
+        LEFT JOIN preferred p ON p.org_id = low.org_id
+    ),
+    drafts AS (
+        INSERT INTO shipments (org_id, supplier_id, stock_item_id, expected_quantity, expected_date, notes, status, origin)
+        SELECT c.org_id, c.supplier_id, c.id,
+               GREATEST(c.max_capacity - c.quantity, 1),
+               CURRENT_DATE + GREATEST(COALESCE(round(c.lead_days)::int, %(lead_days)s), 1),
+               'Reorder: ' || c.name || ' (' || c.quantity || ' left, threshold ' || c.min_threshold || ')',
+               'Draft', 'reorder'
+        FROM choice c
+        WHERE c.supplier_id IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM shipments pending
+            WHERE pending.stock_item_id = c.id AND pending.status IN ('Draft', 'Pending')
+        )
+        ON CONFLICT (stock_item_id) WHERE status = 'Draft' DO NOTHING
+        RETURNING id, org_id, supplier_id, stock_item_id, expected_quantity, expected_date, notes, status, origin,
+                  created_at, updated_at
+    ),
+    lines AS (
+        INSERT INTO shipment_items (shipment_id, stock_item_id, expected_quantity)
+        SELECT id, stock_item_id, expected_quantity FROM drafts
+    )
+    SELECT * FROM drafts
+"""
+
+
+def create_reorder_drafts(cursor, org_ids: List[int]) -> int:
+    """Create draft shipments for the given orgs' low-stock items; returns how many"""
+    if not org_ids:
+        return 0
+    cursor.execute(CREATE_DRAFTS_SQL, {"org_ids": list(org_ids), "lead_days": settings.REORDER_DEFAULT_LEAD_DAYS})
+    drafts = cursor.fetchall()
+    # In id order, so concurrent scans lock the orgs' data_versions rows in the same order
+    for org_id in sorted({draft['org_id'] for draft in drafts}):
+        invalidate_org(org_id, "shipments", cursor=cursor)
+    for draft in drafts:
+        emit(cursor, draft['org_id'], "shipments", "created", {
+            **draft,
+            "expected_date": draft['expected_date'].isoformat(),
+            "created_at": draft['created_at'].isoformat(),
+            "updated_at": draft['updated_at'].isoformat(),
+        })
+    return len(drafts)
+
+
+def scan_batch(after_org_id: int = 0, batch_size: Optional[int] = None) -> Optional[int]:
+    """Process one batch of orgs after ``after_org_id``.
+
+    Returns the last org id of the batch when there may be more to do.
+    """
+    batch_size = batch_size or settings.REORDER_ORGS_PER_BATCH
+    with get_db_cursor() as cursor:
+        cursor.execute(LOW_STOCK_ORGS_SQL, (after_org_id, batch_size))
+        org_ids = [row['org_id'] for row in cursor.fetchall()]
+        created = create_reorder_drafts(cursor, org_ids)
+        if org_ids:
+            logger.info(f"Reorder scan: {created} draft(s) for orgs {org_ids[0]}..{org_ids[-1]}")
+
+        if len(org_ids) < batch_size:
+            return None
+        enqueue_job(cursor, "reorder.scan", {"after_org_id": org_ids[-1]})
+        return org_ids[-1]
+
+
+@job_handler("reorder.scan")
+def reorder_scan_job(payload: dict):
+    scan_batch(payload.get("after_org_id", 0))
+
+
+@job_handler("reorder.scan_org")
+def reorder_scan_org_job(payload: dict):
+    with get_db_cursor() as cursor:
+        create_reorder_drafts(cursor, [payload["org_id"]])
+
+
+def queue_if_crossed(cursor, org_id: int, before: int, after: int, min_threshold: int):
+    """Queue a reorder check for the org when a stock change crosses the threshold"""
+    if before > min_threshold >= after:
+        enqueue_job(cursor, "reorder.scan_org", {"org_id": org_id})
+
+
+periodic_job("reorder.scan", settings.REORDER_SCAN_INTERVAL_SECONDS)
@@ -1,11 +1,21 @@
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from psycopg2.extras import NamedTupleCursor
 from app.core.database import get_db_cursor
+from app.core.replica import read_cursor
+from app.core.cache import cached, invalidate_org
+from app.core.events import emit
+from app.core import audit
+from app.core import prepared
+from app.core.partitions import period_filter
 from app.schemas.sales import SaleCreate, SaleResponse
+from app.services.stock_service import get_stock_status
+from app.services import reorder_service, sync_service
 
 def create_sale(sale_data: SaleCreate, user_id: int, org_id: int) -> SaleResponse:
     with get_db_cursor() as cursor:
         # 1. Check stock availability and get item details
-        cursor.execute("""
+        prepared.execute(cursor, """
             SELECT name, quantity, price 
             FROM stock_items 
             WHERE id = %s AND org_id = %s
@@ -22,14 +32,17 @@ def create_sale(sale_data: SaleCreate, user_id: int, org_id: int) -> SaleRespons
         total_price = float(item['price']) * sale_data.quantity
         
         # 3. Deduct stock
-        cursor.execute("""
+        prepared.execute(cursor, """
             UPDATE stock_items 
             SET quantity = quantity - %s, updated_at = NOW()
             WHERE id = %s
+            RETURNING quantity, min_threshold, max_capacity
         """, (sale_data.quantity, sale_data.stock_item_id))
+        stock_row = cursor.fetchone()
+        reorder_service.queue_if_crossed(cursor, org_id, item['quantity'], stock_row['quantity'], stock_row['min_threshold'])
         
         # 4. Record sale
-        cursor.execute("""
+        prepared.execute(cursor, """
             INSERT INTO sales (org_id, stock_item_id, sold_by, quantity, total_price)
             VALUES (%s, %s, %s, %s, %s)
             RETURNING id, sale_date
@@ -38,11 +51,13 @@ def create_sale(sale_data: SaleCreate, user_id: int, org_id: int) -> SaleRespons
         sale_row = cursor.fetchone()
         
         # Get user name for response
-        cursor.execute("SELECT full_name FROM users WHERE id = %s", (user_id,))
+        prepared.execute(cursor, "SELECT full_name FROM users WHERE id = %s", (user_id,))
         user_row = cursor.fetchone()
         user_name = user_row['full_name'] if user_row else "Unknown"
         
-        return SaleResponse(
+        invalidate_org(org_id, "stock", "sales", "analytics", cursor=cursor)
+        
+        sale = SaleResponse(
             id=sale_row['id'],
             org_id=org_id,
             stock_item_id=sale_data.stock_item_id,
@@ -53,32 +68,57 @@ def create_sale(sale_data: SaleCreate, user_id: int, org_id: int) -> SaleRespons
             total_price=total_price,
             sale_date=sale_row['sale_date']
         )
+        emit(cursor, org_id, "stock", "quantity", {
+            "id": sale_data.stock_item_id,
+            "quantity": stock_row['quantity'],
+            "status": get_stock_status(stock_row['quantity'], stock_row['min_threshold'], stock_row['max_capacity'])
+        })
+        emit(cursor, org_id, "sales", "created", sale)
+        audit.record(cursor, org_id, user_id, "create", "sales", sale.id, after={
+            "stock_item_id": sale.stock_item_id,
+            "quantity": sale.quantity,
+            "total_price": sale.total_price,
+            "stock_quantity": stock_row['quantity']
+        })
+        return sale
 
-def get_sales_history(org_id: int) -> List[SaleResponse]:
-    with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT s.id, s.org_id, s.stock_item_id, s.sold_by, s.quantity, s.total_price, s.sale_date,
-                   i.name as item_name, u.full_name as user_name
-            FROM sales s
-            LEFT JOIN stock_items i ON s.stock_item_id = i.id
-            LEFT JOIN users u ON s.sold_by = u.id
-            WHERE s.org_id = %s
+# Columns of SaleResponse for compact list rows
+SALES_LIST_SELECT = """
+    SELECT s.id, s.org_id, s.stock_item_id, s.sold_by, s.quantity,
+           s.total_price::float8 AS total_price, s.sale_date,
+           i.name as stock_item_name, u.full_name as sold_by_name
+    FROM sales s
+    LEFT JOIN stock_items i ON s.stock_item_id = i.id
+    LEFT JOIN users u ON s.sold_by = u.id
+"""
+
+@cached("sales")
+def get_sales_history(org_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[tuple]:
+    """List an org's sales as compact rows shaped like SaleResponse, optionally of some days only"""
+    period, params = period_filter("s.sale_date", date_from, date_to)
+    with read_cursor(org_id, cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(f"""
+            {SALES_LIST_SELECT}
+            WHERE s.org_id = %s{period}
             ORDER BY s.sale_date DESC
-        """, (org_id,))
+        """, (org_id, *params))
         
-        rows = cursor.fetchall()
-        sales = []
-        for row in rows:
-            sales.append(SaleResponse(
-                id=row['id'],
-                org_id=row['org_id'],
-                stock_item_id=row['stock_item_id'],
-                stock_item_name=row['item_name'],
-                sold_by=row['sold_by'],
-                sold_by_name=row['user_name'],
-                quantity=row['quantity'],
-                total_price=float(row['total_price']),
-                sale_date=row['sale_date']
-            ))
-            
-        return sales
+        return cursor.fetchall()
+
+def get_sales_changes(org_id: int, since: Optional[datetime]) -> Dict[str, Any]:
+    """Sales recorded since the sync cursor.
+
+    Sales are never edited, but deleting a stock item or user clears the
+    reference on their sales; those ids come back under ``deleted`` so the
+    client can blank the names it shows.
+    """
+    start = sync_service.window_start(since)
+    with get_db_cursor(cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(f"""
+            {SALES_LIST_SELECT}
+            WHERE s.org_id = %s AND (%s::timestamptz IS NULL OR s.sale_date >= %s)
+            ORDER BY s.sale_date
+        """, (org_id, start, start))
+        items = cursor.fetchall()
+        deleted = sync_service.get_deleted_ids(cursor, org_id, ("stock_items", "users"), start)
+        return sync_service.changes(cursor, items, deleted)
@@ -1,5 +1,12 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from psycopg2.extras import NamedTupleCursor
 from app.core.database import get_db_cursor
+from app.core.replica import read_cursor
+from app.core.cache import cached, invalidate_org
+from app.core.events import emit
+from app.core import audit
+from app.services import sync_service
 from app.schemas.stock import StockItemCreate, StockItemUpdate, StockItemResponse
 
 def get_stock_status(quantity: int, min_threshold: int, max_capacity: int) -> str:
@@ -12,7 +19,21 @@ def get_stock_status(quantity: int, min_threshold: int, max_capacity: int) -> st
         
     return "medium"
 
-def create_stock_item(item_data: StockItemCreate, org_id: int) -> StockItemResponse:
+# SQL twin of get_stock_status for list queries (a zero capacity reads as medium)
+STOCK_STATUS_SQL = """
+    CASE WHEN quantity <= min_threshold THEN 'low'
+         WHEN quantity * 100.0 / NULLIF(max_capacity, 0) >= 80 THEN 'high'
+         ELSE 'medium' END
+"""
+
+# Columns of StockItemResponse for compact list rows
+STOCK_LIST_COLUMNS = f"""
+    id, org_id, name, category, quantity, min_threshold, max_capacity,
+    price::float8 AS price, cost_price::float8 AS cost_price,
+    {STOCK_STATUS_SQL} AS status, created_at, updated_at
+"""
+
+def create_stock_item(item_data: StockItemCreate, org_id: int, actor_id: Optional[int] = None) -> StockItemResponse:
     with get_db_cursor() as cursor:
         cursor.execute("""
             INSERT INTO stock_items (org_id, name, category, quantity, min_threshold, max_capacity, price, cost_price)
@@ -24,9 +45,10 @@ def create_stock_item(item_data: StockItemCreate, org_id: int) -> StockItemRespo
         if not row:
             raise Exception("Failed to create stock item")
             
+        invalidate_org(org_id, "stock", cursor=cursor)
         status = get_stock_status(row['quantity'], row['min_threshold'], row['max_capacity'])
         
-        return StockItemResponse(
+        item = StockItemResponse(
             id=row['id'],
             org_id=row['org_id'],
             name=row['name'],
@@ -40,38 +62,43 @@ def create_stock_item(item_data: StockItemCreate, org_id: int) -> StockItemRespo
             created_at=row['created_at'],
             updated_at=row['updated_at']
         )
+        emit(cursor, org_id, "stock", "created", item)
+        audit.record(cursor, org_id, actor_id, "create", "stock_items", item.id, after=item)
+        return item
 
-def get_stock_items(org_id: int) -> List[StockItemResponse]:
-    with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT id, org_id, name, category, quantity, min_threshold, max_capacity, price, cost_price, created_at, updated_at
+@cached("stock")
+def get_stock_items(org_id: int) -> List[tuple]:
+    """List an org's stock as compact rows shaped like StockItemResponse.
+
+    Rows go straight to FastJSONResponse, so NUMERIC columns are cast to float
+    and the status is derived in SQL.
+    """
+    with read_cursor(org_id, cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {STOCK_LIST_COLUMNS}
             FROM stock_items
             WHERE org_id = %s
             ORDER BY created_at DESC
         """, (org_id,))
         
-        rows = cursor.fetchall()
-        items = []
-        for row in rows:
-            status = get_stock_status(row['quantity'], row['min_threshold'], row['max_capacity'])
-            items.append(StockItemResponse(
-                id=row['id'],
-                org_id=row['org_id'],
-                name=row['name'],
-                category=row['category'],
-                quantity=row['quantity'],
-                min_threshold=row['min_threshold'],
-                max_capacity=row['max_capacity'],
-                price=float(row['price']),
-                cost_price=float(row['cost_price']),
-                status=status,
-                created_at=row['created_at'],
-                updated_at=row['updated_at']
-            ))
-            
-        return items
+        return cursor.fetchall()
+
+def get_stock_changes(org_id: int, since: Optional[datetime]) -> Dict[str, Any]:
+    """Items created or updated since the sync cursor, plus deleted item ids"""
+    start = sync_service.window_start(since)
+    with get_db_cursor(cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {STOCK_LIST_COLUMNS}
+            FROM stock_items
+            WHERE org_id = %s AND (%s::timestamptz IS NULL OR updated_at >= %s)
+            ORDER BY updated_at
+        """, (org_id, start, start))
+        items = cursor.fetchall()
+        deleted = sync_service.get_deleted_ids(cursor, org_id, ("stock_items",), start)
+        return sync_service.changes(cursor, items, deleted)
 
-def update_stock_item(item_id: int, item_data: StockItemUpdate, org_id: int) -> Optional[StockItemResponse]:
+def update_stock_item(item_id: int, item_data: StockItemUpdate, org_id: int,
+                      actor_id: Optional[int] = None) -> Optional[StockItemResponse]:
     updates = []
     values = []
     
@@ -104,11 +131,20 @@ def update_stock_item(item_id: int, item_data: StockItemUpdate, org_id: int) ->
     values.append(item_id)
     values.append(org_id)
     
+    # The locked "old" row gives the audit log the previous values in the same statement
     query = f"""
-        UPDATE stock_items
+        UPDATE stock_items s
         SET {', '.join(updates)}
-        WHERE id = %s AND org_id = %s
-        RETURNING id, org_id, name, category, quantity, min_threshold, max_capacity, price, cost_price, created_at, updated_at
+        FROM (
+            SELECT id, name, category, quantity, min_threshold, max_capacity,
+                   price::float8 AS price, cost_price::float8 AS cost_price
+            FROM stock_items
+            WHERE id = %s AND org_id = %s
+            FOR UPDATE
+        ) old
+        WHERE s.id = old.id
+        RETURNING s.id, s.org_id, s.name, s.category, s.quantity, s.min_threshold, s.max_capacity,
+                  s.price, s.cost_price, s.created_at, s.updated_at, to_jsonb(old) AS before
     """
     
     with get_db_cursor() as cursor:
@@ -118,9 +154,11 @@ def update_stock_item(item_id: int, item_data: StockItemUpdate, org_id: int) ->
         if not row:
             return None
             
+        # Names and cost prices also show up in sales, losses, shipment items and COGS
+        invalidate_org(org_id, "stock", "sales", "losses", "shipments", "analytics", cursor=cursor)
         status = get_stock_status(row['quantity'], row['min_threshold'], row['max_capacity'])
         
-        return StockItemResponse(
+        item = StockItemResponse(
             id=row['id'],
             org_id=row['org_id'],
             name=row['name'],
@@ -134,13 +172,23 @@ def update_stock_item(item_id: int, item_data: StockItemUpdate, org_id: int) ->
             created_at=row['created_at'],
             updated_at=row['updated_at']
         )
+        emit(cursor, org_id, "stock", "updated", item)
+        audit.record(cursor, org_id, actor_id, "update", "stock_items", item_id, before=row['before'], after=item)
+        return item
 
-def delete_stock_item(item_id: int, org_id: int) -> bool:
+def delete_stock_item(item_id: int, org_id: int, actor_id: Optional[int] = None) -> bool:
     with get_db_cursor() as cursor:
         cursor.execute("""
             DELETE FROM stock_items
             WHERE id = %s AND org_id = %s
-            RETURNING id
+            RETURNING id, name, category, quantity, price::float8 AS price, cost_price::float8 AS cost_price
         """, (item_id, org_id))
         
-        return cursor.fetchone() is not None
+        row = cursor.fetchone()
+        deleted = row is not None
+        if deleted:
+            audit.record(cursor, org_id, actor_id, "delete", "stock_items", item_id, before=dict(row))
+            invalidate_org(org_id, "stock", "sales", "losses", "shipments", "analytics", cursor=cursor)
+            emit(cursor, org_id, "stock", "deleted", {"id": item_id})
+            sync_service.record_deletion(cursor, org_id, "stock_items", item_id)
+        return deleted
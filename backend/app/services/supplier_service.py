@@ -1,14 +1,22 @@
-from typing import List, Optional
-from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime
+from psycopg2.extras import NamedTupleCursor
 from app.core.database import get_db_cursor
+from app.core.replica import read_cursor
+from app.core.cache import cached, invalidate_org
+from app.core.events import emit
+from app.core import audit
+from app.services import sync_service
 from app.schemas.supplier import (
     SupplierCreate, SupplierResponse, 
-    ShipmentCreate, ShipmentResponse, ShipmentRate, ShipmentUpdateStatus
+    ShipmentCreate, ShipmentResponse, ShipmentRate, ShipmentUpdateStatus,
+    ShipmentItemCreate, ShipmentItemReceive
 )
+from app.services.stock_service import get_stock_status
 
 # --- Suppliers ---
 
-def create_supplier(data: SupplierCreate, org_id: int) -> SupplierResponse:
+def create_supplier(data: SupplierCreate, org_id: int, actor_id: Optional[int] = None) -> SupplierResponse:
     with get_db_cursor() as cursor:
         cursor.execute("""
             INSERT INTO suppliers (org_id, name, phone, email, address)
@@ -18,20 +26,29 @@ def create_supplier(data: SupplierCreate, org_id: int) -> SupplierResponse:
         row = cursor.fetchone()
         if not row:
             raise Exception("Failed to create supplier")
-        return SupplierResponse(**row)
+        invalidate_org(org_id, "suppliers", cursor=cursor)
+        supplier = SupplierResponse(**row)
+        audit.record(cursor, org_id, actor_id, "create", "suppliers", supplier.id, after=supplier)
+        return supplier
 
-def get_suppliers(org_id: int) -> List[SupplierResponse]:
-    with get_db_cursor() as cursor:
+@cached("suppliers")
+def get_suppliers(org_id: int) -> List[tuple]:
+    with read_cursor(org_id, cursor_factory=NamedTupleCursor) as cursor:
         cursor.execute("""
             SELECT id, org_id, name, phone, email, address, created_at, updated_at
             FROM suppliers WHERE org_id = %s ORDER BY name ASC
         """, (org_id,))
-        rows = cursor.fetchall()
-        return [SupplierResponse(**row) for row in rows]
+        return cursor.fetchall()
 
 # --- Shipments ---
 
-def create_shipment(data: ShipmentCreate, org_id: int) -> ShipmentResponse:
+def create_shipment(data: ShipmentCreate, org_id: int, actor_id: Optional[int] = None) -> ShipmentResponse:
+    expected_quantity = data.expected_quantity
+    if expected_quantity is None:
+        if not data.items:
+            raise Exception("expected_quantity or items required")
+        expected_quantity = sum(item.expected_quantity for item in data.items)
+
     with get_db_cursor() as cursor:
         # Verify supplier belongs to org
         cursor.execute("SELECT id FROM suppliers WHERE id = %s AND org_id = %s", (data.supplier_id, org_id))
@@ -41,84 +58,318 @@ def create_shipment(data: ShipmentCreate, org_id: int) -> ShipmentResponse:
         cursor.execute("""
             INSERT INTO shipments (org_id, supplier_id, expected_quantity, expected_date, notes, status)
             VALUES (%s, %s, %s, %s, %s, 'Pending')
-            RETURNING id, org_id, supplier_id, expected_quantity, expected_date, notes, status, created_at, updated_at
-        """, (org_id, data.supplier_id, data.expected_quantity, data.expected_date, data.notes))
+            RETURNING id, org_id, supplier_id, expected_quantity, expected_date, notes, status, origin, created_at, updated_at
+        """, (org_id, data.supplier_id, expected_quantity, data.expected_date, data.notes))
         
         row = cursor.fetchone()
         if not row:
             raise Exception("Failed to create shipment")
+
+        items = None
+        if data.items:
+            items = add_shipment_items(cursor, row['id'], org_id, data.items)
             
+        invalidate_org(org_id, "shipments", cursor=cursor)
+
         # Enrich with supplier name for convenience mostly
         # Actually returning simple response for now, list view will join
-        return ShipmentResponse(**row, received_quantity=None, damaged_quantity=None, received_date=None, score=None)
+        shipment = ShipmentResponse(**row, received_quantity=None, damaged_quantity=None, received_date=None, score=None, items=items)
+        emit(cursor, org_id, "shipments", "created", shipment)
+        audit.record(cursor, org_id, actor_id, "create", "shipments", shipment.id, after=shipment)
+        return shipment
 
-def get_shipments(org_id: int) -> List[ShipmentResponse]:
-    with get_db_cursor() as cursor:
-        cursor.execute("""
-            SELECT s.*, sup.name as supplier_name
-            FROM shipments s
-            JOIN suppliers sup ON s.supplier_id = sup.id
+def add_shipment_items(cursor, shipment_id: int, org_id: int, items: List[ShipmentItemCreate]) -> List[dict]:
+    """Insert line items in one statement, rejecting items from other orgs"""
+    cursor.execute("""
+        INSERT INTO shipment_items (shipment_id, stock_item_id, expected_quantity)
+        SELECT %s, i.id, wanted.expected_quantity
+        FROM unnest(%s::int[], %s::int[]) AS wanted(stock_item_id, expected_quantity)
+        JOIN stock_items i ON i.id = wanted.stock_item_id AND i.org_id = %s
+        RETURNING stock_item_id, expected_quantity
+    """, (
+        shipment_id,
+        [item.stock_item_id for item in items],
+        [item.expected_quantity for item in items],
+        org_id
+    ))
+    rows = cursor.fetchall()
+    if len(rows) != len(items):
+        raise Exception("Stock item not found")
+    return rows
+
+# Shipments still on their way. Kept textually identical to the predicate of
+# idx_shipments_open so the planner can use that partial index.
+OPEN_SHIPMENT_SQL = "s.status NOT IN ('Arrived', 'Draft', 'Cancelled')"
+
+# Late: marked Late by hand, open past the expected date, or delivered after
+# it. The one rule behind both is_late and the status=Late filter.
+LATE_SHIPMENT_SQL = f"""
+    (s.status = 'Late' OR ({OPEN_SHIPMENT_SQL} AND s.expected_date < CURRENT_DATE)
+     OR s.received_date > s.expected_date)
+"""
+
+SHIPMENT_LIST_SELECT = f"""
+    SELECT s.id, s.org_id, s.supplier_id, s.expected_quantity, s.expected_date, s.notes,
+           s.received_quantity, s.damaged_quantity, s.received_date, s.status, s.score,
+           s.created_at, s.updated_at, s.stock_item_id, s.origin, sup.name as supplier_name,
+           COALESCE({LATE_SHIPMENT_SQL}, false) AS is_late,
+           CASE WHEN {LATE_SHIPMENT_SQL}
+                THEN GREATEST(COALESCE(s.received_date, CURRENT_DATE) - s.expected_date, 0) ELSE 0 END AS days_late,
+           (SELECT json_agg(json_build_object(
+                       'stock_item_id', si.stock_item_id, 'stock_item_name', i.name,
+                       'expected_quantity', si.expected_quantity, 'received_quantity', si.received_quantity,
+                       'damaged_quantity', si.damaged_quantity) ORDER BY si.id)
+            FROM shipment_items si
+            LEFT JOIN stock_items i ON i.id = si.stock_item_id
+            WHERE si.shipment_id = s.id) AS items
+    FROM shipments s
+    JOIN suppliers sup ON s.supplier_id = sup.id
+"""
+
+@cached("shipments")
+def get_shipments(org_id: int) -> List[tuple]:
+    with read_cursor(org_id, cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(f"""
+            {SHIPMENT_LIST_SELECT}
             WHERE s.org_id = %s
             ORDER BY s.expected_date ASC
         """, (org_id,))
-        rows = cursor.fetchall()
-        return [ShipmentResponse(**row) for row in rows]
+        return cursor.fetchall()
 
-def update_shipment_status(shipment_id: int, data: ShipmentUpdateStatus, org_id: int) -> bool:
-    with get_db_cursor() as cursor:
-        updates = ["status = %s", "updated_at = NOW()"]
-        values = [data.status]
-        
-        if data.received_date:
-            updates.append("received_date = %s")
-            values.append(data.received_date)
-            
-        values.append(shipment_id)
-        values.append(org_id)
-        
+@cached("shipments")
+def list_shipments(org_id: int, status: Optional[str] = None, supplier_id: Optional[int] = None,
+                   date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   limit: Optional[int] = None, after: Optional[Tuple[date, int]] = None) -> List[tuple]:
+    """Filtered page of shipments ordered by (expected_date, id).
+
+    ``status`` takes a comma-separated list; ``Late`` matches the shipments
+    whose ``is_late`` is true (``LATE_SHIPMENT_SQL``). ``after`` is the
+    (expected_date, id) of the previous page's last row.
+    """
+    conditions = ["s.org_id = %s"]
+    values: List[Any] = [org_id]
+
+    if status:
+        statuses = [value.strip() for value in status.split(",") if value.strip()]
+        matches = ["s.status = ANY(%s)"]
+        values.append(statuses)
+        if "Late" in statuses:
+            matches.append(f"COALESCE({LATE_SHIPMENT_SQL}, false)")
+        conditions.append(f"({' OR '.join(matches)})")
+    if supplier_id is not None:
+        conditions.append("s.supplier_id = %s")
+        values.append(supplier_id)
+    if date_from is not None:
+        conditions.append("s.expected_date >= %s")
+        values.append(date_from)
+    if date_to is not None:
+        conditions.append("s.expected_date <= %s")
+        values.append(date_to)
+    if after is not None:
+        conditions.append("(s.expected_date, s.id) > (%s, %s)")
+        values.extend(after)
+
+    query = f"""
+        {SHIPMENT_LIST_SELECT}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY s.expected_date, s.id
+    """
+    if limit is not None:
+        query += " LIMIT %s"
+        values.append(limit)
+
+    with read_cursor(org_id, cursor_factory=NamedTupleCursor) as cursor:
+        cursor.execute(query, tuple(values))
+        return cursor.fetchall()
+
+def encode_page_cursor(row) -> str:
+    return f"{row.expected_date.isoformat()}_{row.id}"
+
+def decode_page_cursor(token: str) -> Tuple[date, int]:
+    try:
+        expected_date, shipment_id = token.split("_")
+        return date.fromisoformat(expected_date), int(shipment_id)
+    except ValueError:
+        raise ValueError("Invalid page cursor")
+
+def get_shipment_changes(org_id: int, since: Optional[datetime]) -> Dict[str, Any]:
+    """Shipments created or updated since the sync cursor (shipments are never deleted)"""
+    start = sync_service.window_start(since)
+    with get_db_cursor(cursor_factory=NamedTupleCursor) as cursor:
         cursor.execute(f"""
-            UPDATE shipments SET {', '.join(updates)}
-            WHERE id = %s AND org_id = %s
-        """, tuple(values))
-        return True
+            {SHIPMENT_LIST_SELECT}
+            WHERE s.org_id = %s AND (%s::timestamptz IS NULL OR s.updated_at >= %s)
+            ORDER BY s.updated_at
+        """, (org_id, start, start))
+        return sync_service.changes(cursor, cursor.fetchall(), {})
 
-def rate_shipment(shipment_id: int, data: ShipmentRate, org_id: int) -> ShipmentResponse:
-    with get_db_cursor() as cursor:
-        # Get expected quantity first
-        cursor.execute("SELECT expected_quantity, supplier_id FROM shipments WHERE id = %s AND org_id = %s", (shipment_id, org_id))
-        ship = cursor.fetchone()
-        if not ship:
-            raise Exception("Shipment not found")
-            
-        expected = ship['expected_quantity']
-        rec = data.received_quantity
-        dmg = data.damaged_quantity
+# Wraps an UPDATE ... RETURNING s.* so the enriched row comes back in the
+# same round trip. The updates below also lock the current row as "old" and
+# return it as ``before`` for the audit log.
+ENRICHED_UPDATE_SQL = """
+    WITH updated AS ({update})
+    SELECT updated.*, sup.name AS supplier_name,
+           EXISTS (SELECT 1 FROM shipment_items si WHERE si.shipment_id = updated.id) AS has_items
+    FROM updated
+    JOIN suppliers sup ON sup.id = updated.supplier_id
+"""
+
+def _shipment_response(row) -> ShipmentResponse:
+    return ShipmentResponse(**{key: value for key, value in row.items() if key not in ('has_items', 'before')})
+
+def update_shipment_status(shipment_id: int, data: ShipmentUpdateStatus, org_id: int,
+                           actor_id: Optional[int] = None) -> Optional[ShipmentResponse]:
+    """Set a shipment's status; None when the org has no such shipment"""
+    updates = ["status = %s", "updated_at = NOW()"]
+    values = [data.status]
+    
+    if data.received_date:
+        updates.append("received_date = %s")
+        values.append(data.received_date)
         
-        # Calculate Score: (Received - Damaged) / Expected * 100
-        # Cap at 0? No, allow negative? No, score implies performance.
-        # If Rec=0, score 0.
-        score = 0.0
-        if expected > 0:
-            good_items = max(0, rec - dmg)
-            score = (good_items / expected) * 100
-            score = min(score, 100.0) # Cap at 100 if they sent extra? Optional.
+    values.append(shipment_id)
+    values.append(org_id)
+    
+    with get_db_cursor() as cursor:
+        cursor.execute(ENRICHED_UPDATE_SQL.format(update=f"""
+            UPDATE shipments s SET {', '.join(updates)}
+            FROM (
+                SELECT id, status, received_date FROM shipments
+                WHERE id = %s AND org_id = %s
+                FOR UPDATE
+            ) old
+            WHERE s.id = old.id
+            RETURNING s.*, to_jsonb(old) AS before
+        """), tuple(values))
+        row = cursor.fetchone()
+        if not row:
+            return None
             
-        recv_date = data.received_date if data.received_date else date.today()
-        
-        cursor.execute("""
-            UPDATE shipments 
-            SET received_quantity = %s, damaged_quantity = %s, score = %s, 
-                received_date = %s, status = 'Arrived', updated_at = NOW()
-            WHERE id = %s AND org_id = %s
-            RETURNING *
-        """, (rec, dmg, score, recv_date, shipment_id, org_id))
+        invalidate_org(org_id, "shipments", cursor=cursor)
+        change = {
+            "status": row['status'],
+            "received_date": row['received_date'].isoformat() if row['received_date'] else None
+        }
+        emit(cursor, org_id, "shipments", "status", {"id": row['id'], **change})
+        audit.record(cursor, org_id, actor_id, "update", "shipments", row['id'], before=row['before'], after=change)
+        return _shipment_response(row)
+
+def receive_shipment_items(cursor, shipment_id: int, org_id: int, items: Optional[List[ShipmentItemReceive]],
+                           received_total: Optional[int], damaged_total: Optional[int]):
+    """Record per-line receipts and add the good units to stock in one statement.
+
+    Without ``items`` the lines count as received in full, which is only
+    accepted when the totals say nothing was missing or damaged. Returns the
+    updated stock rows, or None for a shipment without line items.
+    """
+    cursor.execute("""
+        SELECT stock_item_id, expected_quantity, received_quantity
+        FROM shipment_items WHERE shipment_id = %s
+        FOR UPDATE
+    """, (shipment_id,))
+    lines = cursor.fetchall()
+    if not lines:
+        if items:
+            raise Exception("Shipment has no line items")
+        return None
+    if any(line['received_quantity'] is not None for line in lines):
+        raise Exception("Shipment items already received")
+
+    if items is None:
+        expected_total = sum(line['expected_quantity'] for line in lines)
+        if received_total not in (None, expected_total) or damaged_total:
+            raise Exception("Per-item quantities required for a partial or damaged delivery")
+        ids = [line['stock_item_id'] for line in lines]
+        received = [line['expected_quantity'] for line in lines]
+        damaged = [0] * len(lines)
+    else:
+        ids = [item.stock_item_id for item in items]
+        received = [item.received_quantity for item in items]
+        damaged = [item.damaged_quantity for item in items]
+        if len(set(ids)) != len(ids) or not set(ids) <= {line['stock_item_id'] for line in lines}:
+            raise Exception("Items must match the shipment's line items")
+
+    cursor.execute("""
+        WITH receipt AS (
+            SELECT * FROM unnest(%s::int[], %s::int[], %s::int[]) AS r(stock_item_id, received, damaged)
+        ),
+        lines AS (
+            UPDATE shipment_items si
+            SET received_quantity = receipt.received, damaged_quantity = receipt.damaged
+            FROM receipt
+            WHERE si.shipment_id = %s AND si.stock_item_id = receipt.stock_item_id
+        )
+        UPDATE stock_items i
+        SET quantity = i.quantity + GREATEST(receipt.received - receipt.damaged, 0), updated_at = NOW()
+        FROM receipt
+        WHERE i.id = receipt.stock_item_id AND i.org_id = %s
+        RETURNING i.id, i.quantity, i.min_threshold, i.max_capacity
+    """, (ids, received, damaged, shipment_id, org_id))
+    return cursor.fetchall()
+
+def rate_shipment(shipment_id: int, data: ShipmentRate, org_id: int,
+                  actor_id: Optional[int] = None) -> Optional[ShipmentResponse]:
+    """Record a delivery and its score; None when the org has no such shipment.
+
+    The shipment update, score and supplier name take one statement; stock is
+    only touched (one more statement) for shipments with line items.
+    """
+    rec, dmg = data.received_quantity, data.damaged_quantity
+    if data.items:
+        rec = sum(item.received_quantity for item in data.items)
+        dmg = sum(item.damaged_quantity for item in data.items)
+    recv_date = data.received_date if data.received_date else date.today()
+
+    with get_db_cursor() as cursor:
+        # Score: (Received - Damaged) / Expected * 100, between 0 and 100.
+        # Missing totals mean a complete delivery (only valid with line items).
+        cursor.execute(ENRICHED_UPDATE_SQL.format(update="""
+            UPDATE shipments s
+            SET received_quantity = COALESCE(%(rec)s, s.expected_quantity),
+                damaged_quantity = COALESCE(%(dmg)s, 0),
+                score = CASE WHEN s.expected_quantity > 0
+                             THEN LEAST(GREATEST(COALESCE(%(rec)s, s.expected_quantity) - COALESCE(%(dmg)s, 0), 0)
+                                        * 100.0 / s.expected_quantity, 100)
+                             ELSE 0 END,
+                received_date = %(recv_date)s, status = 'Arrived', updated_at = NOW()
+            FROM (
+                SELECT id, status, received_quantity, damaged_quantity, score::float8 AS score, received_date
+                FROM shipments
+                WHERE id = %(id)s AND org_id = %(org_id)s
+                FOR UPDATE
+            ) old
+            WHERE s.id = old.id
+            RETURNING s.*, to_jsonb(old) AS before
+        """), {"rec": rec, "dmg": dmg, "recv_date": recv_date, "id": shipment_id, "org_id": org_id})
         
         row = cursor.fetchone()
         if not row:
-            raise Exception("Failed to update shipment")
+            return None
+
+        stock_rows = None
+        if row['has_items']:
+            stock_rows = receive_shipment_items(cursor, shipment_id, org_id, data.items, data.received_quantity, data.damaged_quantity)
+        elif data.items:
+            raise Exception("Shipment has no line items")
+        elif data.received_quantity is None:
+            raise Exception("received_quantity required")
             
-        # Get supplier name
-        cursor.execute("SELECT name FROM suppliers WHERE id = %s", (ship['supplier_id'],))
-        sup = cursor.fetchone()
+        invalidate_org(org_id, "shipments", *(("stock",) if stock_rows else ()), cursor=cursor)
+        if stock_rows:
+            for stock_row in stock_rows:
+                emit(cursor, org_id, "stock", "quantity", {
+                    "id": stock_row['id'],
+                    "quantity": stock_row['quantity'],
+                    "status": get_stock_status(stock_row['quantity'], stock_row['min_threshold'], stock_row['max_capacity'])
+                })
         
-        return ShipmentResponse(**row, supplier_name=sup['name'] if sup else "Unknown")
+        shipment = _shipment_response(row)
+        emit(cursor, org_id, "shipments", "updated", shipment)
+        audit.record(cursor, org_id, actor_id, "rate", "shipments", shipment.id, before=row['before'], after={
+            "status": shipment.status,
+            "received_quantity": shipment.received_quantity,
+            "damaged_quantity": shipment.damaged_quantity,
+            "score": shipment.score,
+            "received_date": shipment.received_date.isoformat() if shipment.received_date else None
+        })
+        return shipment
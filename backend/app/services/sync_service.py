@@ -0,0 +1,102 @@
+"""
+Helpers for the ``?since=<cursor>`` delta sync on list endpoints.
+
+A cursor is the database time at which the previous sync ran. Timestamps
+such as ``updated_at = NOW()`` are taken when a transaction starts, not when
+it commits, so every sync re-reads a short overlap window before the cursor.
+Clients upsert items by id, so rows seen twice are harmless.
+
+Deleted rows leave a tombstone in ``deleted_records``. Tombstones are pruned
+after ``SYNC_TOMBSTONE_RETENTION_DAYS``; older cursors get a "cursor expired"
+error and the client starts over with an empty ``since``.
+"""
+import base64
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.database import get_db_cursor
+from app.core.jobs import job_handler, periodic_job
+
+
+class SyncCursorExpired(Exception):
+    pass
+
+
+def encode_cursor(timestamp: datetime) -> str:
+    return base64.urlsafe_b64encode(timestamp.isoformat().encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Optional[datetime]:
+    """Timestamp in ``token``, or None for an empty token (full sync).
+
+    Raises ValueError for a malformed token and SyncCursorExpired when its
+    tombstones may already be pruned.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp = datetime.fromisoformat(base64.urlsafe_b64decode(padded).decode("ascii"))
+    except Exception:
+        raise ValueError("Invalid sync cursor")
+    if timestamp.tzinfo is None:
+        raise ValueError("Invalid sync cursor")
+
+    if timestamp < datetime.now(timestamp.tzinfo) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        raise SyncCursorExpired("Sync cursor expired, sync again without 'since'")
+    return timestamp
+
+
+def window_start(since: Optional[datetime]) -> Optional[datetime]:
+    """Lower bound for ``updated_at`` style columns, including the overlap"""
+    if since is None:
+        return None
+    return since - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+
+
+def record_deletion(cursor, org_id: int, resource: str, record_id: int):
+    """Leave a tombstone in the deleting transaction"""
+    cursor.execute("""
+        INSERT INTO deleted_records (org_id, resource, record_id)
+        VALUES (%s, %s, %s)
+    """, (org_id, resource, record_id))
+
+
+def get_deleted_ids(cursor, org_id: int, resources: Iterable[str], start: Optional[datetime]) -> Dict[str, List[int]]:
+    resources = list(resources)
+    deleted = {resource: [] for resource in resources}
+    if start is None:
+        # A full sync only contains rows that still exist
+        return deleted
+
+    cursor.execute("""
+        SELECT resource, array_agg(DISTINCT record_id) AS ids
+        FROM deleted_records
+        WHERE org_id = %s AND resource = ANY(%s) AND deleted_at >= %s
+        GROUP BY resource
+    """, (org_id, resources, start))
+    for row in cursor.fetchall():
+        deleted[row[0]] = row[1]
+    return deleted
+
+
+def changes(cursor, items: List[Any], deleted: Dict[str, List[int]]) -> Dict[str, Any]:
+    """Sync envelope; the new cursor is the time this transaction started"""
+    cursor.execute("SELECT now()")
+    return {"items": items, "deleted": deleted, "cursor": encode_cursor(cursor.fetchone()[0])}
+
+
+def prune_deleted_records(retention_days: Optional[int] = None) -> int:
+    days = retention_days if retention_days is not None else settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    with get_db_cursor() as cursor:
+        cursor.execute("DELETE FROM deleted_records WHERE deleted_at < now() - make_interval(days => %s)", (days,))
+        return cursor.rowcount
+
+
+@job_handler("sync.prune_tombstones")
+def prune_tombstones_job(payload: dict):
+    prune_deleted_records()
+
+
+periodic_job("sync.prune_tombstones", 24 * 3600)
@@ -0,0 +1,29 @@
+from app.core.replica import read_cursor
+from app.core import prepared
+
+# Per-org "data versions" backing the ETags of list endpoints. Every write
+# calls invalidate_org(..., cursor=), which bumps the org's counter of each
+# namespace it touches in the same transaction (cache.bump_versions). Unlike
+# max(updated_at) or max(id), a counter also moves for a transaction that
+# started earlier but commits later, and for rows that go away (deletes,
+# archived partitions). Each listing lists the namespaces whose writes can
+# change it; stock renames and user deletions invalidate "sales" and
+# "losses" themselves, so joined names are covered.
+VERSION_NAMESPACES = {
+    "stock": ("stock",),
+    "sales": ("sales",),
+    "losses": ("losses",),
+    "shipments": ("shipments", "suppliers"),
+}
+
+
+def get_data_version(resource: str, org_id: int) -> str:
+    """Return a string that changes whenever the org's ``resource`` listing would"""
+    namespaces = VERSION_NAMESPACES[resource]
+    with read_cursor(org_id) as cursor:
+        prepared.execute(cursor, """
+            SELECT namespace, version FROM data_versions
+            WHERE org_id = %s AND namespace = ANY(%s)
+        """, (org_id, list(namespaces)))
+        versions = {row['namespace']: row['version'] for row in cursor.fetchall()}
+        return ".".join(str(versions.get(namespace, 0)) for namespace in namespaces)
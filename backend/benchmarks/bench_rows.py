@@ -0,0 +1,81 @@
+"""
+Memory and time of row representations for large result sets.
+
+Fetches ``--rows`` synthetic rows shaped like the sales history query with
+RealDictCursor and with NamedTupleCursor, and reports the traced allocation
+peak of fetching plus serializing each, along with User instance sizes.
+Only a database connection is needed (no schema or seed data).
+
+    python -m benchmarks.bench_rows --rows 100000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, NamedTupleCursor
+
+from benchmarks.pg_fixture import database_fixture, prepare_environment
+
+SALES_LIKE_QUERY = """
+    SELECT g AS id, 1 AS org_id, g %% 500 AS stock_item_id, 7 AS sold_by,
+           1 + g %% 5 AS quantity, (g %% 1000)::float8 AS total_price,
+           NOW() - g * INTERVAL '1 minute' AS sale_date,
+           'Item ' || (g %% 500) AS stock_item_name, 'Bench User' AS sold_by_name
+    FROM generate_series(1, %s) g
+"""
+
+
+def measure(conn, cursor_factory, rows: int):
+    from app.core.responses import dumps
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with conn.cursor(cursor_factory=cursor_factory) as cursor:
+        cursor.execute(SALES_LIKE_QUERY, (rows,))
+        result = cursor.fetchall()
+    fetched = time.perf_counter()
+    _, fetch_peak = tracemalloc.get_traced_memory()
+    body = dumps(result)
+    finished = time.perf_counter()
+    _, total_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result, body
+    return fetched - started, finished - started, fetch_peak, total_peak
+
+
+def user_sizes():
+    from app.models.user import User
+
+    user = User(id=1, org_id=1, email="a@b.c", username="a", created_at=datetime.utcnow())
+    # The pre-slots model kept the same attributes in a per-instance dict
+    dict_size = sys.getsizeof(object()) + sys.getsizeof({slot: None for slot in User.__slots__})
+    return sys.getsizeof(user), dict_size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Row representation benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--database-url", help="Use this database instead of a throwaway cluster")
+    args = parser.parse_args(argv)
+
+    with database_fixture(args.database_url) as dsn:
+        prepare_environment(dsn)
+        conn = psycopg2.connect(dsn)
+        try:
+            print(f"{'cursor':<18} {'fetch ms':>10} {'total ms':>10} {'fetch peak MB':>14} {'total peak MB':>14}")
+            for label, factory in (("RealDictCursor", RealDictCursor), ("NamedTupleCursor", NamedTupleCursor)):
+                fetch_s, total_s, fetch_peak, total_peak = measure(conn, factory, args.rows)
+                print(f"{label:<18} {fetch_s * 1000:>10.1f} {total_s * 1000:>10.1f} "
+                      f"{fetch_peak / 2**20:>14.1f} {total_peak / 2**20:>14.1f}")
+        finally:
+            conn.close()
+
+    slots_size, dict_size = user_sizes()
+    print(f"User instance: {slots_size} bytes with __slots__, ~{dict_size} bytes with __dict__")
+
+
+if __name__ == "__main__":
+    main()
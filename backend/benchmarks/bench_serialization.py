@@ -0,0 +1,91 @@
+"""
+Per-row cost of serializing list responses.
+
+Compares the old list path (a Pydantic model per row, re-validated by
+FastAPI against ``response_model`` and JSON-encoded) with the direct
+``FastJSONResponse`` path on synthetic rows shaped like the cursor output.
+No database is needed.
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from pydantic import TypeAdapter
+
+from app.core.responses import FastJSONResponse
+from app.schemas.stock import StockItemResponse
+from app.schemas.sales import SaleResponse
+
+
+def stock_rows(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": i, "org_id": 1, "name": f"Item {i}", "category": f"Category {i % 12}",
+            "quantity": random.randint(0, 1000), "min_threshold": 10, "max_capacity": 1000,
+            "price": round(random.uniform(5, 100), 2), "cost_price": round(random.uniform(1, 5), 2),
+            "status": "medium", "created_at": now - timedelta(minutes=i), "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+def sale_rows(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": i, "org_id": 1, "stock_item_id": i % 500, "stock_item_name": f"Item {i % 500}",
+            "sold_by": 7, "sold_by_name": "Bench User", "quantity": 1 + i % 5,
+            "total_price": round(random.uniform(5, 500), 2), "sale_date": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def model_path(schema, rows: List[dict]) -> Callable[[], bytes]:
+    """Old path: model per row in the service, then response_model validation"""
+    adapter = TypeAdapter(List[schema])
+
+    def run():
+        objects = [schema(**row) for row in rows]
+        validated = adapter.validate_python(objects, from_attributes=True)
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode("utf-8")
+    return run
+
+
+def direct_path(rows: List[dict]) -> Callable[[], bytes]:
+    return lambda: FastJSONResponse(rows).body
+
+
+def measure(fn: Callable[[], bytes], rounds: int) -> float:
+    fn()
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List response serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'payload':<8} {'path':<8} {'total ms':>10} {'us/row':>8} {'speedup':>8}")
+    for label, schema, rows in (("stock", StockItemResponse, stock_rows(args.rows)),
+                                ("sales", SaleResponse, sale_rows(args.rows))):
+        before = measure(model_path(schema, rows), args.rounds)
+        after = measure(direct_path(rows), args.rounds)
+        print(f"{label:<8} {'model':<8} {before * 1000:>10.2f} {before / args.rows * 1e6:>8.2f}")
+        print(f"{label:<8} {'direct':<8} {after * 1000:>10.2f} {after / args.rows * 1e6:>8.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
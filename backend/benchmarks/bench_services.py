@@ -0,0 +1,381 @@
+"""
+Micro-benchmarks for the service layer (``app/services``).
+
+Each benchmark calls one service function directly against a seeded
+dataset, pytest-benchmark style: warmup rounds, then timed rounds reported
+as min/mean/median/p95. Results can be saved as JSON and compared against a
+previous run to catch query-plan or response-building regressions.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_services run --dataset 100k --output results/services-100k.json
+    python -m benchmarks.bench_services compare results/baseline.json results/services-100k.json
+
+Set ``PREPARED_STATEMENTS_ENABLED=false`` in the environment to measure the
+hot queries without server-side prepared statements.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+import logging
+
+from benchmarks.pg_fixture import database_fixture, prepare_environment, init_schema
+from benchmarks.seed import SeedConfig, SeedResult, seed
+from benchmarks.stats import percentile, write_json
+
+logger = logging.getLogger(__name__)
+
+# Row counts refer to the sales table; the other tables scale with it
+DATASETS: Dict[str, SeedConfig] = {
+    "1k": SeedConfig(orgs=1, employees_per_org=10, items_per_org=1000, sales_per_org=1000,
+                     losses_per_org=100, suppliers_per_org=10, shipments_per_org=100),
+    "100k": SeedConfig(orgs=1, employees_per_org=100, items_per_org=10000, sales_per_org=100000,
+                       losses_per_org=10000, suppliers_per_org=50, shipments_per_org=10000),
+    "1m": SeedConfig(orgs=1, employees_per_org=1000, items_per_org=10000, sales_per_org=1000000,
+                     losses_per_org=100000, suppliers_per_org=100, shipments_per_org=100000),
+}
+
+
+@dataclass
+class BenchContext:
+    """What benchmarks need to know about the seeded dataset"""
+    org_id: int
+    owner_id: int
+    owner_username: str
+    owner_email: str
+    password: str
+    item_ids: List[int] = field(default_factory=list)
+    shipment_ids: List[int] = field(default_factory=list)
+    supplier_ids: List[int] = field(default_factory=list)
+    counter: int = 0
+
+    def next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+BENCHMARKS: Dict[str, Callable[[BenchContext], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark. The decorated function receives the context and
+    returns the zero-argument callable that gets timed."""
+    def decorator(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+def uncached(fn):
+    """The query behind a ``@cached`` read, so rounds don't just hit the cache"""
+    return getattr(fn, "uncached", fn)
+
+
+# --- Read paths ---
+
+@benchmark("stock.get_stock_items")
+def bench_get_stock_items(ctx: BenchContext):
+    from app.services import stock_service
+    return lambda: uncached(stock_service.get_stock_items)(ctx.org_id)
+
+
+@benchmark("sales.get_sales_history")
+def bench_get_sales_history(ctx: BenchContext):
+    from app.services import sales_service
+    return lambda: uncached(sales_service.get_sales_history)(ctx.org_id)
+
+
+@benchmark("analytics.get_analytics_summary")
+def bench_get_analytics_summary(ctx: BenchContext):
+    from app.services import analytics_service
+    return lambda: uncached(analytics_service.get_analytics_summary)(ctx.org_id)
+
+
+@benchmark("analytics.get_loss_history")
+def bench_get_loss_history(ctx: BenchContext):
+    from app.services import analytics_service
+    return lambda: uncached(analytics_service.get_loss_history)(ctx.org_id)
+
+
+@benchmark("sales.get_sales_history_30d")
+def bench_get_sales_history_30d(ctx: BenchContext):
+    from app.services import sales_service
+    date_from = date.today() - timedelta(days=30)
+    return lambda: uncached(sales_service.get_sales_history)(ctx.org_id, date_from, None)
+
+
+@benchmark("analytics.get_analytics_summary_30d")
+def bench_get_analytics_summary_30d(ctx: BenchContext):
+    from app.services import analytics_service
+    date_from = date.today() - timedelta(days=30)
+    return lambda: uncached(analytics_service.get_analytics_summary)(ctx.org_id, date_from, None)
+
+
+@benchmark("supplier.get_suppliers")
+def bench_get_suppliers(ctx: BenchContext):
+    from app.services import supplier_service
+    return lambda: uncached(supplier_service.get_suppliers)(ctx.org_id)
+
+
+@benchmark("supplier.get_shipments")
+def bench_get_shipments(ctx: BenchContext):
+    from app.services import supplier_service
+    return lambda: uncached(supplier_service.get_shipments)(ctx.org_id)
+
+
+@benchmark("cache.get_stock_items_hit")
+def bench_get_stock_items_cached(ctx: BenchContext):
+    from app.services import stock_service
+    return lambda: stock_service.get_stock_items(ctx.org_id)
+
+
+@benchmark("auth.authenticate_user")
+def bench_authenticate_user(ctx: BenchContext):
+    from app.services import auth_service
+    return lambda: auth_service.authenticate_user(ctx.owner_username, ctx.password)
+
+
+@benchmark("auth.get_user_by_id")
+def bench_get_user_by_id(ctx: BenchContext):
+    from app.services import auth_service
+    return lambda: auth_service.get_user_by_id(ctx.owner_id)
+
+
+@benchmark("auth.get_user_by_email")
+def bench_get_user_by_email(ctx: BenchContext):
+    from app.services import auth_service
+    return lambda: auth_service.get_user_by_email(ctx.owner_email)
+
+
+# --- Write paths ---
+
+@benchmark("sales.create_sale")
+def bench_create_sale(ctx: BenchContext):
+    from app.services import sales_service
+    from app.schemas.sales import SaleCreate
+
+    def run():
+        item_id = ctx.item_ids[ctx.next() % len(ctx.item_ids)]
+        return sales_service.create_sale(SaleCreate(stock_item_id=item_id, quantity=1), ctx.owner_id, ctx.org_id)
+    return run
+
+
+@benchmark("analytics.report_loss")
+def bench_report_loss(ctx: BenchContext):
+    from app.services import analytics_service
+    from app.schemas.loss import LossCreate
+
+    def run():
+        item_id = ctx.item_ids[ctx.next() % len(ctx.item_ids)]
+        loss = LossCreate(stock_item_id=item_id, quantity=1, reason="Damaged")
+        return analytics_service.report_loss(loss, ctx.owner_id, ctx.org_id)
+    return run
+
+
+@benchmark("stock.update_stock_item")
+def bench_update_stock_item(ctx: BenchContext):
+    from app.services import stock_service
+    from app.schemas.stock import StockItemUpdate
+
+    def run():
+        item_id = ctx.item_ids[ctx.next() % len(ctx.item_ids)]
+        return stock_service.update_stock_item(item_id, StockItemUpdate(min_threshold=10 + ctx.counter % 5), ctx.org_id)
+    return run
+
+
+@benchmark("stock.create_and_delete_stock_item")
+def bench_create_delete_stock_item(ctx: BenchContext):
+    from app.services import stock_service
+    from app.schemas.stock import StockItemCreate
+
+    def run():
+        item = stock_service.create_stock_item(
+            StockItemCreate(name=f"Bench item {ctx.next()}", category="Bench"), ctx.org_id
+        )
+        stock_service.delete_stock_item(item.id, ctx.org_id)
+    return run
+
+
+@benchmark("supplier.rate_shipment")
+def bench_rate_shipment(ctx: BenchContext):
+    from app.services import supplier_service
+    from app.schemas.supplier import ShipmentRate
+
+    def run():
+        shipment_id = ctx.shipment_ids[ctx.next() % len(ctx.shipment_ids)]
+        rating = ShipmentRate(received_quantity=10, damaged_quantity=ctx.counter % 3)
+        return supplier_service.rate_shipment(shipment_id, rating, ctx.org_id)
+    return run
+
+
+@benchmark("supplier.update_shipment_status")
+def bench_update_shipment_status(ctx: BenchContext):
+    from app.services import supplier_service
+    from app.schemas.supplier import ShipmentUpdateStatus
+
+    def run():
+        shipment_id = ctx.shipment_ids[ctx.next() % len(ctx.shipment_ids)]
+        return supplier_service.update_shipment_status(shipment_id, ShipmentUpdateStatus(status="Pending"), ctx.org_id)
+    return run
+
+
+def load_context(seeded: SeedResult) -> BenchContext:
+    from app.core.database import get_db_cursor
+
+    org_id = seeded.org_ids[0]
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT id, email, username FROM users WHERE username = %s", (seeded.owner_usernames[0],))
+        owner = cursor.fetchone()
+        cursor.execute("SELECT id FROM stock_items WHERE org_id = %s ORDER BY id LIMIT 1000", (org_id,))
+        item_ids = [row['id'] for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM shipments WHERE org_id = %s ORDER BY id LIMIT 1000", (org_id,))
+        shipment_ids = [row['id'] for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM suppliers WHERE org_id = %s ORDER BY id", (org_id,))
+        supplier_ids = [row['id'] for row in cursor.fetchall()]
+
+    return BenchContext(
+        org_id=org_id,
+        owner_id=owner['id'],
+        owner_username=owner['username'],
+        owner_email=owner['email'],
+        password=seeded.password,
+        item_ids=item_ids,
+        shipment_ids=shipment_ids,
+        supplier_ids=supplier_ids,
+    )
+
+
+def time_callable(name: str, dataset: str, fn: Callable[[], object], rounds: int, warmup: int,
+                  max_time: Optional[float] = None) -> Dict:
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    deadline = time.perf_counter() + max_time if max_time else None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        if deadline and time.perf_counter() > deadline:
+            break
+
+    values = sorted(timings)
+    return {
+        "name": name,
+        "dataset": dataset,
+        "rounds": len(values),
+        "min_ms": round(values[0] * 1000, 4),
+        "mean_ms": round(statistics.fmean(values) * 1000, 4),
+        "median_ms": round(statistics.median(values) * 1000, 4),
+        "p95_ms": round(percentile(values, 95) * 1000, 4),
+        "stddev_ms": round(statistics.pstdev(values) * 1000, 4),
+    }
+
+
+def run(args):
+    selected = [name for name in BENCHMARKS if not args.filter or any(f in name for f in args.filter)]
+    if not selected:
+        raise SystemExit("No benchmarks match the given filter")
+    config = DATASETS[args.dataset]
+
+    with database_fixture(args.database_url) as dsn:
+        prepare_environment(dsn)
+        init_schema()
+        seeded = seed(dsn, config)
+        ctx = load_context(seeded)
+
+        results = []
+        for name in selected:
+            logger.info(f"Benchmarking {name} on {args.dataset}...")
+            fn = BENCHMARKS[name](ctx)
+            results.append(time_callable(name, args.dataset, fn, args.rounds, args.warmup, args.max_time))
+
+        # Compare runs with PREPARED_STATEMENTS_ENABLED=false to see what preparing saves
+        from app.core import prepared
+        logger.info(f"Prepared statements: {prepared.stats()}")
+
+        from app.core.database import close_db_pool
+        close_db_pool()
+
+    print_results(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        write_json(args.output, results, {"dataset": args.dataset, "rounds": args.rounds, "warmup": args.warmup})
+        logger.info(f"Results written to {args.output}")
+
+
+def print_results(results: List[Dict]):
+    header = f"{'benchmark':<40} {'dataset':<8} {'rounds':>6} {'min':>10} {'median':>10} {'mean':>10} {'p95':>10}"
+    print(header)
+    for row in results:
+        print(f"{row['name']:<40} {row['dataset']:<8} {row['rounds']:>6} {row['min_ms']:>10.3f} "
+              f"{row['median_ms']:>10.3f} {row['mean_ms']:>10.3f} {row['p95_ms']:>10.3f}")
+
+
+def compare(args) -> int:
+    """Compare median timings; returns 1 if anything regressed past the threshold"""
+    with open(args.baseline) as f:
+        baseline = {(r["name"], r["dataset"]): r for r in json.load(f)["results"]}
+    with open(args.current) as f:
+        current = {(r["name"], r["dataset"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'benchmark':<40} {'dataset':<8} {'baseline':>10} {'current':>10} {'change':>9}")
+    for key in sorted(set(baseline) & set(current)):
+        before = baseline[key]["median_ms"]
+        after = current[key]["median_ms"]
+        change = ((after - before) / before * 100) if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:<40} {key[1]:<8} {before:>10.3f} {after:>10.3f} {change:>+8.1f}%{flag}")
+
+    for key in sorted(set(baseline) - set(current)):
+        print(f"{key[0]:<40} {key[1]:<8} missing from current run")
+
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bizit service-layer micro-benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Seed a dataset and run benchmarks")
+    run_parser.add_argument("--dataset", choices=sorted(DATASETS), default="1k")
+    run_parser.add_argument("--database-url", help="Seed and use this database instead of a throwaway cluster")
+    run_parser.add_argument("--filter", action="append", help="Only run benchmarks whose name contains this (repeatable)")
+    run_parser.add_argument("--rounds", type=int, default=50)
+    run_parser.add_argument("--warmup", type=int, default=3)
+    run_parser.add_argument("--max-time", type=float, default=30.0, help="Stop a benchmark after this many seconds")
+    run_parser.add_argument("--output", help="Write JSON results to this path")
+
+    compare_parser = sub.add_parser("compare", help="Compare two JSON result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+
+    sub.add_parser("list", help="List available benchmarks")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        sys.exit(compare(args))
+    elif args.command == "list":
+        for name in BENCHMARKS:
+            print(name)
+
+
+if __name__ == "__main__":
+    main()
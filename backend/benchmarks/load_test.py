@@ -0,0 +1,264 @@
+"""
+End-to-end load test for the Bizit API.
+
+Starts (or reuses) a PostgreSQL database, creates the schema, seeds synthetic
+data, runs the real ``app.main:app`` under uvicorn and drives it through a set
+of scenarios, reporting p50/p95/p99 latency and throughput per scenario.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --orgs 20 --concurrency 16 --requests 2000 \\
+        --output results/baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+import logging
+
+from benchmarks.pg_fixture import database_fixture, prepare_environment, init_schema, free_port
+from benchmarks.seed import SeedConfig, SeedResult, seed
+from benchmarks.stats import summarize, print_table, write_json
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ["login", "checkout", "stock", "analytics", "rating"]
+
+# (method, path, body, headers)
+Request = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+class ApiClient:
+    """Keep-alive HTTP client, one connection per worker thread"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def send(self, request: Request) -> Tuple[int, bytes]:
+        method, path, body, headers = request
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, ConnectionError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+def login_request(username: str, password: str) -> Request:
+    body = urlencode({"username": username, "password": password}).encode()
+    return "POST", "/api/auth/login", body, {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def fetch_tokens(client: ApiClient, seeded: SeedResult) -> Dict[int, str]:
+    """Log every seeded owner in once and map org id -> bearer token"""
+    tokens = {}
+    for org_id, username in zip(seeded.org_ids, seeded.owner_usernames):
+        status, body = client.send(login_request(username, seeded.password))
+        if status != 200:
+            raise RuntimeError(f"Login failed for {username}: {status} {body[:200]!r}")
+        tokens[org_id] = json.loads(body)["access_token"]
+    return tokens
+
+
+def fetch_item_ids(client: ApiClient, tokens: Dict[int, str]) -> Dict[int, List[int]]:
+    items = {}
+    for org_id, token in tokens.items():
+        status, body = client.send(("GET", f"/api/stock/?org_id={org_id}", None, auth_headers(token)))
+        if status != 200:
+            raise RuntimeError(f"Stock listing failed for org {org_id}: {status}")
+        items[org_id] = [item["id"] for item in json.loads(body)]
+    return items
+
+
+def fetch_shipment_ids(client: ApiClient, tokens: Dict[int, str]) -> Dict[int, List[int]]:
+    shipments = {}
+    for org_id, token in tokens.items():
+        status, body = client.send(("GET", f"/api/shipments?org_id={org_id}&limit=500", None, auth_headers(token)))
+        if status != 200:
+            raise RuntimeError(f"Shipment listing failed for org {org_id}: {status}")
+        shipments[org_id] = [shipment["id"] for shipment in json.loads(body)]
+    return shipments
+
+
+def auth_headers(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def build_scenarios(seeded: SeedResult, tokens: Dict[int, str], items: Dict[int, List[int]],
+                    shipments: Dict[int, List[int]]) -> Dict[str, Callable[[], Request]]:
+    """Each scenario is a factory returning the next request to send"""
+    org_ids = list(tokens.keys())
+    usernames = seeded.owner_usernames + seeded.employee_usernames
+
+    def login() -> Request:
+        return login_request(random.choice(usernames), seeded.password)
+
+    def checkout() -> Request:
+        org_id = random.choice(org_ids)
+        body = json.dumps({"stock_item_id": random.choice(items[org_id]), "quantity": 1}).encode()
+        headers = {**auth_headers(tokens[org_id]), "Content-Type": "application/json"}
+        return "POST", f"/api/sales/?org_id={org_id}", body, headers
+
+    def stock() -> Request:
+        org_id = random.choice(org_ids)
+        return "GET", f"/api/stock/?org_id={org_id}", None, auth_headers(tokens[org_id])
+
+    def analytics() -> Request:
+        org_id = random.choice(org_ids)
+        return "GET", f"/api/analytics/summary?org_id={org_id}", None, auth_headers(tokens[org_id])
+
+    def rating() -> Request:
+        # Re-rating the same shipments is fine: each one is a full update
+        org_id = random.choice(org_ids)
+        received = random.randint(5, 20)
+        body = json.dumps({"received_quantity": received, "damaged_quantity": random.randint(0, 2)}).encode()
+        headers = {**auth_headers(tokens[org_id]), "Content-Type": "application/json"}
+        return "POST", f"/api/shipments/{random.choice(shipments[org_id])}/rate?org_id={org_id}", body, headers
+
+    return {"login": login, "checkout": checkout, "stock": stock, "analytics": analytics, "rating": rating}
+
+
+def run_scenario(client: ApiClient, name: str, next_request: Callable[[], Request],
+                 concurrency: int, total_requests: int) -> Dict:
+    """Fire ``total_requests`` requests from ``concurrency`` threads"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = iter(range(total_requests))
+
+    def worker():
+        nonlocal errors
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            request = next_request()
+            started = time.perf_counter()
+            try:
+                status, _ = client.send(request)
+                ok = status < 400
+            except Exception:
+                ok = False
+            local_latencies.append(time.perf_counter() - started)
+            if not ok:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    return summarize(name, latencies, errors, elapsed)
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(command, env=os.environ.copy())
+
+
+def wait_for_server(client: ApiClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _ = client.send(("GET", "/health", None, {}))
+            if status == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API server did not become healthy in time")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bizit API load test")
+    parser.add_argument("--database-url", help="Seed and use this database instead of a throwaway cluster")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for request selection")
+    parser.add_argument("--output", help="Write JSON results to this path")
+    defaults = SeedConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=value)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    random.seed(args.seed)
+    scenario_names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenario_names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    seed_config = SeedConfig(**{name: getattr(args, name) for name in asdict(SeedConfig())})
+
+    with database_fixture(args.database_url) as dsn:
+        prepare_environment(dsn)
+        init_schema()
+        seeded = seed(dsn, seed_config)
+
+        port = free_port()
+        server = start_server(port, args.workers)
+        client = ApiClient("127.0.0.1", port)
+        try:
+            wait_for_server(client)
+            tokens = fetch_tokens(client, seeded)
+            items = fetch_item_ids(client, tokens)
+            shipments = fetch_shipment_ids(client, tokens)
+            scenarios = build_scenarios(seeded, tokens, items, shipments)
+
+            results = []
+            for name in scenario_names:
+                if args.warmup:
+                    run_scenario(client, name, scenarios[name], args.concurrency, args.warmup)
+                logger.info(f"Running scenario '{name}'...")
+                results.append(run_scenario(client, name, scenarios[name], args.concurrency, args.requests))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_table(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        config = {key: value for key, value in vars(args).items() if key != "database_url"}
+        write_json(args.output, results, config)
+        logger.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Local PostgreSQL fixture for benchmarks.
+
+Either reuses an existing database (``--database-url`` / ``BENCH_DATABASE_URL``)
+or creates a throwaway cluster with ``initdb`` in a temporary directory that is
+removed again on exit. ``initdb`` refuses to run as root, so run the throwaway
+mode as a regular user.
+"""
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Optional
+import logging
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+BENCH_DB_NAME = "bizit_bench"
+
+
+def find_pg_bin(name: str) -> str:
+    """Locate a PostgreSQL server binary (initdb, pg_ctl)"""
+    pg_bin = os.environ.get("PG_BIN")
+    if pg_bin and os.path.exists(os.path.join(pg_bin, name)):
+        return os.path.join(pg_bin, name)
+
+    found = shutil.which(name)
+    if found:
+        return found
+
+    # Debian/Ubuntu packages keep server binaries out of PATH
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"), reverse=True)
+    if candidates:
+        return candidates[0]
+
+    raise RuntimeError(f"Could not find '{name}'. Set PG_BIN to your PostgreSQL bin directory.")
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalPostgres:
+    """Throwaway PostgreSQL cluster tuned for benchmarking, not durability"""
+
+    def __init__(self, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.data_dir: Optional[str] = None
+
+    @property
+    def dsn(self) -> str:
+        return f"postgresql://postgres@127.0.0.1:{self.port}/{BENCH_DB_NAME}"
+
+    def start(self):
+        self.data_dir = tempfile.mkdtemp(prefix="bizit-bench-pg-")
+        subprocess.run(
+            [find_pg_bin("initdb"), "-D", self.data_dir, "-U", "postgres", "-A", "trust", "--no-sync"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+
+        server_options = " ".join([
+            f"-p {self.port}",
+            "-h 127.0.0.1",
+            f"-k {self.data_dir}",
+            "-c fsync=off",
+            "-c synchronous_commit=off",
+            "-c full_page_writes=off",
+            "-c max_connections=200",
+        ])
+        subprocess.run(
+            [find_pg_bin("pg_ctl"), "-D", self.data_dir, "-o", server_options,
+             "-l", os.path.join(self.data_dir, "server.log"), "-w", "start"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+
+        conn = psycopg2.connect(host="127.0.0.1", port=self.port, user="postgres", dbname="postgres")
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE {BENCH_DB_NAME}")
+        conn.close()
+        logger.info(f"Throwaway PostgreSQL cluster running on port {self.port}")
+
+    def stop(self):
+        if not self.data_dir:
+            return
+        subprocess.run(
+            [find_pg_bin("pg_ctl"), "-D", self.data_dir, "-m", "fast", "-w", "stop"],
+            check=False, stdout=subprocess.DEVNULL
+        )
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+        self.data_dir = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+@contextmanager
+def database_fixture(database_url: Optional[str] = None):
+    """Yield a DSN for an empty-or-reusable benchmark database"""
+    url = database_url or os.environ.get("BENCH_DATABASE_URL")
+    if url:
+        yield url
+        return
+
+    with LocalPostgres() as cluster:
+        yield cluster.dsn
+
+
+def prepare_environment(dsn: str):
+    """Point the app settings at the benchmark database.
+
+    Must run before anything under ``app`` is imported, since settings are
+    read at import time.
+    """
+    os.environ["DATABASE_URL"] = dsn
+    os.environ.setdefault("SECRET_KEY", "bizit-benchmark-secret")
+    os.environ.setdefault("DEBUG", "false")
+    # The login scenario logs in many times from one address
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "false")
+
+
+def init_schema():
+    """Create the schema using the production initialization script"""
+    from init_prod_db import init_db
+    from app.core.database import close_db_pool
+
+    init_db()
+    close_db_pool()
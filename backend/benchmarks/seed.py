@@ -0,0 +1,200 @@
+"""
+Synthetic data generator for benchmarks.
+
+Rows are produced server-side with ``generate_series`` so that seeding a
+million sales takes seconds rather than minutes of client round-trips.
+Every seeded org gets an owner ``bench_owner_<org_id>`` and employees
+``bench_emp_<org_id>_<n>``, all sharing ``BENCH_PASSWORD``.
+"""
+from dataclasses import dataclass, field
+from typing import List
+import logging
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class SeedConfig:
+    orgs: int = 10
+    employees_per_org: int = 5
+    items_per_org: int = 200
+    sales_per_org: int = 2000
+    losses_per_org: int = 100
+    suppliers_per_org: int = 10
+    shipments_per_org: int = 100
+
+
+@dataclass
+class SeedResult:
+    org_ids: List[int] = field(default_factory=list)
+    owner_usernames: List[str] = field(default_factory=list)
+    employee_usernames: List[str] = field(default_factory=list)
+    password: str = BENCH_PASSWORD
+
+
+def seed(dsn: str, config: SeedConfig) -> SeedResult:
+    """Populate the database at ``dsn`` and return the seeded credentials"""
+    # One hash shared by every account keeps seeding independent of bcrypt cost
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    result = SeedResult()
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            logger.info(f"Seeding {config.orgs} organizations...")
+            cursor.execute("""
+                INSERT INTO organizations (name)
+                SELECT 'Bench Org ' || g FROM generate_series(1, %s) g
+                RETURNING id
+            """, (config.orgs,))
+            result.org_ids = [row[0] for row in cursor.fetchall()]
+            org_ids = result.org_ids
+
+            # Owners, one per org
+            cursor.execute("""
+                INSERT INTO users (org_id, email, password_hash, username, full_name)
+                SELECT o, 'bench_owner_' || o || '@bench.bizit.io', %s, 'bench_owner_' || o, 'Owner ' || o
+                FROM unnest(%s::int[]) o
+                RETURNING id, org_id, username
+            """, (password_hash, org_ids))
+            owners = cursor.fetchall()
+            result.owner_usernames = [row[2] for row in owners]
+
+            cursor.execute("""
+                UPDATE organizations o SET created_by = u.id
+                FROM users u
+                WHERE u.org_id = o.id AND u.username = 'bench_owner_' || o.id AND o.id = ANY(%s)
+            """, (org_ids,))
+            cursor.execute("""
+                INSERT INTO user_roles (user_id, role_id)
+                SELECT u.id, r.id FROM users u, roles r
+                WHERE r.name = 'owner' AND u.id = ANY(%s)
+            """, ([row[0] for row in owners],))
+
+            cursor.execute("""
+                INSERT INTO departments (org_id, name, created_by)
+                SELECT o.id, d.name, o.created_by
+                FROM organizations o CROSS JOIN (VALUES ('stock'), ('sales')) AS d(name)
+                WHERE o.id = ANY(%s)
+            """, (org_ids,))
+
+            # Employees, split between the two departments
+            logger.info("Seeding users...")
+            cursor.execute("""
+                INSERT INTO users (org_id, email, password_hash, username, full_name)
+                SELECT o, 'bench_emp_' || o || '_' || g || '@bench.bizit.io', %s,
+                       'bench_emp_' || o || '_' || g, 'Employee ' || o || '-' || g
+                FROM unnest(%s::int[]) o CROSS JOIN generate_series(1, %s) g
+                RETURNING id, org_id, username
+            """, (password_hash, org_ids, config.employees_per_org))
+            employees = cursor.fetchall()
+            result.employee_usernames = [row[2] for row in employees]
+            employee_ids = [row[0] for row in employees]
+
+            cursor.execute("""
+                INSERT INTO user_roles (user_id, role_id)
+                SELECT u.id, r.id FROM users u, roles r
+                WHERE r.name = 'employee' AND u.id = ANY(%s)
+            """, (employee_ids,))
+            cursor.execute("""
+                INSERT INTO user_departments (user_id, department_id)
+                SELECT u.id, d.id
+                FROM users u
+                JOIN departments d ON d.org_id = u.org_id
+                 AND d.name = CASE WHEN u.id %% 2 = 0 THEN 'sales' ELSE 'stock' END
+                WHERE u.id = ANY(%s)
+            """, (employee_ids,))
+
+            logger.info("Seeding stock items...")
+            cursor.execute("""
+                INSERT INTO stock_items (org_id, name, category, quantity, min_threshold, max_capacity, price, cost_price)
+                SELECT o, 'Item ' || o || '-' || g, 'Category ' || (g %% 12),
+                       100000 + (random() * 900000)::int, 10, 1000000,
+                       round((5 + random() * 95)::numeric, 2), round((1 + random() * 4)::numeric, 2)
+                FROM unnest(%s::int[]) o CROSS JOIN generate_series(1, %s) g
+            """, (org_ids, config.items_per_org))
+
+            # Numbered copy of the items so random picks are a cheap equality join
+            cursor.execute("""
+                CREATE TEMP TABLE bench_items ON COMMIT DROP AS
+                SELECT org_id, id, price, cost_price,
+                       row_number() OVER (PARTITION BY org_id ORDER BY id) AS rn
+                FROM stock_items WHERE org_id = ANY(%s)
+            """, (org_ids,))
+            cursor.execute("CREATE INDEX ON bench_items (org_id, rn)")
+            cursor.execute("ANALYZE bench_items")
+
+            logger.info("Seeding sales...")
+            cursor.execute("""
+                INSERT INTO sales (org_id, stock_item_id, sold_by, quantity, total_price, sale_date)
+                SELECT p.org_id, bi.id, o.created_by, p.qty, bi.price * p.qty, p.sale_date
+                FROM (
+                    SELECT o AS org_id, 1 + floor(random() * %s)::int AS pick,
+                           1 + floor(random() * 5)::int AS qty,
+                           NOW() - random() * INTERVAL '365 days' AS sale_date
+                    FROM unnest(%s::int[]) o CROSS JOIN generate_series(1, %s) g
+                ) p
+                JOIN bench_items bi ON bi.org_id = p.org_id AND bi.rn = p.pick
+                JOIN organizations o ON o.id = p.org_id
+            """, (config.items_per_org, org_ids, config.sales_per_org))
+
+            logger.info("Seeding losses...")
+            cursor.execute("""
+                INSERT INTO losses (org_id, stock_item_id, quantity, cost_at_loss, reason, reported_by, loss_date)
+                SELECT p.org_id, bi.id, p.qty, bi.cost_price,
+                       (ARRAY['Damaged', 'Stolen', 'Expired', 'Other'])[1 + floor(random() * 4)::int],
+                       o.created_by, p.loss_date
+                FROM (
+                    SELECT o AS org_id, 1 + floor(random() * %s)::int AS pick,
+                           1 + floor(random() * 3)::int AS qty,
+                           NOW() - random() * INTERVAL '365 days' AS loss_date
+                    FROM unnest(%s::int[]) o CROSS JOIN generate_series(1, %s) g
+                ) p
+                JOIN bench_items bi ON bi.org_id = p.org_id AND bi.rn = p.pick
+                JOIN organizations o ON o.id = p.org_id
+            """, (config.items_per_org, org_ids, config.losses_per_org))
+
+            logger.info("Seeding suppliers and shipments...")
+            cursor.execute("""
+                INSERT INTO suppliers (org_id, name, phone, email)
+                SELECT o, 'Supplier ' || o || '-' || g, '555-' || g, 'supplier' || g || '@bench.bizit.io'
+                FROM unnest(%s::int[]) o CROSS JOIN generate_series(1, %s) g
+            """, (org_ids, config.suppliers_per_org))
+            cursor.execute("""
+                INSERT INTO shipments (org_id, supplier_id, expected_quantity, expected_date, status)
+                SELECT p.org_id, sup.id, 10 + floor(random() * 500)::int,
+                       CURRENT_DATE + (floor(random() * 60)::int - 30),
+                       (ARRAY['Pending', 'Arrived', 'Late'])[1 + floor(random() * 3)::int]
+                FROM (
+                    SELECT o AS org_id, 1 + floor(random() * %s)::int AS pick
+                    FROM unnest(%s::int[]) o CROSS JOIN generate_series(1, %s) g
+                ) p
+                JOIN (
+                    SELECT id, org_id, row_number() OVER (PARTITION BY org_id ORDER BY id) AS rn
+                    FROM suppliers WHERE org_id = ANY(%s)
+                ) sup ON sup.org_id = p.org_id AND sup.rn = p.pick
+            """, (config.suppliers_per_org, org_ids, config.shipments_per_org, org_ids))
+
+        # Sales and losses span the past year: move them out of the default
+        # partitions into monthly ones, as the partitions.maintain job would
+        from app.core.partitions import ensure_partitions
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            ensure_partitions(cursor)
+
+        conn.commit()
+
+        # Fresh statistics so the first benchmark run sees realistic plans
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    logger.info("Seeding complete")
+    return result
@@ -0,0 +1,66 @@
+"""
+Latency statistics and result reporting shared by the benchmark scripts
+"""
+import json
+import math
+import platform
+from datetime import datetime
+from typing import Dict, List, Any
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+
+    rank = (pct / 100) * (len(sorted_values) - 1)
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Summarize a list of latencies (seconds) into a result row (milliseconds)"""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "name": name,
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def print_table(results: List[Dict[str, Any]]):
+    """Print result rows as an aligned table"""
+    columns = ["name", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    widths = {
+        col: max(len(col), *(len(str(row.get(col, ""))) for row in results)) if results else len(col)
+        for col in columns
+    }
+    print("  ".join(col.ljust(widths[col]) for col in columns))
+    for row in results:
+        print("  ".join(str(row.get(col, "")).ljust(widths[col]) for col in columns))
+
+
+def write_json(path: str, results: List[Dict[str, Any]], config: Dict[str, Any]):
+    """Write results with enough context to compare runs later"""
+    payload = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
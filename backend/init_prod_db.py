@@ -1,11 +1,48 @@
 
 import logging
 from app.core.database import get_db_cursor
+from app.core import partitions
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def set_aside_unpartitioned(cursor, table):
+    """Rename a plain (pre-partitioning) ``table`` out of the way of its partitioned replacement"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    if not row or row['relkind'] != 'r':
+        return
+    logger.info(f"Setting aside unpartitioned {table} table...")
+    old = f"{table}_unpartitioned"
+    cursor.execute(f"""
+        ALTER TABLE {table} RENAME TO {old};
+        ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey;
+        ALTER SEQUENCE {table}_id_seq RENAME TO {old}_id_seq;
+        DROP INDEX IF EXISTS idx_{table}_org_id, idx_{table}_org_date;
+    """)
+
+
+def move_unpartitioned_rows(cursor, table, column):
+    """Copy the rows of a table set aside by ``set_aside_unpartitioned`` into its partitions and drop it"""
+    old = f"{table}_unpartitioned"
+    cursor.execute("SELECT to_regclass(%s) AS oid", (old,))
+    if cursor.fetchone()['oid'] is None:
+        return
+    # The date used to be nullable but is the partition key now: date undated rows to the migration
+    cursor.execute(f"UPDATE {old} SET {column} = NOW() WHERE {column} IS NULL")
+    if cursor.rowcount:
+        logger.warning(f"{cursor.rowcount} {table} rows had no {column}; set it to the migration time")
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', {column})::date AS month FROM {old}")
+    partitions.create_partitions(cursor, table, [row['month'] for row in cursor.fetchall()])
+    cursor.execute(f"""
+        INSERT INTO {table} SELECT * FROM {old};
+        SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT max(id) FROM {old}), 0) + 1, false);
+        DROP TABLE {old};
+    """)
+    logger.info(f"Moved {table} rows into partitions")
+
+
 def init_db():
     """
     Initialize the production database with all tables and schema updates.
@@ -125,25 +162,31 @@ def init_db():
                 );
             """)
 
-            # 4. Sales
+            # 4. Sales, partitioned by month on sale_date (see app.core.partitions).
+            # A table from before partitioning is set aside here and its rows moved in step 15.
             logger.info("Creating sales table...")
+            set_aside_unpartitioned(cursor, "sales")
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS sales (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
                     org_id INT REFERENCES organizations(id) ON DELETE CASCADE,
                     stock_item_id INT REFERENCES stock_items(id) ON DELETE SET NULL,
                     sold_by INT REFERENCES users(id) ON DELETE SET NULL,
                     quantity INT NOT NULL CHECK (quantity > 0),
                     total_price DECIMAL(10, 2) NOT NULL,
-                    sale_date TIMESTAMP DEFAULT NOW()
-                );
+                    sale_date TIMESTAMP NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (id, sale_date)
+                ) PARTITION BY RANGE (sale_date);
+
+                CREATE TABLE IF NOT EXISTS sales_default PARTITION OF sales DEFAULT;
             """)
 
-            # 5. Losses
+            # 5. Losses, partitioned by month on loss_date
             logger.info("Creating losses table...")
+            set_aside_unpartitioned(cursor, "losses")
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS losses (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL,
                     org_id INT REFERENCES organizations(id) ON DELETE CASCADE,
                     stock_item_id INT REFERENCES stock_items(id) ON DELETE SET NULL,
                     quantity INT NOT NULL CHECK (quantity > 0),
@@ -151,7 +194,154 @@ def init_db():
                     reason VARCHAR(50) NOT NULL,
                     notes TEXT,
                     reported_by INT REFERENCES users(id) ON DELETE SET NULL,
-                    loss_date TIMESTAMP DEFAULT NOW()
+                    loss_date TIMESTAMP NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (id, loss_date)
+                ) PARTITION BY RANGE (loss_date);
+
+                CREATE TABLE IF NOT EXISTS losses_default PARTITION OF losses DEFAULT;
+            """)
+
+            # 6. Indexes for per-org listings and data-version (ETag) lookups
+            logger.info("Creating indexes...")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_stock_items_org_updated ON stock_items (org_id, updated_at);
+                CREATE INDEX IF NOT EXISTS idx_sales_org_id ON sales (org_id, id);
+                CREATE INDEX IF NOT EXISTS idx_losses_org_id ON losses (org_id, id);
+                CREATE INDEX IF NOT EXISTS idx_suppliers_org_updated ON suppliers (org_id, updated_at);
+                CREATE INDEX IF NOT EXISTS idx_shipments_org_updated ON shipments (org_id, updated_at);
+                CREATE INDEX IF NOT EXISTS idx_users_org ON users (org_id);
+            """)
+
+            # 7. Delta sync: tombstones for deleted rows, sale time lookups
+            logger.info("Creating deleted_records table and sync indexes...")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS deleted_records (
+                    id BIGSERIAL PRIMARY KEY,
+                    org_id INT NOT NULL,
+                    resource VARCHAR(50) NOT NULL,
+                    record_id INT NOT NULL,
+                    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_deleted_records_org ON deleted_records (org_id, resource, deleted_at);
+                CREATE INDEX IF NOT EXISTS idx_deleted_records_deleted_at ON deleted_records (deleted_at);
+                CREATE INDEX IF NOT EXISTS idx_sales_org_date ON sales (org_id, sale_date);
+                CREATE INDEX IF NOT EXISTS idx_losses_org_date ON losses (org_id, loss_date);
+            """)
+
+            # 8. Outbox for background jobs
+            logger.info("Creating outbox_jobs table...")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS outbox_jobs (
+                    id BIGSERIAL PRIMARY KEY,
+                    job_type VARCHAR(100) NOT NULL,
+                    payload JSONB NOT NULL DEFAULT '{}',
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    attempts INT NOT NULL DEFAULT 0,
+                    max_attempts INT NOT NULL DEFAULT 5,
+                    run_after TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    locked_at TIMESTAMP WITH TIME ZONE,
+                    last_error TEXT,
+                    dedupe_key VARCHAR(255) UNIQUE,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_outbox_jobs_due ON outbox_jobs (run_after, id) WHERE status = 'pending';
+                CREATE INDEX IF NOT EXISTS idx_outbox_jobs_running ON outbox_jobs (locked_at) WHERE status = 'running';
+            """)
+
+            # 9. Reorder drafts: shipments linked to the low-stock item they refill
+            logger.info("Applying reorder schema updates...")
+            cursor.execute("""
+                ALTER TABLE shipments
+                ADD COLUMN IF NOT EXISTS stock_item_id INT REFERENCES stock_items(id) ON DELETE SET NULL;
+
+                ALTER TABLE shipments
+                ADD COLUMN IF NOT EXISTS origin VARCHAR(20) DEFAULT 'manual';
+
+                CREATE INDEX IF NOT EXISTS idx_stock_items_low ON stock_items (org_id, id) WHERE quantity <= min_threshold;
+                CREATE INDEX IF NOT EXISTS idx_shipments_stock_item ON shipments (stock_item_id, status) WHERE stock_item_id IS NOT NULL;
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_shipments_one_draft ON shipments (stock_item_id) WHERE status = 'Draft';
+                CREATE INDEX IF NOT EXISTS idx_shipments_supplier_rated ON shipments (supplier_id) WHERE score IS NOT NULL;
+            """)
+
+            # 10. Shipment line items
+            logger.info("Creating shipment_items table...")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS shipment_items (
+                    id SERIAL PRIMARY KEY,
+                    shipment_id INT NOT NULL REFERENCES shipments(id) ON DELETE CASCADE,
+                    stock_item_id INT REFERENCES stock_items(id) ON DELETE SET NULL,
+                    expected_quantity INT NOT NULL CHECK (expected_quantity > 0),
+                    received_quantity INT,
+                    damaged_quantity INT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_shipment_items_shipment ON shipment_items (shipment_id);
+                CREATE INDEX IF NOT EXISTS idx_shipment_items_stock_item ON shipment_items (stock_item_id);
+            """)
+
+            # 11. Shipments board: keyset order and open (possibly late) shipments
+            logger.info("Creating shipment listing indexes...")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_shipments_org_expected ON shipments (org_id, expected_date, id);
+                CREATE INDEX IF NOT EXISTS idx_shipments_open ON shipments (org_id, expected_date)
+                    WHERE status NOT IN ('Arrived', 'Draft', 'Cancelled');
+            """)
+
+            # 12. Case-insensitive usernames and emails (login lookup and uniqueness).
+            # Fails if existing users differ only in case; rename those first.
+            logger.info("Creating case-insensitive user indexes...")
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_lower ON users (lower(email));
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_lower ON users (lower(username));
+            """)
+
+            # 13. Shared login rate-limit buckets (LOGIN_RATE_LIMIT_BACKEND=postgres).
+            # Unlogged: losing them in a crash only resets the limits
+            logger.info("Creating rate limit buckets table...")
+            cursor.execute("""
+                CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+                    key VARCHAR(255) PRIMARY KEY,
+                    tokens DOUBLE PRECISION NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+            """)
+
+            # 14. Audit log (append-only; written in batches by app.core.audit)
+            logger.info("Creating audit log table...")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS audit_log (
+                    id BIGSERIAL PRIMARY KEY,
+                    org_id INT,
+                    actor_id INT,
+                    action VARCHAR(20) NOT NULL,
+                    entity VARCHAR(50) NOT NULL,
+                    entity_id INT,
+                    before JSONB,
+                    after JSONB,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_audit_log_org_created ON audit_log (org_id, created_at);
+                CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON audit_log (entity, entity_id);
+            """)
+
+            # 15. Monthly partitions: move rows set aside in steps 4 and 5, create the coming months
+            logger.info("Creating sales and losses partitions...")
+            for table, column in partitions.PARTITIONED_TABLES.items():
+                move_unpartitioned_rows(cursor, table, column)
+            partitions.ensure_partitions(cursor)
+
+            # 16. Per-org data versions behind list ETags (bumped by cache.invalidate_org)
+            logger.info("Creating data versions table...")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    org_id INT NOT NULL,
+                    namespace VARCHAR(50) NOT NULL,
+                    version BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (org_id, namespace)
                 );
             """)
 
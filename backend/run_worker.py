@@ -0,0 +1,38 @@
+"""
+Standalone background job worker.
+
+Runs the outbox jobs (see app/core/jobs.py) outside the API processes. When
+using it, set JOB_WORKER_ENABLED=false for the API so jobs only run here;
+several copies can run side by side.
+"""
+import logging
+import signal
+from app.core.config import settings
+from app.core.database import init_db_pool, close_db_pool
+from app.core.jobs import JobWorker, load_handlers
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    init_db_pool()
+    load_handlers()
+    worker = JobWorker(settings.JOB_POLL_INTERVAL_SECONDS)
+
+    def shutdown(signum, frame):
+        logger.info("Stopping job worker...")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    logger.info("Job worker started")
+    worker.start()
+    while worker.is_alive():
+        worker.join(timeout=1)
+    close_db_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Unit tests for logic that needs no database. Settings require a database URL
+and a secret key; nothing here connects, so placeholders are enough.
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/bizit_test")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest
+
+from app.core.config import settings
+
+
+class FakeConnection:
+    pass
+
+
+class FakeCursor:
+    """Records the statements it is asked to run"""
+
+    def __init__(self, rows=None):
+        self.connection = FakeConnection()
+        self.executed = []
+        self.rows = rows or []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def fake_cursor():
+    return FakeCursor()
+
+
+@pytest.fixture
+def override_settings(monkeypatch):
+    """``override_settings(NAME=value, ...)`` for the duration of a test"""
+    def override(**values):
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+    return override
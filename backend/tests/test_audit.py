@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+
+import pytest
+from pydantic import BaseModel
+
+from app.core import audit
+
+
+@pytest.fixture
+def buffer(monkeypatch, override_settings):
+    """The audit buffer, with commits applied at once and no writer thread"""
+    override_settings(AUDIT_ENABLED=True, AUDIT_BATCH_SIZE=500, AUDIT_MAX_BUFFER=50000)
+    monkeypatch.setattr(audit, "on_commit", lambda cursor, callback: callback())
+    monkeypatch.setattr(audit, "_ensure_writer", lambda: None)
+    audit._buffer.clear()
+    yield audit._buffer
+    audit._buffer.clear()
+
+
+def test_diff_keeps_only_changed_fields():
+    before = {"name": "Widget", "price": 10, "quantity": 5}
+    after = {"name": "Widget", "price": 12, "quantity": 5}
+    assert audit.diff(before, after) == ({"price": 10}, {"price": 12})
+
+
+def test_diff_ignores_fields_missing_on_one_side():
+    assert audit.diff({"a": 1}, {"a": 1, "b": 2}) == ({}, {})
+
+
+def test_diff_passes_creations_and_deletions_through():
+    assert audit.diff(None, {"a": 1}) == (None, {"a": 1})
+    assert audit.diff({"a": 1}, None) == ({"a": 1}, None)
+
+
+def test_record_buffers_the_diff(buffer, fake_cursor):
+    audit.record(fake_cursor, 1, 7, "update", "stock", 3, before={"price": 1, "name": "x"}, after={"price": 2, "name": "x"})
+    (entry,) = buffer
+    assert entry[:7] == (1, 7, "update", "stock", 3, {"price": 1}, {"price": 2})
+
+
+def test_record_dumps_models(buffer, fake_cursor):
+    class Item(BaseModel):
+        name: str
+
+    audit.record(fake_cursor, 1, 7, "create", "stock", 3, after=Item(name="x"))
+    assert buffer[0][6] == {"name": "x"}
+
+
+def test_update_that_changed_nothing_is_skipped(buffer, fake_cursor):
+    audit.record(fake_cursor, 1, 7, "update", "stock", 3, before={"price": 1}, after={"price": 1})
+    assert not buffer
+
+
+def test_disabled_records_nothing(buffer, fake_cursor, override_settings):
+    override_settings(AUDIT_ENABLED=False)
+    audit.record(fake_cursor, 1, 7, "create", "stock", 3, after={"name": "x"})
+    assert not buffer
+
+
+def test_full_buffer_drops_new_entries(buffer, fake_cursor, override_settings):
+    override_settings(AUDIT_MAX_BUFFER=2)
+    for entity_id in range(3):
+        audit.record(fake_cursor, 1, 7, "create", "stock", entity_id, after={"n": entity_id})
+    assert [entry[4] for entry in buffer] == [0, 1]
+
+
+def test_failed_flush_puts_batch_back_in_order(buffer, fake_cursor, monkeypatch, override_settings):
+    override_settings(AUDIT_BATCH_SIZE=2)
+    for entity_id in range(3):
+        audit.record(fake_cursor, 1, 7, "create", "stock", entity_id, after={"n": entity_id})
+
+    @contextmanager
+    def broken_cursor():
+        raise RuntimeError("database down")
+        yield
+
+    monkeypatch.setattr(audit, "get_db_cursor", broken_cursor)
+    with pytest.raises(RuntimeError):
+        audit.flush()
+    assert [entry[4] for entry in buffer] == [0, 1, 2]
+
+
+def test_flush_writes_one_batch(buffer, fake_cursor, monkeypatch, override_settings):
+    override_settings(AUDIT_BATCH_SIZE=2)
+    for entity_id in range(3):
+        audit.record(fake_cursor, 1, 7, "create", "stock", entity_id, after={"n": entity_id})
+    written = []
+
+    @contextmanager
+    def cursor():
+        yield fake_cursor
+
+    monkeypatch.setattr(audit, "get_db_cursor", cursor)
+    monkeypatch.setattr(audit, "execute_values", lambda cursor, sql, rows, page_size: written.extend(rows))
+    assert audit.flush() == 2
+    assert [row[4] for row in written] == [0, 1]
+    assert [entry[4] for entry in buffer] == [2]
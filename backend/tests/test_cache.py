@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from app.core import cache
+from app.core.cache import InMemoryCache, _MISSING
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    backend = InMemoryCache(max_entries=100, ttl=30)
+    monkeypatch.setattr(cache, "_cache", backend)
+    return backend
+
+
+def test_entries_expire_after_ttl(clock):
+    backend = InMemoryCache(max_entries=10, ttl=30)
+    backend.set(1, "stock", "k", "v", backend.generation(1, "stock"))
+    clock[0] += 29
+    assert backend.get(1, "stock", "k") == "v"
+    clock[0] += 2
+    assert backend.get(1, "stock", "k") is _MISSING
+    assert backend.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    backend = InMemoryCache(max_entries=2, ttl=30)
+    backend.set(1, "stock", "a", 1, 0)
+    backend.set(1, "stock", "b", 2, 0)
+    backend.get(1, "stock", "a")
+    backend.set(1, "stock", "c", 3, 0)
+    assert backend.get(1, "stock", "b") is _MISSING
+    assert backend.get(1, "stock", "a") == 1
+    assert backend.get(1, "stock", "c") == 3
+
+
+def test_invalidate_drops_only_named_namespaces(clock):
+    backend = InMemoryCache(max_entries=10, ttl=30)
+    backend.set(1, "stock", "k", "stock", 0)
+    backend.set(1, "sales", "k", "sales", 0)
+    backend.set(2, "stock", "k", "other org", 0)
+    backend.invalidate(1, ["stock"])
+    assert backend.get(1, "stock", "k") is _MISSING
+    assert backend.get(1, "sales", "k") == "sales"
+    assert backend.get(2, "stock", "k") == "other org"
+    backend.invalidate(1)
+    assert backend.get(1, "sales", "k") is _MISSING
+
+
+def test_read_racing_an_invalidation_is_not_stored(clock):
+    backend = InMemoryCache(max_entries=10, ttl=30)
+    generation = backend.generation(1, "stock")
+    backend.invalidate(1, ["stock"])
+    backend.set(1, "stock", "k", "pre-write data", generation)
+    assert backend.get(1, "stock", "k") is _MISSING
+
+
+def test_cached_reuses_result_per_org_and_arguments(memory_cache):
+    calls = []
+
+    @cache.cached("stock")
+    def load(org_id, category=None):
+        calls.append((org_id, category))
+        return [org_id, category]
+
+    assert load(1) == [1, None]
+    assert load(1) == [1, None]
+    assert load(1, category="x") == [1, "x"]
+    assert load(2) == [2, None]
+    assert calls == [(1, None), (1, "x"), (2, None)]
+
+
+def test_cached_ignores_entry_of_another_version(memory_cache):
+    results = iter(["v1 body", "v2 body"])
+
+    @cache.cached("stock")
+    def load(org_id):
+        return next(results)
+
+    assert load(1, cache_version="1") == "v1 body"
+    assert load(1, cache_version="1") == "v1 body"
+    assert load(1, cache_version="2") == "v2 body"
+    # Without a version any entry will do
+    assert load(1) == "v2 body"
+
+
+def test_invalidate_org_with_cursor_waits_for_commit(memory_cache, monkeypatch, fake_cursor):
+    commit_hooks, bumped, published = [], [], []
+    monkeypatch.setattr(cache, "on_commit", lambda cursor, callback: commit_hooks.append(callback))
+    monkeypatch.setattr(cache, "bump_versions", lambda cursor, org_id, namespaces: bumped.append((org_id, namespaces)))
+    monkeypatch.setattr(cache.notifications, "publish", lambda cursor, channel, payload: published.append(payload))
+    memory_cache.set(1, "stock", "k", "v", 0)
+
+    cache.invalidate_org(1, "stock", cursor=fake_cursor)
+    assert memory_cache.get(1, "stock", "k") == "v"
+    assert bumped == [(1, ("stock",))]
+    assert published == [{"org_id": 1, "namespaces": ["stock"]}]
+
+    for callback in commit_hooks:
+        callback()
+    assert memory_cache.get(1, "stock", "k") is _MISSING
+
+
+def test_remote_invalidation_drops_entries(memory_cache):
+    memory_cache.set(1, "stock", "k", "v", 0)
+    memory_cache.set(1, "sales", "k", "v", 0)
+    cache._on_remote_invalidation({"org_id": 1, "namespaces": ["stock"], "origin": "other-worker"})
+    assert memory_cache.get(1, "stock", "k") is _MISSING
+    assert memory_cache.get(1, "sales", "k") == "v"
+
+
+def test_invalidate_org_bumps_every_namespace_when_none_given(memory_cache, monkeypatch, fake_cursor):
+    bumped = []
+    monkeypatch.setattr(cache, "on_commit", lambda cursor, callback: None)
+    monkeypatch.setattr(cache, "bump_versions", lambda cursor, org_id, namespaces: bumped.append(namespaces))
+    monkeypatch.setattr(cache.notifications, "publish", lambda cursor, channel, payload: None)
+    cache.invalidate_org(1, cursor=fake_cursor)
+    assert bumped == [cache.NAMESPACES]
+
+
+def test_reconnect_clears_local_cache(memory_cache):
+    memory_cache.set(1, "stock", "k", "v", 0)
+    cache._on_reconnect()
+    assert memory_cache.get(1, "stock", "k") is _MISSING
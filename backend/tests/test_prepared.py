@@ -0,0 +1,69 @@
+import pytest
+
+from app.core import prepared
+
+
+def test_convert_numbers_positional_placeholders():
+    name, sql, named = prepared._convert("SELECT * FROM t WHERE a = %s AND b = %s")
+    assert sql == "SELECT * FROM t WHERE a = $1 AND b = $2"
+    assert named == ()
+    assert name.startswith("ps_")
+
+
+def test_convert_reuses_number_of_repeated_named_placeholder():
+    _, sql, named = prepared._convert("SELECT LEAST(%(burst)s, x * %(rate)s) WHERE y < %(burst)s")
+    assert sql == "SELECT LEAST($1, x * $2) WHERE y < $1"
+    assert named == ("burst", "rate")
+
+
+def test_convert_unescapes_percent():
+    _, sql, _ = prepared._convert("SELECT 'a%%' LIKE %s")
+    assert sql == "SELECT 'a%' LIKE $1"
+
+
+def test_convert_rejects_mixed_placeholders():
+    with pytest.raises(ValueError):
+        prepared._convert("SELECT %s, %(name)s")
+
+
+def test_name_depends_on_the_query():
+    assert prepared._convert("SELECT %s")[0] == prepared._convert("SELECT %s")[0]
+    assert prepared._convert("SELECT %s")[0] != prepared._convert("SELECT %s + 1")[0]
+
+
+def test_prepares_once_per_connection(fake_cursor, override_settings):
+    override_settings(PREPARED_STATEMENTS_ENABLED=True, PREPARED_STATEMENTS_MAX=10)
+    name, _, _ = prepared._convert("SELECT %s, %s")
+    prepared.execute(fake_cursor, "SELECT %s, %s", (1, 2))
+    prepared.execute(fake_cursor, "SELECT %s, %s", (3, 4))
+    assert fake_cursor.executed == [
+        (f"PREPARE {name} AS SELECT $1, $2", None),
+        (f"EXECUTE {name} (%s, %s)", [1, 2]),
+        (f"EXECUTE {name} (%s, %s)", [3, 4]),
+    ]
+
+
+def test_named_parameters_are_passed_in_placeholder_order(fake_cursor, override_settings):
+    override_settings(PREPARED_STATEMENTS_ENABLED=True, PREPARED_STATEMENTS_MAX=10)
+    prepared.execute(fake_cursor, "SELECT %(b)s, %(a)s, %(b)s", {"a": 1, "b": 2})
+    assert fake_cursor.executed[-1][1] == [2, 1]
+
+
+def test_statement_without_parameters(fake_cursor, override_settings):
+    override_settings(PREPARED_STATEMENTS_ENABLED=True, PREPARED_STATEMENTS_MAX=10)
+    name, _, _ = prepared._convert("SELECT 1")
+    prepared.execute(fake_cursor, "SELECT 1")
+    assert fake_cursor.executed[-1] == (f"EXECUTE {name}", None)
+
+
+def test_full_registry_sends_plain_text(fake_cursor, override_settings):
+    override_settings(PREPARED_STATEMENTS_ENABLED=True, PREPARED_STATEMENTS_MAX=1)
+    prepared.execute(fake_cursor, "SELECT %s", (1,))
+    prepared.execute(fake_cursor, "SELECT %s + 1", (1,))
+    assert fake_cursor.executed[-1] == ("SELECT %s + 1", (1,))
+
+
+def test_disabled_sends_plain_text(fake_cursor, override_settings):
+    override_settings(PREPARED_STATEMENTS_ENABLED=False)
+    prepared.execute(fake_cursor, "SELECT %s", (1,))
+    assert fake_cursor.executed == [("SELECT %s", (1,))]
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import LoginRateLimiter, TokenBucketLimiter, client_ip
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_throttled(clock):
+    limiter = TokenBucketLimiter(burst=3, per_minute=60)
+    assert [limiter.acquire("k") for _ in range(3)] == [0.0, 0.0, 0.0]
+    # One token a second: the next one is a second away
+    assert limiter.acquire("k") == pytest.approx(1.0)
+
+
+def test_refills_at_rate_up_to_burst(clock):
+    limiter = TokenBucketLimiter(burst=2, per_minute=30)
+    limiter.acquire("k")
+    limiter.acquire("k")
+    clock[0] += 1.0
+    # Half a token back after a second at 0.5/s
+    assert limiter.acquire("k") == pytest.approx(1.0)
+    clock[0] += 3600
+    assert limiter.acquire("k") == 0.0
+    assert limiter.acquire("k") == 0.0
+    assert limiter.acquire("k") > 0
+
+
+def test_keys_are_independent(clock):
+    limiter = TokenBucketLimiter(burst=1, per_minute=1)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0.0
+
+
+def test_prune_forgets_full_buckets_first(clock):
+    limiter = TokenBucketLimiter(burst=1, per_minute=60, shards=1, max_keys=2)
+    limiter.acquire("old")
+    clock[0] += 10
+    limiter.acquire("a")
+    limiter.acquire("b")
+    buckets, _ = limiter._shards[0]
+    assert set(buckets) == {"a", "b"}
+
+
+def test_throttled_ip_does_not_spend_username_tokens(clock, override_settings):
+    override_settings(LOGIN_IP_BURST=1, LOGIN_IP_PER_MINUTE=1, LOGIN_USERNAME_BURST=2, LOGIN_USERNAME_PER_MINUTE=1)
+    limiter = LoginRateLimiter("memory")
+    assert limiter.check("1.1.1.1", "Alice") == 0.0
+    assert limiter.check("1.1.1.1", "alice") > 0
+    # Only the first attempt reached the username bucket
+    assert limiter.check("2.2.2.2", " ALICE ") == 0.0
+    assert limiter.check("3.3.3.3", "alice") > 0
+
+
+@pytest.mark.parametrize("ip_burst, ip_rate", [(0, 30), (20, 0)])
+def test_zero_setting_disables_bucket(clock, override_settings, ip_burst, ip_rate):
+    override_settings(LOGIN_IP_BURST=ip_burst, LOGIN_IP_PER_MINUTE=ip_rate,
+                      LOGIN_USERNAME_BURST=100, LOGIN_USERNAME_PER_MINUTE=60)
+    limiter = LoginRateLimiter("memory")
+    assert limiter.by_ip is None
+    assert all(limiter.check("1.1.1.1", f"user{n}") == 0.0 for n in range(50))
+
+
+def test_client_ip_ignores_header_without_trusted_proxies(override_settings):
+    override_settings(LOGIN_TRUSTED_PROXIES="")
+    assert client_ip("10.0.0.1", "1.2.3.4") == "10.0.0.1"
+    assert client_ip(None, None) == "unknown"
+
+
+def test_client_ip_skips_trusted_hops(override_settings):
+    override_settings(LOGIN_TRUSTED_PROXIES="10.0.0.0/8, 192.168.1.5")
+    # The client can put anything on the left; the rightmost untrusted hop counts
+    assert client_ip("10.0.0.1", "6.6.6.6, 1.2.3.4, 192.168.1.5") == "1.2.3.4"
+    assert client_ip("8.8.8.8", "1.2.3.4") == "8.8.8.8"
+    assert client_ip("10.0.0.1", "10.0.0.2") == "10.0.0.2"
+
+
+def test_client_ip_trust_all_takes_last_hop(override_settings):
+    override_settings(LOGIN_TRUSTED_PROXIES="*")
+    assert client_ip("172.17.0.1", "6.6.6.6, 1.2.3.4") == "1.2.3.4"
+
+
+def test_invalid_proxy_entries_are_ignored(override_settings):
+    override_settings(LOGIN_TRUSTED_PROXIES="not-an-ip,10.0.0.1")
+    rate_limit._parse_proxies.cache_clear()
+    assert client_ip("10.0.0.1", "1.2.3.4") == "1.2.3.4"
@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.stats import percentile, summarize
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [10.0, 20.0, 30.0, 40.0]
+    assert percentile(values, 0) == 10.0
+    assert percentile(values, 50) == pytest.approx(25.0)
+    assert percentile(values, 100) == 40.0
+
+
+def test_percentile_of_short_lists():
+    assert percentile([], 95) == 0.0
+    assert percentile([7.0], 95) == 7.0
+
+
+def test_summarize_reports_milliseconds():
+    row = summarize("stock", [0.002, 0.001, 0.003], errors=1, elapsed=2.0)
+    assert row["requests"] == 3
+    assert row["errors"] == 1
+    assert row["throughput_rps"] == 1.5
+    assert row["p50_ms"] == 2.0
+    assert row["max_ms"] == 3.0
+
+
+def test_summarize_without_requests():
+    row = summarize("login", [], errors=5, elapsed=1.0)
+    assert row["requests"] == 0
+    assert row["mean_ms"] == 0.0
+    assert row["max_ms"] == 0.0
@@ -0,0 +1,66 @@
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import sync_service
+from app.services.sync_service import SyncCursorExpired
+
+
+def test_cursor_round_trip():
+    now = datetime.now(timezone.utc).replace(microsecond=123456)
+    token = sync_service.encode_cursor(now)
+    assert "=" not in token
+    assert sync_service.decode_cursor(token) == now
+
+
+def test_empty_cursor_means_full_sync():
+    assert sync_service.decode_cursor("") is None
+    assert sync_service.decode_cursor(None) is None
+
+
+@pytest.mark.parametrize("token", ["not base64 at all!", base64.urlsafe_b64encode(b"yesterday").decode()])
+def test_malformed_cursor(token):
+    with pytest.raises(ValueError):
+        sync_service.decode_cursor(token)
+
+
+def test_cursor_without_time_zone_is_rejected():
+    token = sync_service.encode_cursor(datetime(2026, 1, 1, 12, 0))
+    with pytest.raises(ValueError):
+        sync_service.decode_cursor(token)
+
+
+def test_cursor_older_than_tombstones_expires(override_settings):
+    override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    fresh = datetime.now(timezone.utc) - timedelta(days=29)
+    assert sync_service.decode_cursor(sync_service.encode_cursor(fresh)) == fresh
+    with pytest.raises(SyncCursorExpired):
+        sync_service.decode_cursor(sync_service.encode_cursor(datetime.now(timezone.utc) - timedelta(days=31)))
+
+
+def test_window_start_reaches_back_by_overlap(override_settings):
+    override_settings(SYNC_OVERLAP_SECONDS=30)
+    since = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert sync_service.window_start(since) == datetime(2026, 1, 1, 11, 59, 30, tzinfo=timezone.utc)
+    assert sync_service.window_start(None) is None
+
+
+def test_full_sync_has_no_tombstones(fake_cursor):
+    assert sync_service.get_deleted_ids(fake_cursor, 1, ["stock", "sales"], None) == {"stock": [], "sales": []}
+    assert fake_cursor.executed == []
+
+
+def test_tombstones_grouped_by_resource(fake_cursor):
+    fake_cursor.rows = [("stock", [4, 9])]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert sync_service.get_deleted_ids(fake_cursor, 1, ("stock", "sales"), start) == {"stock": [4, 9], "sales": []}
+    (_, params), = fake_cursor.executed
+    assert params == (1, ["stock", "sales"], start)
+
+
+def test_record_deletion_writes_tombstone(fake_cursor):
+    sync_service.record_deletion(fake_cursor, 1, "stock", 42)
+    (sql, params), = fake_cursor.executed
+    assert "deleted_records" in sql
+    assert params == (1, "stock", 42)